@@ -0,0 +1,140 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+from cachetools import LRUCache
+from app.core.metrics import CACHE_LOOKUPS
+
+
+class _CachedError(NamedTuple):
+    """What is kept of a loader exception: enough to raise an equivalent one, no traceback or frames."""
+    error_type: type
+    args: Tuple[Any, ...]
+    attributes: Dict[str, Any]
+
+    @classmethod
+    def of(cls, error: BaseException) -> "_CachedError":
+        return cls(type(error), error.args, dict(getattr(error, "__dict__", {})))
+
+    def fresh(self) -> BaseException:
+        # __new__ skips __init__, so types with required keyword arguments (httpx.HTTPStatusError) work too
+        error = self.error_type.__new__(self.error_type, *self.args)
+        error.args = self.args
+        error.__dict__.update(self.attributes)
+        return error
+
+
+class AsyncTTLCache:
+    """
+    TTL cache for the *results* of coroutines, with single-flight loading.
+
+    Concurrent misses for the same key share one in-flight load instead of each
+    starting their own. Values for which `is_negative(value)` is true, and
+    exceptions raised by the loader, are kept for `negative_ttl` seconds so a
+    failing or empty upstream is not hammered on every request; each hit on a
+    cached exception raises a new one of the same type and arguments.
+
+    With `stale_ttl` > 0, positive values outlive `ttl` by that many seconds:
+    during that window they are returned immediately while one background load
+    refreshes them (stale-while-revalidate). A failed refresh keeps the stale
+    value and is not retried for `negative_ttl` seconds.
+
+    Exceptions of the types in `uncached_errors` are never cached: they say
+    the load didn't happen (e.g. a query the CSE scheduler dropped), not what
+    upstream answered.
+
+    Lookups are counted per outcome under `name` in analyzer_cache_lookups_total.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        negative_ttl: float = 0.0,
+        stale_ttl: float = 0.0,
+        name: str = "default",
+        uncached_errors: Tuple[type, ...] = (),
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.uncached_errors = uncached_errors
+        self._entries = LRUCache(maxsize=maxsize)  # key -> (fresh_until, stale_until, value, error)
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        is_negative: Optional[Callable[[Any], bool]] = None,
+        revalidate: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Any:
+        """
+        Cached value for key, calling loader() on a miss.
+
+        `revalidate`, if given, is used instead of loader for background
+        refreshes of stale entries (e.g. to run them at a lower priority).
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            fresh_until, stale_until, value, error = entry
+            now = time.monotonic()
+            if fresh_until > now:
+                CACHE_LOOKUPS.labels(self.name, "hit").inc()
+                if error is not None:
+                    raise error.fresh()
+                return value
+            if stale_until > now:
+                CACHE_LOOKUPS.labels(self.name, "stale").inc()
+                if key not in self._inflight:
+                    self._start_load(key, revalidate or loader, is_negative, stale=entry)
+                return value
+            self._entries.pop(key, None)
+
+        future = self._inflight.get(key)
+        if future is None:
+            CACHE_LOOKUPS.labels(self.name, "miss").inc()
+            future = self._start_load(key, loader, is_negative)
+        else:
+            CACHE_LOOKUPS.labels(self.name, "coalesced").inc()
+        # Shield so one cancelled caller doesn't cancel the load for everyone else
+        return await asyncio.shield(future)
+
+    def _start_load(self, key, loader, is_negative, stale=None) -> asyncio.Future:
+        future = asyncio.ensure_future(self._load(key, loader, is_negative, stale))
+        self._inflight[key] = future
+        # Nobody may be left to await it: a background refresh never has a waiter, and every caller
+        # of a shielded load can be cancelled. Retrieve the outcome so a failure isn't reported as lost.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return future
+
+    async def _load(self, key, loader, is_negative, stale=None) -> Any:
+        try:
+            value = await loader()
+        except Exception as e:
+            if stale is not None:
+                _, stale_until, stale_value, _ = stale
+                retry_at = time.monotonic() + self.negative_ttl
+                self._entries[key] = (min(retry_at, stale_until), stale_until, stale_value, None)
+            elif self.negative_ttl > 0 and not isinstance(e, self.uncached_errors):
+                expires_at = time.monotonic() + self.negative_ttl
+                self._entries[key] = (expires_at, expires_at, None, _CachedError.of(e))
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        now = time.monotonic()
+        if is_negative is not None and is_negative(value):
+            if self.negative_ttl > 0:
+                self._entries[key] = (now + self.negative_ttl, now + self.negative_ttl, value, None)
+            else:
+                self._entries.pop(key, None)
+        elif self.ttl > 0:
+            self._entries[key] = (now + self.ttl, now + self.ttl + self.stale_ttl, value, None)
+        return value
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
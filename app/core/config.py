@@ -0,0 +1,137 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Gemini
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")  # override the API endpoint, e.g. benchmarks/stubs.py
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))  # in-flight calls per worker
+GEMINI_QUEUE_TIMEOUT = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "30"))  # seconds to wait for a free slot
+GEMINI_STRUCTURED_OUTPUT = _env_bool("GEMINI_STRUCTURED_OUTPUT", True)  # constrain replies to GeneratedListing JSON
+GEMINI_STREAMING = _env_bool("GEMINI_STREAMING", True)  # start keyword/price stages while the copy is generated
+GEMINI_PACK_SIZE = int(os.getenv("GEMINI_PACK_SIZE", "8"))  # images per packed request (bulk analysis)
+GEMINI_PACK_LINGER = float(os.getenv("GEMINI_PACK_LINGER", "0.5"))  # seconds a partial pack waits for more images
+GEMINI_PACK_RETRIES = int(os.getenv("GEMINI_PACK_RETRIES", "2"))  # re-sends of images whose entries failed
+
+# Image analysis cache
+ANALYSIS_CACHE_ENABLED = _env_bool("ANALYSIS_CACHE_ENABLED", True)
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "512"))  # in-memory LRU entries
+ANALYSIS_CACHE_PERCEPTUAL = _env_bool("ANALYSIS_CACHE_PERCEPTUAL", True)  # match re-encoded/resized copies
+
+# Google keyword competition lookups
+GOOGLE_COUNT_CACHE_SIZE = int(os.getenv("GOOGLE_COUNT_CACHE_SIZE", "1024"))
+GOOGLE_COUNT_CACHE_TTL = float(os.getenv("GOOGLE_COUNT_CACHE_TTL", "300"))  # seconds
+GOOGLE_COUNT_NEGATIVE_TTL = float(os.getenv("GOOGLE_COUNT_NEGATIVE_TTL", "30"))  # failures and zero counts; queries the scheduler dropped are not cached
+KEYWORD_STORE_ENABLED = _env_bool("KEYWORD_STORE_ENABLED", True)  # competition counts persisted in the database
+KEYWORD_STORE_MAX_AGE = float(os.getenv("KEYWORD_STORE_MAX_AGE", str(30 * 86400)))  # older entries are looked up again
+KEYWORD_STORE_TIMEOUT = float(os.getenv("KEYWORD_STORE_TIMEOUT", "1"))  # seconds; on timeout every keyword goes to CSE
+KEYWORD_REFRESH_AGE = float(os.getenv("KEYWORD_REFRESH_AGE", str(7 * 86400)))  # entries older than this get refreshed
+KEYWORD_REFRESH_INTERVAL = float(os.getenv("KEYWORD_REFRESH_INTERVAL", "60"))  # seconds between passes; 0 disables
+KEYWORD_REFRESH_BATCH = int(os.getenv("KEYWORD_REFRESH_BATCH", "10"))  # CSE queries per pass
+KEYWORD_REFRESH_LEASE = float(os.getenv("KEYWORD_REFRESH_LEASE", "300"))  # seconds before a failed refresh is retried
+
+# Reuse of keywords and prices from near-identical stored products (in-memory index per worker)
+SIMILAR_PRODUCTS_ENABLED = _env_bool("SIMILAR_PRODUCTS_ENABLED", True)
+SIMILAR_PRODUCT_THRESHOLD = float(os.getenv("SIMILAR_PRODUCT_THRESHOLD", "0.9"))  # cosine similarity of title/attribute vectors
+SIMILAR_PRODUCT_TIMEOUT = float(os.getenv("SIMILAR_PRODUCT_TIMEOUT", "1"))  # seconds to load the match; then scored as usual
+SIMILAR_INDEX_DIM = int(os.getenv("SIMILAR_INDEX_DIM", "128"))  # hashed features per product; one int8 each
+SIMILAR_INDEX_TABLES = int(os.getenv("SIMILAR_INDEX_TABLES", "16"))  # LSH tables; more find more matches, cost more memory
+SIMILAR_INDEX_BITS = int(os.getenv("SIMILAR_INDEX_BITS", "20"))  # hyperplanes per table (at most 32); more give smaller buckets
+SIMILAR_INDEX_PROBES = int(os.getenv("SIMILAR_INDEX_PROBES", "3"))  # neighbouring buckets also searched per table
+SIMILAR_INDEX_SYNC_INTERVAL = float(os.getenv("SIMILAR_INDEX_SYNC_INTERVAL", "60"))  # seconds between pulls of other workers' products
+SIMILAR_INDEX_SYNC_OVERLAP = int(os.getenv("SIMILAR_INDEX_SYNC_OVERLAP", "1000"))  # ids below the newest pulled one re-checked for late commits
+
+# Shared outbound HTTP client
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # seconds an idle connection is kept
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))  # read/write/pool timeout, seconds
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP2_ENABLED = _env_bool("HTTP2_ENABLED", True)  # used only when the h2 package is installed
+
+# Post-analysis pipeline stage budgets (seconds)
+KEYWORD_STAGE_TIMEOUT = float(os.getenv("KEYWORD_STAGE_TIMEOUT", "8"))
+PRICE_STAGE_TIMEOUT = float(os.getenv("PRICE_STAGE_TIMEOUT", "8"))
+DB_SAVE_TIMEOUT = float(os.getenv("DB_SAVE_TIMEOUT", "10"))
+BACKGROUND_DB_SAVE = _env_bool("BACKGROUND_DB_SAVE", False)  # opt in: save after the response is sent (db_saved is then null)
+
+# Batch analysis
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))  # products processed concurrently per batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(256 * 1024 * 1024)))  # whole multipart body
+BATCH_SPOOL_BYTES = int(os.getenv("BATCH_SPOOL_BYTES", str(64 * 1024)))  # per upload in memory; the rest goes to a temp file
+BATCH_PACKED = _env_bool("BATCH_PACKED", False)  # default for ?packed= on the batch endpoint
+
+# Image preprocessing before Gemini
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))  # longest side sent to the model, pixels
+IMAGE_OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "JPEG").upper()  # JPEG or WEBP
+IMAGE_OUTPUT_QUALITY = int(os.getenv("IMAGE_OUTPUT_QUALITY", "85"))
+IMAGE_PREPROCESS_WORKERS = int(os.getenv("IMAGE_PREPROCESS_WORKERS", "2"))  # processes; 0 runs inline
+
+# Catalog listing and export
+PRODUCT_PAGE_MAX_LIMIT = int(os.getenv("PRODUCT_PAGE_MAX_LIMIT", "200"))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))  # rows fetched per cursor round trip
+
+# Google Custom Search (shared by keyword competition and price lookups)
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
+GOOGLE_CSE_ENDPOINT = os.getenv("GOOGLE_CSE_ENDPOINT", "https://www.googleapis.com/customsearch/v1")
+# Rate, burst and 429 backoff are enforced per process: each one gets 1/CSE_PROCESSES of the rate and burst.
+# The daily budget is counted in the cse_quota_usage table, shared by all processes.
+CSE_PROCESSES = int(os.getenv("CSE_PROCESSES", "1"))  # uvicorn workers + job workers sharing the API key
+CSE_RATE_PER_SECOND = float(os.getenv("CSE_RATE_PER_SECOND", "5"))  # token bucket refill rate, all processes together
+CSE_BURST = int(os.getenv("CSE_BURST", "10"))  # token bucket capacity, all processes together
+CSE_DAILY_BUDGET = int(os.getenv("CSE_DAILY_BUDGET", "10000"))  # queries per Pacific-time day, all processes together
+CSE_BUDGET_BLOCK = int(os.getenv("CSE_BUDGET_BLOCK", "10"))  # queries a process reserves per database round trip
+CSE_BUDGET_TIMEOUT = float(os.getenv("CSE_BUDGET_TIMEOUT", "1"))  # seconds; then the process counts its 1/CSE_PROCESSES share locally
+CSE_MAX_QUEUE_WAIT = float(os.getenv("CSE_MAX_QUEUE_WAIT", "5"))  # seconds before a queued query is dropped
+CSE_MAX_QUEUE = int(os.getenv("CSE_MAX_QUEUE", "200"))
+CSE_BACKOFF_BASE = float(os.getenv("CSE_BACKOFF_BASE", "1"))  # first pause after a 429, doubles per repeat
+CSE_BACKOFF_MAX = float(os.getenv("CSE_BACKOFF_MAX", "60"))
+
+# Bulk keyword scoring endpoint
+SEO_MAX_KEYWORDS = int(os.getenv("SEO_MAX_KEYWORDS", "100000"))  # per request
+SEO_MAX_TOP_K = int(os.getenv("SEO_MAX_TOP_K", "1000"))
+SEO_MAX_GOOGLE_KEYWORDS = int(os.getenv("SEO_MAX_GOOGLE_KEYWORDS", "15"))  # CSE queries per request
+# combined_score = w * heuristic + (1 - w) * (1 - competition); stored scores are refreshed with app.db.rescore
+SEO_HEURISTIC_WEIGHT = float(os.getenv("SEO_HEURISTIC_WEIGHT", "0.6"))
+SEO_COMPETITION_LOG_MIN = float(os.getenv("SEO_COMPETITION_LOG_MIN", "1"))  # log10(results) scored 0.0
+SEO_COMPETITION_LOG_MAX = float(os.getenv("SEO_COMPETITION_LOG_MAX", "9"))  # log10(results) scored 1.0
+SEO_DIFFICULTY_MEDIUM = int(os.getenv("SEO_DIFFICULTY_MEDIUM", "1000"))  # results from which difficulty is "medium"
+SEO_DIFFICULTY_HIGH = int(os.getenv("SEO_DIFFICULTY_HIGH", "100000"))  # ... and "high"
+SEO_CLUSTER_SIMILARITY = float(os.getenv("SEO_CLUSTER_SIMILARITY", "0.8"))  # stem-set Jaccard at which keywords share one CSE query
+
+# Market price lookups (keyed by normalized category + title)
+PRICE_CACHE_SIZE = int(os.getenv("PRICE_CACHE_SIZE", "2048"))
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", "21600"))  # seconds served without a refresh
+PRICE_CACHE_STALE_TTL = float(os.getenv("PRICE_CACHE_STALE_TTL", "604800"))  # then served while refreshing
+PRICE_CACHE_NEGATIVE_TTL = float(os.getenv("PRICE_CACHE_NEGATIVE_TTL", "300"))  # "no prices found" and failures other than scheduler drops
+
+# Asynchronous analysis jobs (Postgres-backed queue)
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))  # jobs processed at once per worker process
+JOB_WORKERS_IN_API = _env_bool("JOB_WORKERS_IN_API", True)  # False when running dedicated worker processes
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "120"))  # lease per attempt; seconds
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "10"))  # before the 2nd attempt, doubling after
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))  # idle wait between claims
+
+# Database connection pool (DATABASE_URL is required; read when the engine is first used)
+DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; keep below server/proxy idle timeouts
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))  # asyncpg; 0 behind pgbouncer (transaction mode)
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", "0"))  # connections opened before the worker reports ready
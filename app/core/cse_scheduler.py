@@ -0,0 +1,282 @@
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime, timezone
+from typing import Optional
+from app.core.config import (
+    GOOGLE_API_KEY,
+    GOOGLE_CSE_ID,
+    GOOGLE_CSE_ENDPOINT,
+    CSE_PROCESSES,
+    CSE_RATE_PER_SECOND,
+    CSE_BURST,
+    CSE_DAILY_BUDGET,
+    CSE_BUDGET_BLOCK,
+    CSE_BUDGET_TIMEOUT,
+    CSE_MAX_QUEUE_WAIT,
+    CSE_MAX_QUEUE,
+    CSE_BACKOFF_BASE,
+    CSE_BACKOFF_MAX,
+)
+from app.core.http_client import get_http_client
+from app.core.metrics import CSE_RESPONSES, register_stats, track_stage
+from app.db.crud import reserve_cse_quota
+from app.db.database import async_session
+
+try:
+    from zoneinfo import ZoneInfo
+    _QUOTA_TZ = ZoneInfo("America/Los_Angeles")  # Google resets CSE quota at midnight Pacific
+except Exception:
+    _QUOTA_TZ = timezone.utc
+
+# Lower value = served first
+PRIORITY_PRICE = 0
+PRIORITY_KEYWORD = 10  # + keyword position, so the 1st keyword beats the 12th
+PRIORITY_BACKGROUND = 100
+
+_SHARED_BUDGET_RETRY = 60.0  # seconds of local counting after the shared budget was unreachable
+
+
+class CSEDroppedError(Exception):
+    """The query was not sent: daily budget spent, queue full, or queued too long."""
+
+
+class CSEScheduler:
+    """
+    Token-bucket gate for Google Custom Search traffic.
+
+    Queries take a token if one is free; otherwise they wait in a priority queue
+    served by a single pump task. A 429 pauses all traffic with exponential
+    backoff, and nothing is sent once the daily budget is spent.
+
+    The bucket and the backoff are per process. The daily budget is shared:
+    each process reserves it in blocks of budget_block from cse_quota_usage,
+    and falls back to its 1/processes share, counted locally, while the
+    database is unreachable.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        daily_budget: int,
+        max_queue_wait: float,
+        max_queue: int,
+        processes: int = 1,
+        budget_block: int = 1,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.daily_budget = daily_budget
+        self.processes = processes
+        self.budget_block = budget_block
+        self.max_queue_wait = max_queue_wait
+        self.max_queue = max_queue
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._pump_task: Optional[asyncio.Task] = None
+        self._paused_until = 0.0
+        self._consecutive_429 = 0
+        self._quota_day = self._today()
+        self._used_today = 0  # sent by this process
+        self._reserved = 0  # reserved in the shared count and not sent yet
+        self._shared_used: Optional[int] = None  # shared count after our last reservation
+        self._local_until = 0.0  # counting locally until then
+        self._reserve_lock = asyncio.Lock()
+
+        self.counters = {
+            "granted": 0,
+            "queued": 0,
+            "dropped_budget": 0,
+            "dropped_queue_full": 0,
+            "dropped_timeout": 0,
+            "throttled_429": 0,
+        }
+
+    @staticmethod
+    def _today():
+        return datetime.now(_QUOTA_TZ).date()
+
+    def _roll_quota_day(self):
+        today = self._today()
+        if today != self._quota_day:
+            self._quota_day = today
+            self._used_today = 0
+            self._reserved = 0
+            self._shared_used = None
+
+    async def _reserve(self) -> int:
+        if time.monotonic() >= self._local_until:
+            try:
+                async with async_session() as db:
+                    granted, self._shared_used = await asyncio.wait_for(
+                        reserve_cse_quota(db, self._quota_day, self.budget_block, self.daily_budget),
+                        timeout=CSE_BUDGET_TIMEOUT,
+                    )
+                return granted
+            except Exception as e:
+                print(f"⚠️ Shared CSE budget unavailable, counting this process's share locally: {e}")
+                self._local_until = time.monotonic() + _SHARED_BUDGET_RETRY
+        share = self.daily_budget // self.processes
+        return max(0, min(self.budget_block, share - self._used_today))
+
+    async def _budget_left(self) -> bool:
+        self._roll_quota_day()
+        if self._reserved > 0:
+            return True
+        async with self._reserve_lock:
+            self._roll_quota_day()
+            if self._reserved <= 0:  # unless a concurrent caller just reserved
+                self._reserved = await self._reserve()
+        return self._reserved > 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self):
+        self._tokens -= 1
+        self._reserved -= 1
+        self._used_today += 1
+        self.counters["granted"] += 1
+
+    async def acquire(self, priority: int = PRIORITY_KEYWORD):
+        """Wait for permission to send one query; raises CSEDroppedError if it won't be sent."""
+        if not await self._budget_left():
+            self.counters["dropped_budget"] += 1
+            raise CSEDroppedError("Daily Custom Search budget exhausted")
+
+        self._refill()
+        # No await between the budget check and _take, so the reservation can't be spent meanwhile
+        if not self._waiters and time.monotonic() >= self._paused_until and self._tokens >= 1:
+            self._take()
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.counters["dropped_queue_full"] += 1
+            raise CSEDroppedError("Custom Search queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        self.counters["queued"] += 1
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+
+        try:
+            await asyncio.wait({future}, timeout=self.max_queue_wait)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        if not future.done():
+            future.cancel()
+            self.counters["dropped_timeout"] += 1
+            raise CSEDroppedError(f"Queued for more than {self.max_queue_wait}s")
+        future.result()  # raises if the pump dropped us
+
+    async def _pump(self):
+        while self._waiters:
+            if self._waiters[0][2].done():  # caller timed out or was cancelled
+                heapq.heappop(self._waiters)
+                continue
+
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+
+            if not await self._budget_left():
+                while self._waiters:
+                    _, _, future = heapq.heappop(self._waiters)
+                    if not future.done():
+                        self.counters["dropped_budget"] += 1
+                        future.set_exception(CSEDroppedError("Daily Custom Search budget exhausted"))
+                break
+
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():  # gave up while the budget was being reserved
+                continue
+            self._take()
+            future.set_result(None)
+
+    def report_throttled(self, retry_after: Optional[float] = None):
+        """Pause all traffic after a 429, doubling the pause on each consecutive one."""
+        self.counters["throttled_429"] += 1
+        backoff = min(CSE_BACKOFF_MAX, CSE_BACKOFF_BASE * (2 ** self._consecutive_429))
+        self._consecutive_429 += 1
+        if retry_after is not None:
+            backoff = max(backoff, retry_after)
+        self._paused_until = max(self._paused_until, time.monotonic() + backoff)
+
+    def report_success(self):
+        self._consecutive_429 = 0
+
+    def _budget_remaining(self) -> int:
+        if self._shared_used is None:  # nothing reserved from the shared count yet today
+            return max(0, self.daily_budget // self.processes - self._used_today)
+        return max(0, self.daily_budget - self._shared_used) + self._reserved
+
+    def stats(self) -> dict:
+        self._roll_quota_day()
+        self._refill()
+        return {
+            **self.counters,
+            "queue_depth": sum(1 for _, _, f in self._waiters if not f.done()),
+            "tokens_available": round(self._tokens, 2),
+            "used_today": self._used_today,
+            "budget_reserved": self._reserved,
+            "budget_remaining": self._budget_remaining(),
+            "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 2),
+        }
+
+
+scheduler = CSEScheduler(
+    rate=CSE_RATE_PER_SECOND / CSE_PROCESSES,
+    burst=max(1, CSE_BURST // CSE_PROCESSES),
+    daily_budget=CSE_DAILY_BUDGET,
+    max_queue_wait=CSE_MAX_QUEUE_WAIT,
+    max_queue=CSE_MAX_QUEUE,
+    processes=CSE_PROCESSES,
+    budget_block=CSE_BUDGET_BLOCK,
+)
+register_stats("cse_scheduler", scheduler.stats)
+
+
+def _retry_after(resp) -> Optional[float]:
+    try:
+        return float(resp.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def cse_search(query: str, num: int = 1, priority: int = PRIORITY_KEYWORD) -> dict:
+    """
+    Run one Custom Search query through the shared scheduler.
+
+    Raises RuntimeError if credentials are missing, CSEDroppedError if the
+    scheduler refuses the query, and httpx.HTTPStatusError on API errors.
+    """
+    if not GOOGLE_API_KEY or not GOOGLE_CSE_ID:
+        raise RuntimeError("Google API key or CSE ID not configured")
+
+    with track_stage("cse_queue"):
+        await scheduler.acquire(priority)
+    params = {"key": GOOGLE_API_KEY, "cx": GOOGLE_CSE_ID, "q": query, "num": num}
+    with track_stage("cse_request"):
+        resp = await get_http_client().get(GOOGLE_CSE_ENDPOINT, params=params)
+    CSE_RESPONSES.labels(str(resp.status_code)).inc()
+    if resp.status_code == 429:
+        scheduler.report_throttled(_retry_after(resp))
+    else:
+        scheduler.report_success()
+    resp.raise_for_status()
+    return resp.json()
@@ -0,0 +1,103 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+
+# Seconds; spans cache hits (ms) up to a slow Gemini call
+_STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "analyzer_stage_seconds", "Time spent in each analyzer pipeline stage", ["stage"], buckets=_STAGE_BUCKETS
+)
+STAGE_FALLBACKS = Counter(
+    "analyzer_stage_fallbacks_total", "Stages that used their fallback result", ["stage", "reason"]
+)
+CACHE_LOOKUPS = Counter(
+    "analyzer_cache_lookups_total", "Cache lookups by cache and outcome", ["cache", "result"]
+)
+GEMINI_ERRORS = Counter("gemini_errors_total", "Failed Gemini analyses", ["kind"])  # busy | api | parse
+CSE_RESPONSES = Counter("cse_responses_total", "Custom Search responses by HTTP status", ["status"])
+
+# (stage, seconds) for the current request; None outside a request (e.g. job workers)
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """Time the enclosed block into STAGE_SECONDS and the request's Server-Timing header."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def format_server_timing(timings: List[Tuple[str, float]], total: float) -> str:
+    # Repeated stages (one per CSE request, say) are summed; desc carries the count
+    durations: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    for stage, seconds in timings:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+        counts[stage] = counts.get(stage, 0) + 1
+    entries = [
+        f'{stage};dur={seconds * 1000:.1f}' + (f';desc="x{counts[stage]}"' if counts[stage] > 1 else "")
+        for stage, seconds in durations.items()
+    ]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware adding a Server-Timing header with every tracked stage.
+
+    Stages are collected through a context variable, so tasks spawned while
+    handling the request (asyncio.gather, create_task) report into it too.
+    Stages that finish after the headers are sent (background tasks, streamed
+    bodies) only reach the histograms.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                header = format_server_timing(timings, time.perf_counter() - started)
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+
+
+class _StatsCollector:
+    # Exposes a stats() dict (e.g. the CSE scheduler's) as gauges at scrape time
+    def __init__(self, prefix: str, stats: Callable[[], dict]):
+        self.prefix = prefix
+        self.stats = stats
+
+    def collect(self):
+        for key, value in self.stats().items():
+            if isinstance(value, (int, float)):
+                yield GaugeMetricFamily(f"{self.prefix}_{key}", f"{self.prefix} {key.replace('_', ' ')}", value=value)
+
+
+def register_stats(prefix: str, stats: Callable[[], dict]):
+    REGISTRY.register(_StatsCollector(prefix, stats))
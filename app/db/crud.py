@@ -1,28 +1,383 @@
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import insert, update, func, literal, or_, DateTime
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from .models import Product, Keyword
-
-async def save_product_result(db: AsyncSession, title: str, description: str, attributes: dict, keywords: list):
-    product = Product(title=title, description=description, attributes=attributes)
-    db.add(product)
-    await db.flush()  # Get ID
-
-    for k in keywords:
-        keyword = Keyword(
-            product_id=product.id,
-            keyword=k["keyword"],
-            heuristic_score=k.get("heuristic_score"),
-            google_total_results=k.get("google_total_results", 0),
-            google_competition_score=k.get("google_competition_score", 0.0),
-            google_difficulty=k.get("google_difficulty", "unknown"),
-            combined_score=k.get("combined_score", 0.0)
+from sqlalchemy.orm import selectinload
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from .models import Product, Keyword, KeywordTerm, KeywordCompetition, AnalysisCacheEntry, AnalysisJob, CSEQuotaUsage
+
+def normalize_keyword(keyword: str) -> str:
+    # Migration 0002 backfilled keyword_terms with this same rule; keep them in step
+    return " ".join(str(keyword).lower().split())
+
+def _upsert(db: AsyncSession, model):
+    # INSERT that supports ON CONFLICT on both Postgres and SQLite
+    dialect = db.get_bind().dialect.name
+    return (sqlite.insert if dialect == "sqlite" else postgresql.insert)(model)
+
+async def upsert_keyword_terms(db: AsyncSession, terms: Dict[str, str]) -> Dict[str, int]:
+    """
+    Ensure every normalized term has a keyword_terms row; returns term -> id.
+
+    terms maps each term to a display spelling, stored only when the term is
+    new: the first spelling a term was generated with is the one shown.
+    """
+    unique_terms = sorted(set(terms))  # fixed order keeps concurrent upserts from deadlocking
+    if not unique_terms:
+        return {}
+
+    stmt = (
+        _upsert(db, KeywordTerm)
+        .values([{"term": t, "display": terms[t]} for t in unique_terms])
+        .on_conflict_do_nothing(index_elements=[KeywordTerm.term])
+        .returning(KeywordTerm.id, KeywordTerm.term)
+    )
+    term_ids = {term: term_id for term_id, term in (await db.execute(stmt)).all()}
+
+    # DO NOTHING returns only the rows it inserted; most terms already exist
+    existing = [t for t in unique_terms if t not in term_ids]
+    if existing:
+        result = await db.execute(
+            select(KeywordTerm.id, KeywordTerm.term).where(KeywordTerm.term.in_(existing))
         )
-        db.add(keyword)
+        term_ids.update({term: term_id for term_id, term in result.all()})
+    return term_ids
+
+async def save_product_result(
+    db: AsyncSession, title: str, description: str, attributes: dict, keywords: list, price_range: Optional[dict] = None
+):
+    result = await db.execute(
+        insert(Product)
+        .values(title=title, description=description, attributes=attributes, price_range=price_range)
+        .returning(Product.id)
+    )
+    product_id = result.scalar_one()
+
+    if keywords:
+        terms = [normalize_keyword(k["keyword"]) for k in keywords]
+        displays = {}
+        for k, term in zip(keywords, terms):
+            displays.setdefault(term, k["keyword"])
+        term_ids = await upsert_keyword_terms(db, displays)
+        # One executemany for all rows instead of an ORM object per keyword
+        await db.execute(insert(Keyword), [
+            {
+                "product_id": product_id,
+                "term_id": term_ids[term],
+                "heuristic_score": k.get("heuristic_score"),
+                "google_total_results": k.get("google_total_results", 0),
+                "google_competition_score": k.get("google_competition_score", 0.0),
+                "google_difficulty": k.get("google_difficulty", "unknown"),
+                "combined_score": k.get("combined_score", 0.0),
+            }
+            for k, term in zip(keywords, terms)
+        ])
 
     await db.commit()
-    await db.refresh(product)
-    return product.id
+    return product_id
+
+async def get_products_by_keyword(db: AsyncSession, keyword: str) -> List[Product]:
+    result = await db.execute(
+        select(Product)
+        .join(Keyword, Keyword.product_id == Product.id)
+        .join(KeywordTerm, KeywordTerm.id == Keyword.term_id)
+        .where(KeywordTerm.term == normalize_keyword(keyword))
+        .distinct()
+    )
+    return result.scalars().all()
+
+async def get_product(db: AsyncSession, product_id: int) -> Optional[Product]:
+    """One product with its keywords loaded."""
+    result = await db.execute(
+        select(Product).options(selectinload(Product.keywords)).where(Product.id == product_id)
+    )
+    return result.scalar_one_or_none()
+
+async def list_product_texts(db: AsyncSession, after_id: int = 0, limit: int = 10000) -> list:
+    """(id, title, attributes) of the next `limit` products after after_id, in id order."""
+    result = await db.execute(
+        select(Product.id, Product.title, Product.attributes)
+        .where(Product.id > after_id)
+        .order_by(Product.id)
+        .limit(limit)
+    )
+    return result.all()
 
 async def get_all_products(db: AsyncSession):
-    result = await db.execute(select(Product))
+    result = await db.execute(select(Product).options(selectinload(Product.keywords)))
+    return result.scalars().all()
+
+def _products_query(category: Optional[str] = None):
+    stmt = select(Product).options(selectinload(Product.keywords)).order_by(Product.id)
+    if category:
+        stmt = stmt.where(func.lower(Product.attributes["category"].as_string()) == category.lower())
+    return stmt
+
+async def list_products(db: AsyncSession, after_id: Optional[int] = None, limit: int = 50, category: Optional[str] = None) -> List[Product]:
+    """One keyset page: products with id > after_id, keywords loaded in a single extra query."""
+    stmt = _products_query(category).limit(limit)
+    if after_id is not None:
+        stmt = stmt.where(Product.id > after_id)
+    result = await db.execute(stmt)
     return result.scalars().all()
+
+async def stream_products(db: AsyncSession, category: Optional[str] = None, chunk_size: int = 1000) -> AsyncIterator[List[Product]]:
+    """
+    Yield the catalog in chunks of chunk_size off a server-side cursor.
+
+    The session's identity map holds weak references, so each chunk is freed
+    once the caller drops it and memory stays flat regardless of table size.
+    """
+    result = await db.stream(_products_query(category).execution_options(yield_per=chunk_size))
+    async for chunk in result.scalars().partitions():
+        yield chunk
+
+async def get_cached_analysis(db: AsyncSession, content_hash: str) -> Optional[dict]:
+    result = await db.execute(
+        select(AnalysisCacheEntry.result).where(AnalysisCacheEntry.content_hash == content_hash)
+    )
+    return result.scalar_one_or_none()
+
+async def get_perceptual_candidates(db: AsyncSession, perceptual_hashes: List[str], limit: int) -> List[Tuple[Optional[str], dict]]:
+    """(image_signature, result) of cached analyses with any of these perceptual hashes, newest first."""
+    result = await db.execute(
+        select(AnalysisCacheEntry.image_signature, AnalysisCacheEntry.result)
+        .where(AnalysisCacheEntry.perceptual_hash.in_(perceptual_hashes))
+        .order_by(AnalysisCacheEntry.id.desc())
+        .limit(limit)
+    )
+    return [tuple(row) for row in result.all()]
+
+async def save_cached_analysis(db: AsyncSession, content_hash: str, perceptual_hash: Optional[str], image_signature: Optional[str], analysis: dict):
+    result = await db.execute(
+        select(AnalysisCacheEntry).where(AnalysisCacheEntry.content_hash == content_hash)
+    )
+    entry = result.scalar_one_or_none()
+    if entry is None:
+        db.add(AnalysisCacheEntry(
+            content_hash=content_hash, perceptual_hash=perceptual_hash, image_signature=image_signature, result=analysis
+        ))
+    else:
+        entry.perceptual_hash = perceptual_hash
+        entry.image_signature = image_signature
+        entry.result = analysis
+    await db.commit()
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+async def enqueue_analysis_job(db: AsyncSession, image: bytes, refresh: bool = False) -> str:
+    job = AnalysisJob(image=image, refresh=refresh, status="queued", available_at=_utcnow())
+    db.add(job)
+    await db.commit()
+    return job.id
+
+async def get_analysis_job(db: AsyncSession, job_id: str) -> Optional[AnalysisJob]:
+    return await db.get(AnalysisJob, job_id)
+
+async def claim_analysis_job(db: AsyncSession, worker_id: str, lease_seconds: float) -> Optional[AnalysisJob]:
+    """
+    Atomically take the oldest runnable job and lease it to worker_id.
+
+    Runnable means queued and due, or running with an expired lease (its worker
+    died or stalled). FOR UPDATE SKIP LOCKED lets many workers poll the same
+    table without blocking on, or double-claiming, each other's rows.
+    """
+    now = _utcnow()
+    candidate = (
+        select(AnalysisJob.id)
+        .where(AnalysisJob.status.in_(("queued", "running")), AnalysisJob.available_at <= now)
+        .order_by(AnalysisJob.available_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(AnalysisJob)
+        .where(AnalysisJob.id == candidate)
+        .values(
+            status="running",
+            worker_id=worker_id,
+            attempts=AnalysisJob.attempts + 1,
+            available_at=now + timedelta(seconds=lease_seconds),
+        )
+        .returning(AnalysisJob)
+        .execution_options(synchronize_session=False)
+    )
+    job = result.scalars().first()
+    await db.commit()
+    return job
+
+async def finish_analysis_job(
+    db: AsyncSession,
+    job_id: str,
+    worker_id: str,
+    result: Optional[dict] = None,
+    error: Optional[str] = None,
+    retry_in: Optional[float] = None,
+) -> bool:
+    """
+    Record the outcome of a claimed job: succeeded (result), failed (error) or,
+    with retry_in, back to queued after that many seconds.
+
+    Only applies while worker_id still holds the lease; returns False if the
+    job was meanwhile re-claimed by another worker.
+    """
+    if retry_in is not None:
+        values = {"status": "queued", "error": error, "available_at": _utcnow() + timedelta(seconds=retry_in)}
+    else:
+        values = {"status": "succeeded" if error is None else "failed", "result": result, "error": error, "image": None}
+    updated = await db.execute(
+        update(AnalysisJob)
+        .where(AnalysisJob.id == job_id, AnalysisJob.worker_id == worker_id, AnalysisJob.status == "running")
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return updated.rowcount == 1
+
+async def get_keyword_competition(db: AsyncSession, terms: Iterable[str], max_age: float) -> Dict[str, int]:
+    """Stored Google result counts no older than max_age seconds, by normalized term; one query."""
+    unique_terms = set(terms)
+    if not unique_terms:
+        return {}
+    result = await db.execute(
+        select(KeywordTerm.term, KeywordCompetition.total_results)
+        .join(KeywordCompetition, KeywordCompetition.term_id == KeywordTerm.id)
+        .where(
+            KeywordTerm.term.in_(unique_terms),
+            KeywordCompetition.fetched_at >= _utcnow() - timedelta(seconds=max_age),
+        )
+    )
+    return dict(result.all())
+
+async def record_keyword_competition(
+    db: AsyncSession,
+    counts: Dict[str, int],
+    used: Iterable[str] = (),
+    count_use: bool = True,
+    spellings: Optional[Dict[str, str]] = None,
+):
+    """
+    Store freshly fetched counts (term -> total) and bump usage of `used` terms
+    that were served from the store. With count_use=False (refreshes) only the
+    counts are written. spellings (term -> keyword as generated) is the display
+    form of terms not stored yet; the term itself otherwise.
+    """
+    used = set(used) - counts.keys()
+    spellings = spellings or {}
+    term_ids = await upsert_keyword_terms(db, {t: spellings.get(t, t) for t in [*counts, *used]})
+    now = _utcnow()
+    bump = 1 if count_use else 0
+
+    if counts:
+        stmt = _upsert(db, KeywordCompetition).values([
+            {
+                "term_id": term_ids[term],
+                "total_results": total,
+                "fetched_at": now,
+                "use_count": bump,
+                "last_used_at": now if count_use else None,
+            }
+            for term, total in sorted(counts.items())
+        ])
+        updates = {
+            "total_results": stmt.excluded.total_results,
+            "fetched_at": stmt.excluded.fetched_at,
+            "refreshing_until": None,
+            "use_count": KeywordCompetition.use_count + bump,
+        }
+        if count_use:
+            updates["last_used_at"] = stmt.excluded.last_used_at
+        await db.execute(stmt.on_conflict_do_update(index_elements=[KeywordCompetition.term_id], set_=updates))
+
+    if used and count_use:
+        await db.execute(
+            update(KeywordCompetition)
+            .where(KeywordCompetition.term_id.in_([term_ids[t] for t in used]))
+            .values(use_count=KeywordCompetition.use_count + 1, last_used_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+
+async def claim_stale_keyword_competition(db: AsyncSession, older_than: float, limit: int, lease_seconds: float) -> List[str]:
+    """
+    Lease up to `limit` entries due for a refresh and return their terms.
+
+    Due means fetched more than older_than seconds ago and used since; the most
+    used go first, then the oldest. Leased entries are skipped by other
+    refreshers until the lease runs out, which is also the retry delay after a
+    failed refresh.
+    """
+    now = _utcnow()
+    candidates = (
+        select(KeywordCompetition.term_id)
+        .where(
+            KeywordCompetition.fetched_at < now - timedelta(seconds=older_than),
+            KeywordCompetition.last_used_at > KeywordCompetition.fetched_at,
+            or_(KeywordCompetition.refreshing_until.is_(None), KeywordCompetition.refreshing_until < now),
+        )
+        .order_by(KeywordCompetition.use_count.desc(), KeywordCompetition.fetched_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = await db.execute(
+        update(KeywordCompetition)
+        .where(KeywordCompetition.term_id.in_(candidates))
+        .values(refreshing_until=now + timedelta(seconds=lease_seconds))
+        .returning(KeywordCompetition.term_id)
+        .execution_options(synchronize_session=False)
+    )
+    term_ids = claimed.scalars().all()
+    await db.commit()
+    if not term_ids:
+        return []
+    result = await db.execute(select(KeywordTerm.term).where(KeywordTerm.id.in_(term_ids)))
+    return result.scalars().all()
+
+async def backfill_keyword_competition(db: AsyncSession, fetched_at: datetime) -> int:
+    """
+    Seed the store from counts already saved with products, one row per term.
+
+    Those rows carry no fetch time, so they get `fetched_at` (callers pass a
+    time old enough to queue them for a refresh); use_count starts at the
+    number of products using the term. Existing entries are left alone.
+    """
+    source = (
+        select(
+            Keyword.term_id,
+            func.max(Keyword.google_total_results),
+            literal(fetched_at, DateTime(timezone=True)),
+            func.count(),
+            literal(_utcnow(), DateTime(timezone=True)),
+        )
+        .where(Keyword.google_total_results > 0)
+        .group_by(Keyword.term_id)
+    )
+    result = await db.execute(
+        _upsert(db, KeywordCompetition)
+        .from_select(["term_id", "total_results", "fetched_at", "use_count", "last_used_at"], source)
+        .on_conflict_do_nothing(index_elements=[KeywordCompetition.term_id])
+    )
+    await db.commit()
+    return result.rowcount
+
+async def reserve_cse_quota(db: AsyncSession, day: date, amount: int, budget: int) -> Tuple[int, int]:
+    """
+    Atomically reserve up to `amount` of the day's Custom Search budget.
+
+    Returns (granted, used): granted is less than amount when the budget runs
+    out, 0 once it is spent; used is the day's shared count afterwards.
+    """
+    stmt = _upsert(db, CSEQuotaUsage).values(day=day, used=amount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CSEQuotaUsage.day],
+        set_={"used": CSEQuotaUsage.used + amount},
+        where=CSEQuotaUsage.used < budget,  # a spent day is left alone
+    ).returning(CSEQuotaUsage.used)
+    used = (await db.execute(stmt)).scalar_one_or_none()
+    await db.commit()
+    if used is None:
+        return 0, budget
+    return max(0, min(amount, budget - (used - amount))), min(used, budget)
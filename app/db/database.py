@@ -1,21 +1,104 @@
+import asyncio
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
-from dotenv import load_dotenv
-import os
+from app.core.config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_POOL_WARMUP,
+)
 
-load_dotenv()
+_engine: Optional[AsyncEngine] = None
+_sessionmaker: Optional[async_sessionmaker] = None
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-if not DATABASE_URL:
-    raise ValueError("DATABASE_URL is not set!")
 
-engine: AsyncEngine = create_async_engine(DATABASE_URL, echo=False)
+def _build_engine() -> AsyncEngine:
+    if not DATABASE_URL:
+        raise ValueError("DATABASE_URL is not set!")
+
+    url = make_url(DATABASE_URL)
+    options = {"echo": False, "pool_pre_ping": DB_POOL_PRE_PING}
+    if url.get_backend_name() != "sqlite":  # SQLite uses its own single-file pools
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    if url.get_driver_name() == "asyncpg":
+        # asyncpg's own cache plus SQLAlchemy's prepared-statement cache in front of it
+        options["connect_args"] = {
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        }
+    return create_async_engine(url, **options)
+
+
+def get_engine() -> AsyncEngine:
+    """
+    Process-wide engine, created on first use.
+
+    Importing this module no longer connects or validates anything, so tools
+    and workers that never touch the database start without DATABASE_URL.
+    """
+    global _engine, _sessionmaker
+    if _engine is None:
+        _engine = _build_engine()
+        _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False, class_=AsyncSession)
+    return _engine
+
+
+def async_session() -> AsyncSession:
+    """New session from the shared engine; use as `async with async_session() as db:`."""
+    if _sessionmaker is None:
+        get_engine()
+    return _sessionmaker()
 
-async_session = async_sessionmaker(
-    engine,
-    expire_on_commit=False,
-    class_=AsyncSession
-)
 
 async def get_db():
     async with async_session() as session:
         yield session
+
+
+async def start_db(warmup: int = DB_POOL_WARMUP):
+    """
+    Create the engine and optionally open `warmup` pooled connections up front.
+
+    Called from the app lifespan, so a worker only reports ready once it can
+    reach the database and its first requests don't pay for connection setup.
+    """
+    engine = get_engine()
+    if warmup <= 0:
+        return
+
+    async def _checkout():
+        conn = await engine.connect().start()
+        try:
+            await conn.execute(text("SELECT 1"))
+        except Exception:
+            await conn.close()
+            raise
+        return conn
+
+    # Check all of them out at once so the pool ends up holding `warmup` distinct connections
+    results = await asyncio.gather(*(_checkout() for _ in range(warmup)), return_exceptions=True)
+    for result in results:
+        if not isinstance(result, BaseException):
+            await result.close()
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        raise errors[0]
+
+
+async def close_db():
+    global _engine, _sessionmaker
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        _sessionmaker = None
@@ -1,12 +1,40 @@
 import asyncio
-from .database import engine
-from .models import Base
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from app.core.config import KEYWORD_REFRESH_AGE
+from .crud import backfill_keyword_competition
+from .database import get_engine, async_session
+
+_ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+def _migrate(sync_conn):
+    """
+    Upgrade the schema to the latest migration (app/db/migrations).
+
+    Databases created before migrations existed have no alembic_version
+    table; they are stamped at the baseline (0001) and upgraded from there.
+    """
+    config = Config(str(_ALEMBIC_INI))
+    config.attributes["connection"] = sync_conn
+    inspector = inspect(sync_conn)
+    if not inspector.has_table("alembic_version") and inspector.has_table("products"):
+        command.stamp(config, "0001")
+        print("✅ Existing database stamped at the baseline revision")
+    command.upgrade(config, "head")
 
 async def init_db():
-    async with engine.begin() as conn:
-        # Create all tables defined in models.py
-        await conn.run_sync(Base.metadata.create_all)
-    print("✅ Database tables created successfully!")
+    async with get_engine().begin() as conn:
+        await conn.run_sync(_migrate)
+    print("✅ Database schema is up to date!")
+
+    # Counts saved with earlier products seed the keyword store; dated so the refresher picks them up
+    async with async_session() as db:
+        seeded = await backfill_keyword_competition(db, datetime.now(timezone.utc) - timedelta(seconds=KEYWORD_REFRESH_AGE))
+    if seeded:
+        print(f"✅ Seeded {seeded} keywords into the competition store")
 
 if __name__ == "__main__":
     asyncio.run(init_db())
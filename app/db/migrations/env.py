@@ -0,0 +1,43 @@
+"""
+Alembic environment.
+
+init_db passes its own connection in config.attributes["connection"]; the
+alembic CLI gets one from the app's engine (DATABASE_URL). SQLite needs
+batch mode for most ALTERs, so migrations use op.batch_alter_table.
+"""
+import asyncio
+from logging.config import fileConfig
+from alembic import context
+from app.db.models import Base
+
+config = context.config
+target_metadata = Base.metadata
+
+
+def _run_migrations(connection):
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def _run_with_app_engine():
+    from app.db.database import get_engine, close_db
+
+    try:
+        async with get_engine().connect() as conn:
+            await conn.run_sync(_run_migrations)
+            await conn.commit()
+    finally:
+        await close_db()
+
+
+if context.is_offline_mode():
+    raise SystemExit("Offline (--sql) mode is not supported: migration 0002 reads existing keywords")
+
+connection = config.attributes.get("connection")
+if connection is not None:
+    _run_migrations(connection)
+else:
+    if config.config_file_name is not None:
+        fileConfig(config.config_file_name)
+    asyncio.run(_run_with_app_engine())
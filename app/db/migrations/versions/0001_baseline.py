@@ -0,0 +1,51 @@
+"""Baseline: products and keywords as first deployed
+
+Databases created before migrations existed are stamped at this revision by
+init_db, then upgraded.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "products",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("title", sa.String),
+        sa.Column("description", sa.String),
+        sa.Column("attributes", sa.JSON),
+    )
+    op.create_index("ix_products_id", "products", ["id"])
+    op.create_table(
+        "keywords",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("product_id", sa.Integer, sa.ForeignKey("products.id")),
+        sa.Column("keyword", sa.String),
+        sa.Column("heuristic_score", sa.Float),
+        sa.Column("google_total_results", sa.Integer),
+        sa.Column("google_competition_score", sa.Float),
+        sa.Column("google_difficulty", sa.String),
+        sa.Column("combined_score", sa.Float),
+    )
+    op.create_index("ix_keywords_id", "keywords", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("keywords")
+    op.drop_table("products")
@@ -0,0 +1,107 @@
+"""Normalized keyword terms
+
+Moves keyword strings to keyword_terms, one row per lowercased, single-spaced
+keyword, and replaces keywords.keyword with keywords.term_id. Each term keeps
+the spelling it was first stored with (lowest keyword id) for display. Keyword
+rows without a keyword are dropped: they can be neither shown nor looked up.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_CHUNK = 10000
+
+keywords = sa.table(
+    "keywords", sa.column("id", sa.Integer), sa.column("keyword", sa.String), sa.column("term_id", sa.Integer)
+)
+keyword_terms = sa.table("keyword_terms", sa.column("term", sa.String), sa.column("display", sa.String))
+keyword_term_map = sa.table("keyword_term_map", sa.column("keyword", sa.String), sa.column("term", sa.String))
+
+
+def _normalize(keyword: str) -> str:
+    # Same rule as app.db.crud.normalize_keyword at the time of this migration
+    return " ".join(str(keyword).lower().split())
+
+
+def _chunks(rows):
+    for start in range(0, len(rows), _CHUNK):
+        yield rows[start:start + _CHUNK]
+
+
+def _fill_term_ids():
+    bind = op.get_bind()
+    raw = bind.execute(
+        sa.select(keywords.c.keyword).group_by(keywords.c.keyword).order_by(sa.func.min(keywords.c.id))
+    ).scalars().all()
+    displays = {}
+    for keyword in raw:
+        displays.setdefault(_normalize(keyword), keyword)
+    for chunk in _chunks(sorted(displays.items())):
+        bind.execute(keyword_terms.insert(), [{"term": t, "display": d} for t, d in chunk])
+
+    # Map raw keyword -> term in a scratch table, then let the database do the join
+    op.create_table(
+        "keyword_term_map",
+        sa.Column("keyword", sa.String, primary_key=True),
+        sa.Column("term", sa.String, nullable=False),
+    )
+    for chunk in _chunks(raw):
+        bind.execute(keyword_term_map.insert(), [{"keyword": k, "term": _normalize(k)} for k in chunk])
+    op.execute(
+        "UPDATE keywords SET term_id = ("
+        " SELECT keyword_terms.id FROM keyword_term_map"
+        " JOIN keyword_terms ON keyword_terms.term = keyword_term_map.term"
+        " WHERE keyword_term_map.keyword = keywords.keyword)"
+    )
+    op.drop_table("keyword_term_map")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "keyword_terms",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("term", sa.String, nullable=False, unique=True),
+        sa.Column("display", sa.String, nullable=False),
+    )
+    op.execute(keywords.delete().where(keywords.c.keyword.is_(None)))
+    with op.batch_alter_table("keywords") as batch:
+        batch.add_column(sa.Column("term_id", sa.Integer, nullable=True))
+
+    _fill_term_ids()
+
+    with op.batch_alter_table("keywords") as batch:
+        batch.alter_column("term_id", existing_type=sa.Integer, nullable=False)
+        batch.create_foreign_key("fk_keywords_term_id", "keyword_terms", ["term_id"], ["id"])
+        batch.drop_column("keyword")
+    op.create_index("ix_keywords_product_id", "keywords", ["product_id"])
+    op.create_index("ix_keywords_term_product", "keywords", ["term_id", "product_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_keywords_term_product", table_name="keywords")
+    op.drop_index("ix_keywords_product_id", table_name="keywords")
+    with op.batch_alter_table("keywords") as batch:
+        batch.add_column(sa.Column("keyword", sa.String))
+    # Every row of a term gets the term's display spelling back
+    op.execute(
+        "UPDATE keywords SET keyword = (SELECT display FROM keyword_terms WHERE keyword_terms.id = keywords.term_id)"
+    )
+    with op.batch_alter_table("keywords") as batch:
+        batch.drop_constraint("fk_keywords_term_id", type_="foreignkey")
+        batch.drop_column("term_id")
+    op.drop_table("keyword_terms")
@@ -0,0 +1,42 @@
+"""Analysis cache
+
+Gemini results by upload sha256, with the dHash and content signature that
+let near-identical re-uploads reuse them.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "analysis_cache",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("content_hash", sa.String(64), nullable=False),
+        sa.Column("perceptual_hash", sa.String(16)),
+        sa.Column("image_signature", sa.String(112)),
+        sa.Column("result", sa.JSON, nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_analysis_cache_id", "analysis_cache", ["id"])
+    op.create_index("ix_analysis_cache_content_hash", "analysis_cache", ["content_hash"], unique=True)
+    op.create_index("ix_analysis_cache_perceptual_hash", "analysis_cache", ["perceptual_hash"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("analysis_cache")
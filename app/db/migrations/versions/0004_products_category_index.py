@@ -0,0 +1,33 @@
+"""Case-insensitive index on product category
+
+Backs the category filter of the product listing and catalog export.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+products = sa.table("products", sa.column("attributes", sa.JSON))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_products_category", "products", [sa.func.lower(products.c.attributes["category"].as_string())])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # SQLite drops expression indexes when a later batch migration rebuilds products
+    op.drop_index("ix_products_category", table_name="products", if_exists=True)
@@ -0,0 +1,45 @@
+"""Analysis job queue
+
+Jobs submitted to POST /analyze/jobs; workers claim them with FOR UPDATE SKIP
+LOCKED.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "analysis_jobs",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("status", sa.String(16), nullable=False),
+        sa.Column("image", sa.LargeBinary),
+        sa.Column("refresh", sa.Boolean, nullable=False),
+        sa.Column("attempts", sa.Integer, nullable=False),
+        sa.Column("available_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("worker_id", sa.String(128)),
+        sa.Column("result", sa.JSON),
+        sa.Column("error", sa.String),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_analysis_jobs_claim", "analysis_jobs", ["status", "available_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("analysis_jobs")
@@ -0,0 +1,40 @@
+"""Keyword competition store
+
+Google result counts per keyword term, shared by all workers. init_db seeds
+it from counts already saved with products.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "keyword_competition",
+        sa.Column("term_id", sa.Integer, sa.ForeignKey("keyword_terms.id"), primary_key=True),
+        sa.Column("total_results", sa.Integer, nullable=False),
+        sa.Column("fetched_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("use_count", sa.Integer, nullable=False),
+        sa.Column("last_used_at", sa.DateTime(timezone=True)),
+        sa.Column("refreshing_until", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_keyword_competition_fetched", "keyword_competition", ["fetched_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("keyword_competition")
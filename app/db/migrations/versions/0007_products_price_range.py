@@ -0,0 +1,33 @@
+"""Stored price ranges
+
+products.price_range keeps the web price summary found at analysis time, so
+similar products can reuse it. Existing products have none.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("products") as batch:
+        batch.add_column(sa.Column("price_range", sa.JSON))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("products") as batch:
+        batch.drop_column("price_range")
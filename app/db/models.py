@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, JSON
+import uuid
+from sqlalchemy import Column, Integer, String, Float, Boolean, LargeBinary, ForeignKey, JSON, Date, DateTime, Index, func
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -9,16 +11,80 @@ class Product(Base):
     title = Column(String)
     description = Column(String)
     attributes = Column(JSON)
+    price_range = Column(JSON)  # web price summary at analysis time; reused for similar products
     keywords = relationship("Keyword", back_populates="product", cascade="all, delete-orphan")
 
+# Listing filters on attributes->>'category'; indexed case-insensitively
+Index("ix_products_category", func.lower(Product.attributes["category"].as_string()))
+
+class KeywordTerm(Base):
+    __tablename__ = "keyword_terms"
+    id = Column(Integer, primary_key=True)
+    term = Column(String, unique=True, nullable=False)  # normalized: lowercased, single-spaced
+    display = Column(String, nullable=False)  # spelling the term was first generated with
+
 class Keyword(Base):
     __tablename__ = "keywords"
+    __table_args__ = (
+        # "which products use this keyword" is an index-only lookup
+        Index("ix_keywords_term_product", "term_id", "product_id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"))
-    keyword = Column(String)
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
+    term_id = Column(Integer, ForeignKey("keyword_terms.id"), nullable=False)
     heuristic_score = Column(Float)
     google_total_results = Column(Integer)
     google_competition_score = Column(Float)
     google_difficulty = Column(String)
     combined_score = Column(Float)
     product = relationship("Product", back_populates="keywords")
+    term = relationship("KeywordTerm", lazy="joined")
+    keyword = association_proxy("term", "display")
+
+class KeywordCompetition(Base):
+    """Google result count per keyword term, shared by all workers and kept across restarts."""
+    __tablename__ = "keyword_competition"
+    __table_args__ = (
+        # The refresher looks for entries fetched before a cutoff
+        Index("ix_keyword_competition_fetched", "fetched_at"),
+    )
+    term_id = Column(Integer, ForeignKey("keyword_terms.id"), primary_key=True)
+    total_results = Column(Integer, nullable=False)
+    fetched_at = Column(DateTime(timezone=True), nullable=False)
+    use_count = Column(Integer, nullable=False, default=0)  # requests that scored this keyword
+    last_used_at = Column(DateTime(timezone=True))
+    refreshing_until = Column(DateTime(timezone=True))  # lease held by a refresher
+
+class AnalysisCacheEntry(Base):
+    __tablename__ = "analysis_cache"
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), unique=True, index=True, nullable=False)  # sha256 of uploaded bytes
+    perceptual_hash = Column(String(16), index=True)  # 64-bit dHash, hex
+    image_signature = Column(String(112))  # aspect ratio and 4x4 colour thumbnail, see analysis_cache
+    result = Column(JSON, nullable=False)  # parsed Gemini output
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        # Workers claim the oldest runnable job: status IN (...) AND available_at <= now
+        Index("ix_analysis_jobs_claim", "status", "available_at"),
+    )
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = Column(String(16), nullable=False, default="queued")  # queued | running | succeeded | failed
+    image = Column(LargeBinary)  # upload as received; cleared once the job finishes
+    refresh = Column(Boolean, nullable=False, default=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Queued: earliest time it may run (retry backoff). Running: lease expiry, after which it is re-claimable.
+    available_at = Column(DateTime(timezone=True), nullable=False)
+    worker_id = Column(String(128))
+    result = Column(JSON)
+    error = Column(String)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class CSEQuotaUsage(Base):
+    """Custom Search queries reserved per quota day, shared by every process using the API key."""
+    __tablename__ = "cse_quota_usage"
+    day = Column(Date, primary_key=True)  # Pacific-time day; Google resets the quota at midnight
+    used = Column(Integer, nullable=False)  # reserved in blocks, so a little ahead of queries actually sent
@@ -0,0 +1,244 @@
+"""
+Recompute the stored scores of every saved keyword, without calling Gemini or
+Custom Search.
+
+Run it after changing SEO_HEURISTIC_WEIGHT or the competition thresholds in
+config (or pass them as options) so stored combined_score values match what
+new products would get:
+
+    python -m app.db.rescore [--workers 8] [--chunk-size 1000] [--heuristic-weight 0.6]
+
+Products are read in id order, keyset-paginated, with their keywords; scoring
+runs in a process pool and every chunk is written back with one bulk UPDATE.
+Progress is checkpointed after each chunk, so an interrupted run picks up where
+it stopped when started again with the same settings (--restart starts over).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.core.config import (
+    SEO_HEURISTIC_WEIGHT,
+    SEO_COMPETITION_LOG_MIN,
+    SEO_COMPETITION_LOG_MAX,
+    SEO_DIFFICULTY_MEDIUM,
+    SEO_DIFFICULTY_HIGH,
+)
+from app.services.seo.keyword_ranker import KeywordRanker, competition_scores, difficulty_labels
+from .database import async_session, close_db
+from .models import Product, Keyword, KeywordTerm, KeywordCompetition
+
+# (attributes, keyword ids, terms, google totals) for one product
+ProductKeywords = Tuple[dict, List[int], List[str], List[int]]
+
+
+def _score_chunk(products: List[ProductKeywords], params: dict) -> List[dict]:
+    """
+    Keyword row updates for one chunk, equal to what score_keywords_with_google
+    stores for the same keyword, attributes and count under `params`.
+    """
+    ids, heuristics, totals = [], [], []
+    for attributes, keyword_ids, terms, product_totals in products:
+        ids.extend(keyword_ids)
+        heuristics.append(KeywordRanker(attributes or {}).heuristic_scores(terms))
+        totals.extend(product_totals)
+    if not ids:
+        return []
+
+    heuristic = np.concatenate(heuristics)
+    totals = np.asarray(totals, dtype=np.int64)
+    # The online path rounds competition before combining; round() keeps Python's exact rounding
+    competition = np.array(
+        [round(c, 3) for c in competition_scores(totals, params["log_min"], params["log_max"]).tolist()]
+    )
+    weight = params["heuristic_weight"]
+    combined = weight * heuristic + (1 - weight) * (1 - competition)
+    difficulty = difficulty_labels(totals, params["medium"], params["high"])
+
+    return [
+        {
+            "id": keyword_id,
+            "heuristic_score": round(h, 3),
+            "google_total_results": total,
+            "google_competition_score": c,
+            "google_difficulty": d,
+            "combined_score": round(s, 3),
+        }
+        for keyword_id, h, total, c, d, s in zip(
+            ids, heuristic.tolist(), totals.tolist(), competition.tolist(), difficulty.tolist(), combined.tolist()
+        )
+    ]
+
+
+async def _read_chunk(
+    db: AsyncSession, after_id: int, chunk_size: int, refresh_counts: bool
+) -> Tuple[Optional[int], List[ProductKeywords], int]:
+    """Next chunk_size products after after_id with their keywords: (last id, products, keyword count)."""
+    result = await db.execute(
+        select(Product.id, Product.attributes).where(Product.id > after_id).order_by(Product.id).limit(chunk_size)
+    )
+    products = result.all()
+    if not products:
+        return None, [], 0
+    last_id = products[-1][0]
+
+    total = Keyword.google_total_results
+    # Score the keyword as generated (the term's display spelling), like the online path
+    keyword = KeywordTerm.display
+    stmt = select(Keyword.id, Keyword.product_id, keyword, total).join(KeywordTerm, KeywordTerm.id == Keyword.term_id)
+    if refresh_counts:
+        # Prefer the newer count from the competition store when it has one
+        stmt = stmt.outerjoin(KeywordCompetition, KeywordCompetition.term_id == Keyword.term_id).with_only_columns(
+            Keyword.id, Keyword.product_id, keyword, func.coalesce(KeywordCompetition.total_results, total)
+        )
+    # A range on product_id walks the index in order, unlike a long IN list
+    result = await db.execute(
+        stmt.where(Keyword.product_id > after_id, Keyword.product_id <= last_id).order_by(Keyword.product_id, Keyword.id)
+    )
+
+    by_product: Dict[int, ProductKeywords] = {pid: (attributes, [], [], []) for pid, attributes in products}
+    count = 0
+    for keyword_id, product_id, term, google_total in result.all():
+        _, ids, terms, totals = by_product[product_id]
+        ids.append(keyword_id)
+        terms.append(term)
+        totals.append(google_total or 0)
+        count += 1
+    return last_id, list(by_product.values()), count
+
+
+def _load_checkpoint(path: Path, params: dict, restart: bool) -> dict:
+    fresh = {"params": params, "after_id": 0, "products": 0, "keywords": 0}
+    if restart or not path.exists():
+        return fresh
+    checkpoint = json.loads(path.read_text())
+    if checkpoint.get("params") != params:
+        raise SystemExit(f"{path} is from a run with different settings; pass --restart to start over")
+    return checkpoint
+
+
+def _save_checkpoint(path: Path, checkpoint: dict):
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(checkpoint))
+    tmp.replace(path)  # atomic, so a crash never leaves a half-written checkpoint
+
+
+async def rescore(
+    params: dict,
+    workers: int,
+    chunk_size: int,
+    checkpoint_path: Path,
+    restart: bool = False,
+):
+    checkpoint = _load_checkpoint(checkpoint_path, params, restart)
+    start_products = checkpoint["products"]
+    if checkpoint["after_id"]:
+        print(f"Resuming after product {checkpoint['after_id']} ({checkpoint['products']} products done)")
+
+    loop = asyncio.get_running_loop()
+    pool = None
+    if workers > 1:
+        # spawn, as in the image preprocessor: no forking of a process with a running loop
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    started = time.monotonic()
+    last_report = 0.0
+    done_keywords = 0
+    try:
+        async with async_session() as db:
+            remaining = (
+                await db.execute(select(func.count(Product.id)).where(Product.id > checkpoint["after_id"]))
+            ).scalar_one()
+            total_products = start_products + remaining
+
+            # Read ahead while the pool scores; results are written in order so the checkpoint stays exact
+            inflight = deque()
+            after_id, exhausted = checkpoint["after_id"], False
+            while True:
+                while not exhausted and len(inflight) < max(2, workers * 2):
+                    last_id, products, n_keywords = await _read_chunk(db, after_id, chunk_size, params["refresh_counts"])
+                    if last_id is None:
+                        exhausted = True
+                        break
+                    if pool is None:
+                        scored = loop.create_future()
+                        scored.set_result(_score_chunk(products, params))
+                    else:
+                        scored = loop.run_in_executor(pool, _score_chunk, products, params)
+                    inflight.append((last_id, len(products), n_keywords, scored))
+                    after_id = last_id
+                if not inflight:
+                    break
+
+                last_id, n_products, n_keywords, scored = inflight.popleft()
+                updates = await scored
+                if updates:
+                    await db.execute(update(Keyword), updates)  # bulk UPDATE by primary key
+                await db.commit()
+
+                checkpoint.update(
+                    after_id=last_id,
+                    products=checkpoint["products"] + n_products,
+                    keywords=checkpoint["keywords"] + n_keywords,
+                )
+                _save_checkpoint(checkpoint_path, checkpoint)
+                done_keywords += n_keywords
+
+                elapsed = time.monotonic() - started
+                if elapsed - last_report >= 1 or (exhausted and not inflight):
+                    last_report = elapsed
+                    rate = done_keywords / elapsed if elapsed else 0.0
+                    left = total_products - checkpoint["products"]
+                    eta = left * elapsed / max(1, checkpoint["products"] - start_products)
+                    print(
+                        f"{checkpoint['products']}/{total_products} products, {checkpoint['keywords']} keywords "
+                        f"({rate:,.0f} keywords/s, ETA {eta:,.0f}s)"
+                    )
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        await close_db()
+
+    print(f"✅ Re-scored {checkpoint['keywords']} keywords of {checkpoint['products']} products")
+    checkpoint_path.unlink(missing_ok=True)  # finished; the next run starts from the beginning
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute stored keyword scores")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="scoring processes; 1 scores inline")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="products per chunk")
+    parser.add_argument("--heuristic-weight", type=float, default=SEO_HEURISTIC_WEIGHT)
+    parser.add_argument("--log-min", type=float, default=SEO_COMPETITION_LOG_MIN)
+    parser.add_argument("--log-max", type=float, default=SEO_COMPETITION_LOG_MAX)
+    parser.add_argument("--medium-threshold", type=int, default=SEO_DIFFICULTY_MEDIUM)
+    parser.add_argument("--high-threshold", type=int, default=SEO_DIFFICULTY_HIGH)
+    parser.add_argument(
+        "--refresh-counts", action="store_true", help="take Google counts from the competition store where newer"
+    )
+    parser.add_argument("--checkpoint", type=Path, default=Path(".rescore_checkpoint.json"))
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    params = {
+        "heuristic_weight": args.heuristic_weight,
+        "log_min": args.log_min,
+        "log_max": args.log_max,
+        "medium": args.medium_threshold,
+        "high": args.high_threshold,
+        "refresh_counts": args.refresh_counts,
+    }
+    asyncio.run(rescore(params, args.workers, args.chunk_size, args.checkpoint, args.restart))
+
+
+if __name__ == "__main__":
+    main()
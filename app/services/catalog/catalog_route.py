@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from typing import Literal, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import PRODUCT_PAGE_MAX_LIMIT, EXPORT_CHUNK_SIZE
+from app.db.database import get_db, async_session
+from app.db.crud import list_products, stream_products
+from app.db.models import Product
+from .catalog_schema import ProductPage, StoredProduct, StoredKeyword
+
+router = APIRouter(prefix="/products", tags=["Catalog"])
+
+CSV_COLUMNS = ["id", "title", "description", "category", "attributes", "keywords"]
+
+
+def _to_schema(product: Product) -> StoredProduct:
+    return StoredProduct(
+        id=product.id,
+        title=product.title,
+        description=product.description,
+        attributes=product.attributes,
+        keywords=[
+            StoredKeyword(
+                keyword=k.keyword,
+                heuristic_score=k.heuristic_score,
+                google_total_results=k.google_total_results,
+                google_competition_score=k.google_competition_score,
+                google_difficulty=k.google_difficulty,
+                combined_score=k.combined_score,
+            )
+            for k in product.keywords
+        ],
+    )
+
+
+@router.get("", response_model=ProductPage)
+async def list_products_endpoint(
+    after: Optional[int] = Query(None, description="Return products with id greater than this"),
+    limit: int = Query(50, ge=1, le=PRODUCT_PAGE_MAX_LIMIT),
+    category: Optional[str] = Query(None, description="Case-insensitive match on attributes.category"),
+    db: AsyncSession = Depends(get_db),
+):
+    # Fetch one extra row to know whether another page exists
+    products = await list_products(db, after_id=after, limit=limit + 1, category=category)
+    has_more = len(products) > limit
+    products = products[:limit]
+    return ProductPage(
+        items=[_to_schema(p) for p in products],
+        next_after=products[-1].id if has_more else None,
+    )
+
+
+async def _export_rows(fmt: str, category: Optional[str]):
+    # Own session: the request-scoped one is closed before a streaming body is sent
+    async with async_session() as db:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(CSV_COLUMNS)
+            yield buffer.getvalue()
+
+        async for chunk in stream_products(db, category=category, chunk_size=EXPORT_CHUNK_SIZE):
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for p in chunk:
+                    attributes = p.attributes or {}
+                    writer.writerow([
+                        p.id,
+                        p.title,
+                        p.description,
+                        attributes.get("category", ""),
+                        json.dumps(attributes),
+                        "|".join(k.keyword for k in p.keywords),
+                    ])
+                yield buffer.getvalue()
+            else:
+                yield "".join(_to_schema(p).model_dump_json() + "\n" for p in chunk)
+
+
+@router.get("/export")
+async def export_products_endpoint(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    category: Optional[str] = Query(None, description="Case-insensitive match on attributes.category"),
+):
+    """Stream the whole catalog, fetched in EXPORT_CHUNK_SIZE batches from a server-side cursor."""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="products.{format}"'}
+    return StreamingResponse(_export_rows(format, category), media_type=media_type, headers=headers)
@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from typing import List, Optional, Dict, Any
+
+
+class StoredKeyword(BaseModel):
+    keyword: str
+    heuristic_score: Optional[float] = None
+    google_total_results: Optional[int] = None
+    google_competition_score: Optional[float] = None
+    google_difficulty: Optional[str] = None
+    combined_score: Optional[float] = None
+
+
+class StoredProduct(BaseModel):
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    attributes: Optional[Dict[str, Any]] = None
+    keywords: List[StoredKeyword] = []
+
+
+class ProductPage(BaseModel):
+    items: List[StoredProduct]
+    next_after: Optional[int] = None  # pass as ?after= to fetch the next page
@@ -0,0 +1,134 @@
+import math
+import re
+import statistics
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Prices outside this range are almost always model numbers, years or shipping thresholds
+MIN_PRICE = 1.0
+MAX_PRICE = 100_000.0
+# Currencies whose everyday prices run past MAX_PRICE (a ₹1,23,456 laptop is about $1,500)
+MAX_PRICE_BY_CURRENCY = {"INR": 10_000_000.0}
+
+_SYMBOLS = {
+    "$": "USD",
+    "us$": "USD",
+    "usd": "USD",
+    "dollar": "USD",
+    "dollars": "USD",
+    "c$": "CAD",
+    "cad": "CAD",
+    "a$": "AUD",
+    "aud": "AUD",
+    "€": "EUR",
+    "eur": "EUR",
+    "euro": "EUR",
+    "euros": "EUR",
+    "£": "GBP",
+    "gbp": "GBP",
+    "₹": "INR",
+    "rs": "INR",
+    "rs.": "INR",
+    "inr": "INR",
+    "rupee": "INR",
+    "rupees": "INR",
+}
+
+# 1,299.99 / 1.299,99 / 1\u00a0299,99 / 1299.99 / 1299 (no-break spaces group thousands in fr/de listings)
+# and lakh grouping 1,23,456 / 12,34,567.50, whose 2-digit groups are only taken when another group follows
+_NUMBER = r"\d+(?:,\d{2}(?=,\d))*(?:[,.\u00a0\u202f]\d{3})*(?:[.,]\d{1,2})?"
+_CODES = "USD|EUR|GBP|INR|CAD|AUD"
+_PREFIX = rf"US\$|C\$|A\$|[$€£₹]|Rs\.?|{_CODES}"
+# A symbol or code followed by a number prefixes that number: "Air Max 90 $129.99" is $129.99, not 90 USD
+_SUFFIX = rf"(?:[$€£₹]|(?i:{_CODES})\b)(?!\s?\d)|(?i:dollars?|euros?|rupees?)\b"
+
+# One pass over the text finds both "$1,299.99" and "1.299,99 €" forms. The leading
+# lookahead lists every character a match can start with, which lets re skip ahead
+# with a fast character-set scan instead of trying both branches at every position;
+# that is also why prefixed codes are matched upper-case only.
+PRICE_PATTERN = re.compile(
+    r"(?=[\d$€£₹UCAREGI])"
+    rf"(?:(?P<prefix>{_PREFIX})\s?(?P<prefixed>{_NUMBER})(?![.,]?\d)"
+    rf"|(?<![\d.,])(?P<suffixed>{_NUMBER})\s?(?P<suffix>{_SUFFIX}))"
+)
+
+_GROUP_SEPARATORS = str.maketrans("", "", ",.\u00a0\u202f")
+
+
+def _parse_amount(raw: str) -> Optional[float]:
+    # A trailing "." or "," followed by 1-2 digits is the decimal mark; every other separator groups thousands
+    cut = max(raw.rfind("."), raw.rfind(","))
+    if cut != -1 and len(raw) - cut - 1 in (1, 2):
+        whole, fraction = raw[:cut], raw[cut + 1:]
+    else:
+        whole, fraction = raw, ""
+    whole = whole.translate(_GROUP_SEPARATORS)
+    try:
+        return float(f"{whole}.{fraction}" if fraction else whole)
+    except ValueError:
+        return None
+
+
+def extract_prices(text: str) -> List[Tuple[float, str]]:
+    """All plausible (amount, ISO currency) pairs in text, duplicates included."""
+    found = []
+    for m in PRICE_PATTERN.finditer(text):
+        if m.group("prefixed") is not None:
+            raw, symbol = m.group("prefixed"), m.group("prefix")
+        else:
+            raw, symbol = m.group("suffixed"), m.group("suffix")
+        amount = _parse_amount(raw)
+        currency = _SYMBOLS[symbol.lower()]
+        if amount is not None and MIN_PRICE < amount < MAX_PRICE_BY_CURRENCY.get(currency, MAX_PRICE):
+            found.append((amount, currency))
+    return found
+
+
+def _trimmed_mean(values: List[float], proportion: float = 0.1) -> float:
+    cut = int(len(values) * proportion)
+    kept = values[cut:len(values) - cut] if cut else values
+    return sum(kept) / len(kept)
+
+
+def summarize_prices(samples: Iterable[Tuple[float, str]]) -> Optional[Dict]:
+    """
+    Robust price range for the dominant currency in samples.
+
+    Outliers (accessories, bundles) are rejected with the 1.5*IQR rule before
+    min/max are taken; avg_price is a 10% trimmed mean. confidence (0-1) grows
+    with sample count and shrinks with spread and currency disagreement.
+    """
+    samples = list(samples)
+    if not samples:
+        return None
+
+    by_currency = Counter(currency for _, currency in samples)
+    currency, currency_count = by_currency.most_common(1)[0]
+    prices = sorted(amount for amount, c in samples if c == currency)
+
+    inliers = prices
+    if len(prices) >= 4:
+        q1, _, q3 = statistics.quantiles(prices, n=4, method="inclusive")
+        fence = 1.5 * (q3 - q1)
+        inliers = [p for p in prices if q1 - fence <= p <= q3 + fence]
+
+    median = statistics.median(inliers)
+    if len(inliers) >= 4:
+        q1, _, q3 = statistics.quantiles(inliers, n=4, method="inclusive")
+        spread = (q3 - q1) / median
+    else:
+        spread = (inliers[-1] - inliers[0]) / median
+    size_factor = 1 - math.exp(-len(inliers) / 4)
+    agreement = currency_count / len(samples)
+    confidence = size_factor * agreement / (1 + spread)
+
+    return {
+        "min_price": round(inliers[0], 2),
+        "avg_price": round(_trimmed_mean(inliers), 2),
+        "median_price": round(median, 2),
+        "max_price": round(inliers[-1], 2),
+        "currency": currency,
+        "samples_found": len(prices),
+        "outliers_removed": len(prices) - len(inliers),
+        "confidence": round(confidence, 2),
+    }
@@ -1,25 +1,73 @@
 import httpx
 import re
-import os
 from typing import Dict, Optional
-from dotenv import load_dotenv
+from app.core.async_cache import AsyncTTLCache
+from app.core.config import (
+    GOOGLE_API_KEY,
+    GOOGLE_CSE_ID,
+    PRICE_CACHE_SIZE,
+    PRICE_CACHE_TTL,
+    PRICE_CACHE_STALE_TTL,
+    PRICE_CACHE_NEGATIVE_TTL,
+)
+from app.core.cse_scheduler import cse_search, CSEDroppedError, PRIORITY_PRICE, PRIORITY_BACKGROUND
+from .price_extraction import extract_prices, summarize_prices
 
-load_dotenv()
+# Words that don't change which product a title describes
+_STOPWORDS = frozenset({
+    "a", "an", "the", "and", "or", "of", "for", "with", "in", "on", "by", "to", "from", "s",
+    "new", "buy", "price", "sale", "best", "cheap", "online",
+})
+_TOKEN = re.compile(r"[^\W_]+")
 
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
+_price_cache = AsyncTTLCache(
+    maxsize=PRICE_CACHE_SIZE,
+    ttl=PRICE_CACHE_TTL,
+    negative_ttl=PRICE_CACHE_NEGATIVE_TTL,
+    stale_ttl=PRICE_CACHE_STALE_TTL,
+    name="price",
+    uncached_errors=(CSEDroppedError,),
+)
+
+
+def normalize_product_query(text: str) -> str:
+    """Order- and punctuation-insensitive form of a title: "The Nike Air-Max, Red" -> "air max nike red"."""
+    tokens = set(_TOKEN.findall(text.lower())) - _STOPWORDS
+    return " ".join(sorted(tokens))
+
+
+async def _search_prices(product_title: str, category: str, priority: int) -> Optional[Dict]:
+    # Build search query focused on shopping/pricing
+    query = f"{product_title} price buy"
+    if category:
+        query = f"{category} {query}"
+
+    # Get top 10 results for better price sampling
+    data = await cse_search(query, num=10, priority=priority)
+
+    # Extract prices from search results (title + snippet of each item)
+    samples = []
+    for item in data.get("items", []):
+        samples.extend(extract_prices(f"{item.get('title', '')} {item.get('snippet', '')}"))
+    return summarize_prices(samples)
 
 
 async def fetch_price_from_web(product_title: str, category: str = "") -> Dict:
     """
     Fetch real market prices using Google Custom Search API
     
+    Results are cached per normalized (category, title), so re-uploads of the
+    same product and reworded titles reuse one search. Entries older than
+    PRICE_CACHE_TTL are still returned instantly while a low-priority search
+    refreshes them in the background.
+
     Args:
         product_title: The product name/title
         category: Optional product category for better search
     
     Returns:
-        Dict with min_price, avg_price, max_price, source, samples_found
+        Dict with min_price, avg_price (trimmed mean), median_price, max_price,
+        currency, samples_found, outliers_removed, confidence and source
     """
     if not GOOGLE_API_KEY or not GOOGLE_CSE_ID:
         print("⚠️ Google API credentials not configured")
@@ -30,55 +78,19 @@ async def fetch_price_from_web(product_title: str, category: str = "") -> Dict:
             "source": "api_not_configured"
         }
     
+    key = (normalize_product_query(category), normalize_product_query(product_title))
     try:
-        # Build search query focused on shopping/pricing
-        query = f"{product_title} price buy"
-        if category:
-            query = f"{category} {query}"
-        
-        endpoint = "https://www.googleapis.com/customsearch/v1"
-        params = {
-            "key": GOOGLE_API_KEY,
-            "cx": GOOGLE_CSE_ID,
-            "q": query,
-            "num": 10  # Get top 10 results for better price sampling
-        }
-        
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            resp = await client.get(endpoint, params=params)
-            resp.raise_for_status()
-            data = resp.json()
-        
-        # Extract prices from search results
-        prices = []
-        items = data.get("items", [])
-        
-        for item in items:
-            # Combine title and snippet for price extraction
-            text = f"{item.get('title', '')} {item.get('snippet', '')}"
-            
-            # Multiple regex patterns to catch different price formats
-            price_patterns = [
-                r'\$\s*(\d{1,5}(?:[.,]\d{2})?)',  # $299 or $299.99
-                r'USD\s*(\d{1,5}(?:[.,]\d{2})?)',  # USD 299
-                r'(\d{1,5}(?:[.,]\d{2})?)\s*(?:USD|dollars)',  # 299 USD
-            ]
-            
-            for pattern in price_patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
-                for match in matches:
-                    try:
-                        price = float(match.replace(',', ''))
-                        # Filter out unrealistic prices (between $1 and $100,000)
-                        if 1 < price < 100000:
-                            prices.append(price)
-                    except ValueError:
-                        continue
-        
-        # Remove duplicates and sort
-        prices = sorted(list(set(prices)))
-        
-        if not prices:
+        if not key[1]:
+            # Empty or stopword-only titles all normalize alike but search differently; don't share an entry
+            summary = await _search_prices(product_title, category, PRIORITY_PRICE)
+        else:
+            summary = await _price_cache.get_or_load(
+                key,
+                lambda: _search_prices(product_title, category, PRIORITY_PRICE),
+                is_negative=lambda result: result is None,
+                revalidate=lambda: _search_prices(product_title, category, PRIORITY_BACKGROUND),
+            )
+        if summary is None:
             print(f"⚠️ No prices found for: {product_title}")
             return {
                 "min_price": None,
@@ -86,22 +98,23 @@ async def fetch_price_from_web(product_title: str, category: str = "") -> Dict:
                 "max_price": None,
                 "source": "no_prices_found"
             }
-        
-        # Calculate statistics
-        min_price = min(prices)
-        max_price = max(prices)
-        avg_price = sum(prices) / len(prices)
-        
-        print(f"✅ Found {len(prices)} prices for '{product_title}': ${min_price} - ${max_price}")
-        
+
+        print(
+            f"✅ Found {summary['samples_found']} prices for '{product_title}': "
+            f"{summary['currency']} {summary['min_price']} - {summary['max_price']} "
+            f"({summary['outliers_removed']} outliers dropped)"
+        )
+        return {**summary, "source": "google_search"}
+
+    except CSEDroppedError as e:
+        print(f"❌ Price lookup not sent: {e}")
         return {
-            "min_price": round(min_price, 2),
-            "avg_price": round(avg_price, 2),
-            "max_price": round(max_price, 2),
-            "source": "google_search",
-            "samples_found": len(prices)
+            "min_price": None,
+            "avg_price": None,
+            "max_price": None,
+            "source": "api_quota_exceeded"
         }
-        
+
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 429:
             print("❌ Google API quota exceeded")
@@ -0,0 +1,157 @@
+import asyncio
+import copy
+import hashlib
+import io
+from typing import List, NamedTuple, Optional, Tuple
+from cachetools import LRUCache
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import ANALYSIS_CACHE_ENABLED, ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_PERCEPTUAL
+from app.db import crud
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it only exact byte matches hit
+    Image = None
+
+
+class ImageFingerprint(NamedTuple):
+    content_hash: str
+    perceptual_hash: Optional[str]
+    signature: Optional[str] = None  # "aspect:4x4 RGB thumbnail", confirms a perceptual match
+
+
+# Tier 1: per-process LRU. Tier 2: analysis_cache table (see crud).
+_memory = LRUCache(maxsize=ANALYSIS_CACHE_SIZE)  # content_hash -> analysis
+_perceptual_index = LRUCache(maxsize=ANALYSIS_CACHE_SIZE)  # perceptual_hash -> (content_hash, signature)
+
+# dHash only sees grey-level gradients, so a product shot in another colour, or a different
+# product on the same template, hashes alike. A perceptual match (within one bit) is served
+# only if the aspect ratio and coarse colours agree as well.
+_MAX_ASPECT_DIFF = 0.03  # relative
+_MAX_COLOUR_DIFF = 10  # largest difference in any thumbnail cell and channel, 0-255
+_THUMB_SIZE = 4
+_PERCEPTUAL_CANDIDATES = 8
+
+
+def _perceptual(image_bytes: bytes, size: int = 8) -> Tuple[Optional[str], Optional[str]]:
+    """64-bit difference hash and content signature; both stable across re-encoding and resizing."""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            aspect = img.width / img.height
+            img.draft("RGB", (size * 4, size * 4))  # lets JPEG decode at reduced scale
+            rgb = img.convert("RGB")
+            small = rgb.convert("L").resize((size + 1, size), Image.LANCZOS)
+            thumb = rgb.resize((_THUMB_SIZE, _THUMB_SIZE), Image.BOX)
+    except Exception:
+        return None, None
+
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:016x}", f"{aspect:.3f}:{thumb.tobytes().hex()}"
+
+
+def _fingerprint(image_bytes: bytes) -> ImageFingerprint:
+    content_hash = hashlib.sha256(image_bytes).hexdigest()
+    perceptual_hash = signature = None
+    if ANALYSIS_CACHE_PERCEPTUAL and Image is not None:
+        perceptual_hash, signature = _perceptual(image_bytes)
+    return ImageFingerprint(content_hash, perceptual_hash, signature)
+
+
+async def fingerprint_image(image_bytes: bytes) -> ImageFingerprint:
+    # Hashing multi-MB uploads and decoding for the dHash is CPU work; keep it off the loop
+    return await asyncio.to_thread(_fingerprint, image_bytes)
+
+
+def _neighbours(perceptual_hash: str) -> List[str]:
+    """The hash itself, then every hash one bit away from it."""
+    bits = int(perceptual_hash, 16)
+    return [perceptual_hash] + [f"{bits ^ (1 << i):016x}" for i in range(64)]
+
+
+def _same_picture(signature: Optional[str], other: Optional[str]) -> bool:
+    if not signature or not other:
+        return False  # entries stored before signatures existed are only served by exact bytes
+    aspect, colours = signature.split(":")
+    other_aspect, other_colours = other.split(":")
+    if abs(float(aspect) - float(other_aspect)) > _MAX_ASPECT_DIFF * float(aspect):
+        return False
+    a, b = bytes.fromhex(colours), bytes.fromhex(other_colours)
+    # The largest cell difference, not the mean: a recoloured product on a white background changes few cells
+    return len(a) == len(b) and max(abs(x - y) for x, y in zip(a, b)) <= _MAX_COLOUR_DIFF
+
+
+def _remember(fingerprint: ImageFingerprint, analysis: dict):
+    _memory[fingerprint.content_hash] = analysis
+    if fingerprint.perceptual_hash:
+        _perceptual_index[fingerprint.perceptual_hash] = (fingerprint.content_hash, fingerprint.signature)
+
+
+def _perceptual_from_memory(fingerprint: ImageFingerprint) -> Optional[dict]:
+    for perceptual_hash in _neighbours(fingerprint.perceptual_hash):
+        entry = _perceptual_index.get(perceptual_hash)
+        if entry is not None and _same_picture(fingerprint.signature, entry[1]):
+            analysis = _memory.get(entry[0])
+            if analysis is not None:
+                return analysis
+    return None
+
+
+async def _lookup_db(db: AsyncSession, fingerprint: ImageFingerprint) -> Optional[dict]:
+    analysis = await crud.get_cached_analysis(db, fingerprint.content_hash)
+    if analysis is None and fingerprint.perceptual_hash:
+        candidates = await crud.get_perceptual_candidates(
+            db, _neighbours(fingerprint.perceptual_hash), _PERCEPTUAL_CANDIDATES
+        )
+        analysis = next((result for signature, result in candidates if _same_picture(fingerprint.signature, signature)), None)
+    return analysis
+
+
+async def get_cached_analysis(db: AsyncSession, fingerprint: ImageFingerprint) -> Optional[dict]:
+    """
+    Return a previously stored Gemini analysis for this image, or None.
+
+    Exact bytes match first; otherwise a near-identical copy (dHash within
+    one bit, same aspect ratio and colours) that was analyzed before.
+    """
+    if not ANALYSIS_CACHE_ENABLED:
+        return None
+
+    analysis = _memory.get(fingerprint.content_hash)
+    if analysis is None and fingerprint.perceptual_hash:
+        analysis = _perceptual_from_memory(fingerprint)
+
+    if analysis is None:
+        try:
+            analysis = await _lookup_db(db, fingerprint)
+        except Exception as e:
+            print(f"⚠️ Analysis cache lookup failed: {e}")
+            await db.rollback()
+            return None
+        # End the read so the pooled connection isn't held through preprocessing and Gemini on a miss
+        await db.commit()
+        if analysis is None:
+            return None
+        _remember(fingerprint, analysis)
+
+    return copy.deepcopy(analysis)
+
+
+async def store_cached_analysis(db: AsyncSession, fingerprint: ImageFingerprint, analysis: dict):
+    """Store a successful analysis in both tiers. Errors are never cached."""
+    if not ANALYSIS_CACHE_ENABLED or not isinstance(analysis, dict) or "error" in analysis:
+        return
+
+    _remember(fingerprint, copy.deepcopy(analysis))
+    try:
+        await crud.save_cached_analysis(
+            db, fingerprint.content_hash, fingerprint.perceptual_hash, fingerprint.signature, analysis
+        )
+    except Exception as e:
+        # A concurrent upload of the same bytes may have won the unique insert
+        print(f"⚠️ Analysis cache write failed: {e}")
+        await db.rollback()
@@ -1,20 +1,33 @@
-from google import genai
-from google.genai import types
-import os
-from dotenv import load_dotenv
+import asyncio
 import json
 import re
+from contextlib import asynccontextmanager
+from typing import Any, Callable, List, Optional, Set, Tuple
+from pydantic import ValidationError
+from app.core.config import (
+    GEMINI_API_KEY,
+    GEMINI_MODEL,
+    GEMINI_BASE_URL,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_QUEUE_TIMEOUT,
+    GEMINI_STRUCTURED_OUTPUT,
+    GEMINI_STREAMING,
+    GEMINI_PACK_SIZE,
+    GEMINI_PACK_LINGER,
+    GEMINI_PACK_RETRIES,
+)
+from app.core.metrics import GEMINI_ERRORS, track_stage
+from app.services.product_analyzer.analyzer_schema import GeneratedListing, PackedListing
+from app.services.product_analyzer.json_stream import StreamingObjectParser, complete_array_items
 
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-client = genai.Client(api_key=API_KEY)
+_client = None
 
-def analyze_product_image(image_bytes: bytes):
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[
-            types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg"),
-            """
+FieldCallback = Callable[[str, Any], None]
+
+# Caps in-flight Gemini calls per worker; waiters beyond the limit queue here
+_gemini_slots = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+_LISTING_INSTRUCTIONS = """
 You are an expert e-commerce copywriter specializing in product listings that convert browsers into buyers.
 
 Analyze this product image and create compelling, sales-focused content for an online store. Write as if you're selling to excited customers, not just describing what you see.
@@ -36,16 +49,82 @@ Return ONLY valid JSON with these fields:
 - "attributes": Product attributes as {"category": "...", "color": "...", "material": "...", "brand": "...", "other": "..."}
 
 Write in an engaging, professional tone that builds excitement and urgency. Focus on benefits over features. Make customers want to click "Add to Cart."
+"""
 
+PRODUCT_PROMPT = _LISTING_INSTRUCTIONS + """
 Return ONLY the JSON object. No markdown code blocks, no explanations, no preamble. Just pure JSON starting with { and ending with }.
 """
-        ]
-    )
 
-    text_response = response.text
+# Multi-image requests: the copywriting instructions are sent once for the whole pack
+PACKED_PROMPT = """
+The {count} images above show {count} different products, each introduced by its label ("Image 1", "Image 2", ...).
+Write one listing per image, applying the instructions below to each image on its own.
+{instructions}
+Return ONLY a JSON array with exactly one object per image, in image order. Each object has the fields above plus "image": the number of the image it describes. No markdown code blocks, no explanations, no preamble.
+"""
+
+
+class AnalyzerBusyError(Exception):
+    """Raised when no Gemini slot frees up within GEMINI_QUEUE_TIMEOUT."""
+
+
+def get_client():
+    """
+    Shared genai.Client, built on first use.
+
+    google.genai takes longer to import than the rest of the app combined, so
+    it is imported here rather than at module level; the app lifespan calls
+    start_gemini_client() to pay that cost before the worker reports ready.
+    """
+    global _client
+    if _client is None:
+        from google import genai
+        from google.genai import types
+
+        _client = genai.Client(
+            api_key=GEMINI_API_KEY,
+            http_options=types.HttpOptions(base_url=GEMINI_BASE_URL) if GEMINI_BASE_URL else None,
+        )
+    return _client
+
+
+async def start_gemini_client():
+    if GEMINI_API_KEY:
+        get_client()
+    else:
+        print("⚠️ GEMINI_API_KEY not set; image analysis will fail until it is")
+
+
+def _build_contents(image_bytes: bytes, mime_type: str) -> list:
+    from google.genai import types  # already imported by get_client()
+
+    return [
+        types.Part.from_bytes(data=image_bytes, mime_type=mime_type),
+        PRODUCT_PROMPT,
+    ]
+
+
+def _build_config():
+    if not GEMINI_STRUCTURED_OUTPUT:
+        return None
+    from google.genai import types
+
+    # Constrained decoding: the reply is a bare JSON object in GeneratedListing's field order
+    return types.GenerateContentConfig(response_mime_type="application/json", response_schema=GeneratedListing)
+
+
+def _parse_response(text_response) -> dict:
     if not isinstance(text_response, str) or not text_response:
         return {"error": "Empty or non-string response", "raw_response": text_response}
-    
+
+    # Structured output is plain JSON; only free-form replies need digging out
+    try:
+        parsed = json.loads(text_response)
+        if isinstance(parsed, dict):
+            return parsed
+    except json.JSONDecodeError:
+        pass
+
     # Clean up response - remove markdown code blocks if present
     cleaned = text_response.strip()
     json_match = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", cleaned, re.DOTALL)
@@ -55,8 +134,282 @@ Return ONLY the JSON object. No markdown code blocks, no explanations, no preamb
         # If no code blocks, try to extract JSON directly
         json_match = re.search(r"(\{.*\})", cleaned, re.DOTALL)
         candidate = json_match.group(1) if json_match else cleaned
-    
+
     try:
         return json.loads(candidate)
     except json.JSONDecodeError as e:
-        return {"error": "JSON parsing failed", "raw_response": text_response, "exception": str(e)}
\ No newline at end of file
+        return {"error": "JSON parsing failed", "raw_response": text_response, "exception": str(e)}
+
+
+def analyze_product_image(image_bytes: bytes, mime_type: str = "image/jpeg"):
+    response = get_client().models.generate_content(
+        model=GEMINI_MODEL,
+        contents=_build_contents(image_bytes, mime_type),
+        config=_build_config(),
+    )
+    return _parse_response(response.text)
+
+
+async def _generate(image_bytes: bytes, mime_type: str) -> dict:
+    with track_stage("gemini"):
+        response = await get_client().aio.models.generate_content(
+            model=GEMINI_MODEL,
+            contents=_build_contents(image_bytes, mime_type),
+            config=_build_config(),
+        )
+    with track_stage("json_extract"):
+        return _parse_response(response.text)
+
+
+async def _generate_streaming(image_bytes: bytes, mime_type: str, on_field: FieldCallback) -> dict:
+    parser = StreamingObjectParser()
+    chunks = []
+    with track_stage("gemini"):
+        stream = await get_client().aio.models.generate_content_stream(
+            model=GEMINI_MODEL,
+            contents=_build_contents(image_bytes, mime_type),
+            config=_build_config(),
+        )
+        async for chunk in stream:
+            text = chunk.text
+            if not text:
+                continue
+            chunks.append(text)
+            for key, value in parser.feed(text):
+                on_field(key, value)
+
+    if parser.complete:
+        return parser.fields
+    # Not a bare JSON object (e.g. fenced or truncated); fall back to whole-text extraction
+    with track_stage("json_extract"):
+        return _parse_response("".join(chunks))
+
+
+@asynccontextmanager
+async def _gemini_slot():
+    """
+    Hold one of the GEMINI_MAX_CONCURRENCY call slots; raises AnalyzerBusyError
+    after waiting GEMINI_QUEUE_TIMEOUT. Errors raised inside count as API errors.
+    """
+    try:
+        with track_stage("gemini_queue"):
+            await asyncio.wait_for(_gemini_slots.acquire(), timeout=GEMINI_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        GEMINI_ERRORS.labels("busy").inc()
+        raise AnalyzerBusyError(
+            f"No Gemini slot available after {GEMINI_QUEUE_TIMEOUT}s"
+        ) from None
+
+    try:
+        yield
+    except Exception:
+        GEMINI_ERRORS.labels("api").inc()
+        raise
+    finally:
+        _gemini_slots.release()
+
+
+async def analyze_product_image_async(
+    image_bytes: bytes, mime_type: str = "image/jpeg", on_field: Optional[FieldCallback] = None
+):
+    """
+    Non-blocking variant of analyze_product_image for use inside request handlers.
+
+    Uses the native async Gemini client so the event loop stays free while the
+    model runs. At most GEMINI_MAX_CONCURRENCY calls are in flight per worker;
+    a caller that waits longer than GEMINI_QUEUE_TIMEOUT for a slot gets
+    AnalyzerBusyError instead of piling up behind a saturated model.
+
+    With GEMINI_STREAMING and an on_field callback, the reply is streamed and
+    on_field(key, value) is called for each top-level field as soon as it is
+    complete, before the rest of the listing has been generated.
+    """
+    async with _gemini_slot():
+        if GEMINI_STREAMING and on_field is not None:
+            result = await _generate_streaming(image_bytes, mime_type, on_field)
+        else:
+            result = await _generate(image_bytes, mime_type)
+
+    if "error" in result:
+        GEMINI_ERRORS.labels("parse").inc()
+    return result
+
+
+def _build_packed_contents(images: List[Tuple[bytes, str]]) -> list:
+    from google.genai import types
+
+    contents = []
+    for number, (image_bytes, mime_type) in enumerate(images, 1):
+        contents += [f"Image {number}:", types.Part.from_bytes(data=image_bytes, mime_type=mime_type)]
+    contents.append(PACKED_PROMPT.format(count=len(images), instructions=_LISTING_INSTRUCTIONS))
+    return contents
+
+
+def _build_packed_config():
+    if not GEMINI_STRUCTURED_OUTPUT:
+        return None
+    from google.genai import types
+
+    return types.GenerateContentConfig(response_mime_type="application/json", response_schema=list[PackedListing])
+
+
+def _load_json_array(text_response) -> list:
+    if not isinstance(text_response, str):
+        return []
+    try:
+        parsed = json.loads(text_response)
+    except json.JSONDecodeError:
+        # Free-form reply: take the outermost [...] (inside a code fence or not)
+        match = re.search(r"(\[.*\])", text_response, re.DOTALL)
+        try:
+            parsed = json.loads(match.group(1)) if match else None
+        except json.JSONDecodeError:
+            parsed = None
+    if isinstance(parsed, dict):
+        # {"products": [...]} and similar wrappers
+        parsed = next((v for v in parsed.values() if isinstance(v, list)), None)
+    if isinstance(parsed, list):
+        return parsed
+    # Truncated or broken part way: keep the entries that arrived whole
+    return complete_array_items(text_response)
+
+
+def _parse_packed_response(text_response, count: int) -> List[Optional[dict]]:
+    """
+    Listings by image position, each validated against GeneratedListing.
+
+    Entries are matched to images by their "image" number (by position when
+    they have none). Positions without a valid entry are None.
+    """
+    listings: List[Optional[dict]] = [None] * count
+    for position, entry in enumerate(_load_json_array(text_response)):
+        if not isinstance(entry, dict):
+            continue
+        number = entry.get("image", position + 1)
+        if not isinstance(number, int) or not 1 <= number <= count or listings[number - 1] is not None:
+            continue
+        try:
+            listing = GeneratedListing.model_validate(entry)
+        except ValidationError:
+            continue
+        listings[number - 1] = listing.model_dump(exclude_none=True)
+    return listings
+
+
+async def _generate_packed(images: List[Tuple[bytes, str]]) -> List[Optional[dict]]:
+    with track_stage("gemini"):
+        response = await get_client().aio.models.generate_content(
+            model=GEMINI_MODEL,
+            contents=_build_packed_contents(images),
+            config=_build_packed_config(),
+        )
+    with track_stage("json_extract"):
+        return _parse_packed_response(response.text, len(images))
+
+
+async def analyze_product_images_packed(images: List[Tuple[bytes, str]]) -> List[dict]:
+    """
+    Analyze several (image_bytes, mime_type) images with one Gemini call.
+
+    The prompt and per-call overhead are paid once for the whole pack. Images
+    whose entry is missing or fails validation are re-sent, without the ones
+    that succeeded, up to GEMINI_PACK_RETRIES times; an attempt that produced
+    nothing usable (e.g. a reply cut off before its first entry) is retried
+    as two half-size packs. A single remaining image goes through the regular
+    one-image request. Results are in input order, with an {"error": ...}
+    dict for images that never got a valid listing.
+    """
+    results: List[Optional[dict]] = [None] * len(images)
+    pending = list(range(len(images)))
+    split = False
+    error = "No valid listing for this image in the packed reply"
+    for attempt in range(1 + GEMINI_PACK_RETRIES):
+        if not pending:
+            break
+        half = (len(pending) + 1) // 2
+        groups = [pending[:half], pending[half:]] if split and len(pending) > 1 else [pending]
+        try:
+            for group in groups:
+                if len(group) == 1:
+                    results[group[0]] = await analyze_product_image_async(*images[group[0]])
+                    continue
+                async with _gemini_slot():
+                    listings = await _generate_packed([images[i] for i in group])
+                for i, listing in zip(group, listings):
+                    results[i] = listing
+        except Exception as e:
+            if attempt == 0:
+                raise
+            # Keep what earlier attempts produced; only the retried images fail
+            error = str(e) or type(e).__name__
+            break
+        remaining = [i for i in pending if results[i] is None or "error" in results[i]]
+        split = len(remaining) == len(pending)
+        pending = remaining
+
+    for i in pending:
+        if results[i] is None:  # single-image failures were already counted and carry their own error
+            GEMINI_ERRORS.labels("parse").inc()
+            results[i] = {"error": error}
+    return results
+
+
+class _ImagePacker:
+    """
+    Collects images from concurrent callers into packs of up to `size` for
+    analyze_product_images_packed. A partial pack is sent once the first image
+    in it has waited `linger` seconds.
+    """
+
+    def __init__(self, size: int, linger: float):
+        self.size = size
+        self.linger = linger
+        self._pending = []  # (image_bytes, mime_type, future)
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+
+    async def analyze(self, image_bytes: bytes, mime_type: str) -> dict:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((image_bytes, mime_type, future))
+        if len(self._pending) >= self.size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.linger, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Callers that gave up meanwhile don't take a place in the pack
+        pack = [item for item in self._pending if not item[2].done()]
+        self._pending = []
+        if pack:
+            task = asyncio.ensure_future(self._run(pack))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, pack: list):
+        try:
+            results = await analyze_product_images_packed([(image, mime) for image, mime, _ in pack])
+        except Exception as e:
+            results = [e] * len(pack)
+        for (_, _, future), result in zip(pack, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+_packer = _ImagePacker(GEMINI_PACK_SIZE, GEMINI_PACK_LINGER)
+
+
+async def analyze_product_image_packed(image_bytes: bytes, mime_type: str = "image/jpeg") -> dict:
+    """
+    analyze_product_image_async for bulk work: the image shares a Gemini call
+    with up to GEMINI_PACK_SIZE - 1 other images analyzed at the same time.
+    """
+    return await _packer.analyze(image_bytes, mime_type)
@@ -1,101 +1,238 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
-from typing import Any, Dict, List, cast
-from app.services.product_analyzer.analyzer import analyze_product_image
-from app.services.seo.seo_service import score_keywords_with_google
-from app.services.pricing.price_fetcher import fetch_price_from_web  # NEW IMPORT
-from app.db.database import get_db
-from app.db.crud import save_product_result
+import asyncio
+import json
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Query, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
+from starlette.formparsers import MultiPartException, MultiPartParser
+from typing import Any, AsyncIterator, Dict, List, cast
+from app.core.config import (
+    BACKGROUND_DB_SAVE,
+    BATCH_WORKERS,
+    BATCH_MAX_ITEMS,
+    BATCH_MAX_BYTES,
+    BATCH_SPOOL_BYTES,
+    BATCH_PACKED,
+    GEMINI_PACK_SIZE,
+)
+from app.core.metrics import track_stage
+from app.services.product_analyzer.analyzer import AnalyzerBusyError
+from app.services.product_analyzer.image_preprocessor import read_upload, ImageTooLargeError, UnsupportedImageError
+from app.services.product_analyzer.pipeline import analyze_image, analyze_and_enrich, enrich_analysis, save_product
+from app.services.product_analyzer.analyzer_schema import JobAccepted, JobStatus
+from app.db.crud import enqueue_analysis_job, get_analysis_job
+from app.db.database import get_db, async_session
 from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter(prefix="/analyze", tags=["Product Analyzer"])
-MAX_GOOGLE_KEYWORDS = 15
 
 @router.post("/product")
 async def analyze_product_endpoint(
+    background_tasks: BackgroundTasks,
     image: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
+    refresh: bool = Query(False, description="Bypass the analysis cache and re-run Gemini"),
 ):
-    image_bytes = await image.read()
+    try:
+        with track_stage("upload_read"):
+            image_bytes = await read_upload(image)
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedImageError as e:
+        raise HTTPException(status_code=415, detail=str(e))
     if not image_bytes:
         raise HTTPException(status_code=400, detail="Empty file")
 
-    # Step 1: AI analyzes image
-    result = analyze_product_image(image_bytes)
-    if not isinstance(result, dict):
-        return {"error": "Invalid response from image analyzer"}
+    # Step 1: AI analyzes image (served from the cache for previously seen images)
+    # Step 2: Keyword ranking and web prices, started as soon as Gemini has streamed their inputs
+    try:
+        result, final_output, record = await analyze_and_enrich(db, image_bytes, refresh=refresh)
+    except AnalyzerBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except UnsupportedImageError as e:
+        raise HTTPException(status_code=415, detail=str(e))
     if "error" in result:
         return result
 
-    attributes = result.get("attributes", {})
-    product_title = result.get("title", "")
-    category = attributes.get("category", "")
-    
-    # Step 2: Extract and rank keywords
-    raw_keywords = result.get("seo_keywords", [])
-    if not isinstance(raw_keywords, list):
-        raw_keywords = [raw_keywords]
-    keywords = [str(k) for k in raw_keywords if k]
+    # Step 3: Save to DB
+    if BACKGROUND_DB_SAVE:
+        # Finishes after the response is sent; db_saved is unknown at this point
+        background_tasks.add_task(save_product, record)
+        final_output["db_saved"] = None
+    else:
+        error_msg = await save_product(record)
+        final_output["db_saved"] = error_msg is None
+        if error_msg is not None:
+            final_output["db_error"] = error_msg
+
+    return final_output
+
 
+async def _process_batch_item(index: int, upload: UploadFile, refresh: bool, packed: bool) -> dict:
+    item = {"index": index, "filename": upload.filename}
     try:
-        all_ranked = await score_keywords_with_google(
-            keywords,
-            attributes,
-            max_keywords=MAX_GOOGLE_KEYWORDS
-        )
+        image_bytes = await read_upload(upload)
+        await upload.close()  # the spooled temp file is no longer needed
+        if not image_bytes:
+            return {**item, "status": "error", "error": "Empty file"}
+
+        async with async_session() as db:
+            result = await analyze_image(db, image_bytes, refresh=refresh, packed=packed)
+        del image_bytes
+        if "error" in result:
+            return {**item, "status": "error", "error": result["error"]}
+
+        final_output, record = await enrich_analysis(result)
+        error_msg = await save_product(record)
+        final_output["db_saved"] = error_msg is None
+        if error_msg is not None:
+            final_output["db_error"] = error_msg
+        return {**item, "status": "ok", "result": final_output}
     except Exception as e:
-        print(f"Ranking failed: {e}")
-        all_ranked = [{"keyword": k, "combined_score": 0.5} for k in keywords[:6]]
-
-    sorted_tags = sorted(all_ranked, key=lambda x: x["combined_score"], reverse=True)
-    top_6_tags = [tag["keyword"] for tag in sorted_tags[:6]]
-
-    # Step 3: Fetch REAL prices from web 🔥
-    print(f"🔍 Fetching prices for: {product_title}")
-    price_range = await fetch_price_from_web(product_title, category)
-    
-    # If web search found no prices, return None instead of AI estimate
-    if price_range.get("min_price") is None:
-        print(f"⚠️ Could not find web prices, source: {price_range.get('source')}")
-        price_range = None  # Don't return unreliable data
-    else:
-        print(f"✅ Web prices found: ${price_range['min_price']} - ${price_range['max_price']}")
+        print(f"Batch item {index} failed: {e}")
+        return {**item, "status": "error", "error": str(e)}
+
+
+async def _stream_batch(images: List[UploadFile], refresh: bool, packed: bool):
+    pending = iter(enumerate(images))
+    # Packing needs enough items in flight to fill one pack while the previous one runs
+    concurrency = max(BATCH_WORKERS, 2 * GEMINI_PACK_SIZE) if packed else BATCH_WORKERS
+    # Bounded so a slow client applies backpressure instead of results piling up
+    finished: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
 
-    # Get promotional tags
-    promotional_tags = result.get("promotional_tags", [])[:6]
+    async def worker():
+        for index, upload in pending:  # shared iterator: each item is taken exactly once
+            await finished.put(await _process_batch_item(index, upload, refresh, packed))
 
-    # Save to DB
-    saved = False
-    error_msg = None
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(images)))]
     try:
-        await save_product_result(
-            db=db,
-            title=product_title,
-            description=result.get("description", ""),
-            attributes=attributes,
-            keywords=all_ranked
-        )
-        saved = True
-    except Exception as e:
-        error_msg = str(e)
-        print(f"Database save failed: {e}")
-
-    # Return clean output
-    final_output = {
-        "title": product_title,
-        "description": result.get("description"),
-        "short_description": result.get("short_description"),
-        "meta_title": result.get("meta_title"),
-        "meta_description": result.get("meta_description"),
-        "tags": top_6_tags,
-        "promotional_tags": promotional_tags,
-        "db_saved": saved
-    }
-    
-    # Only include price_range if web search was successful
-    if price_range:
-        final_output["price_range"] = price_range
-
-    if not saved:
-        final_output["db_error"] = error_msg
-
-    return final_output
\ No newline at end of file
+        for _ in range(len(images)):
+            yield json.dumps(await finished.get()) + "\n"
+    finally:
+        for task in workers:
+            task.cancel()
+        for upload in images:  # temp files of items never reached when the client went away
+            upload.file.close()
+
+
+class _BatchMultiPartParser(MultiPartParser):
+    # Starlette keeps up to 1 MB of every file in memory; a batch holds hundreds of them at once
+    spool_max_size = BATCH_SPOOL_BYTES
+
+
+async def _capped_body(request: Request, max_bytes: int) -> AsyncIterator[bytes]:
+    # Content-Length is checked up front; this also stops chunked bodies that run past it
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Batch body exceeds {max_bytes} bytes")
+        yield chunk
+
+
+async def _read_batch_images(request: Request) -> List[UploadFile]:
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > BATCH_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Batch body exceeds {BATCH_MAX_BYTES} bytes")
+
+    parser = _BatchMultiPartParser(
+        request.headers, _capped_body(request, BATCH_MAX_BYTES), max_files=BATCH_MAX_ITEMS, max_fields=10
+    )
+    try:
+        form = await parser.parse()
+    except MultiPartException as e:
+        status = 413 if "Too many files" in e.message else 400
+        raise HTTPException(status_code=status, detail=e.message)
+    images = [item for item in form.getlist("images") if not isinstance(item, str)]
+    if len(images) != len(form.getlist("images")):
+        await form.close()
+        raise HTTPException(status_code=400, detail="Every 'images' part must be a file")
+    return cast(List[UploadFile], images)
+
+
+_BATCH_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": ["images"],
+                "properties": {"images": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+            }
+        }
+    },
+}
+
+
+@router.post("/products/batch", openapi_extra={"requestBody": _BATCH_BODY})
+async def analyze_products_batch_endpoint(
+    request: Request,
+    refresh: bool = Query(False, description="Bypass the analysis cache and re-run Gemini"),
+    packed: bool = Query(BATCH_PACKED, description="Send up to GEMINI_PACK_SIZE images per Gemini request"),
+):
+    """
+    Analyze many product images in one request.
+
+    Results stream back as newline-delimited JSON, one line per image in
+    completion order ({"index", "filename", "status", "result" | "error"}).
+    Uploads stay in their spooled temp files until a worker picks them up,
+    and a failed image never aborts the rest of the batch.
+
+    The whole multipart body is received before the first image is analyzed.
+    Limits: at most BATCH_MAX_ITEMS images and BATCH_MAX_BYTES of body (413
+    beyond either); each file keeps at most BATCH_SPOOL_BYTES in memory and
+    spills the rest to a temp file, so disk, not RAM, holds a large batch.
+    Each image is still subject to IMAGE_MAX_UPLOAD_BYTES, reported per item.
+
+    With packed, images that miss the analysis cache share Gemini calls, up to
+    GEMINI_PACK_SIZE per call, so the copywriting prompt is sent once per pack
+    instead of once per image. Images whose entry in a packed reply is missing
+    or invalid are re-sent without the rest of their pack.
+    """
+    images = await _read_batch_images(request)
+    if not images:
+        raise HTTPException(status_code=400, detail="No images provided")
+
+    return StreamingResponse(_stream_batch(images, refresh, packed), media_type="application/x-ndjson")
+
+
+@router.post("/jobs", status_code=202, response_model=JobAccepted)
+async def create_analysis_job_endpoint(
+    image: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    refresh: bool = Query(False, description="Bypass the analysis cache and re-run Gemini"),
+):
+    """
+    Queue an image for analysis and return immediately.
+
+    Poll GET /analyze/jobs/{job_id}; once it has succeeded, "result" holds the
+    same body POST /analyze/product would have returned.
+    """
+    try:
+        with track_stage("upload_read"):
+            image_bytes = await read_upload(image)
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedImageError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Empty file")
+
+    job_id = await enqueue_analysis_job(db, image_bytes, refresh=refresh)
+    return JobAccepted(job_id=job_id, status="queued", status_url=f"{router.prefix}/jobs/{job_id}")
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_analysis_job_endpoint(job_id: str, db: AsyncSession = Depends(get_db)):
+    job = await get_analysis_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatus(
+        job_id=job.id,
+        status=job.status,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        result=job.result,
+        error=job.error,
+    )
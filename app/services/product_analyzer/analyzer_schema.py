@@ -20,7 +20,8 @@
 
 
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from datetime import datetime
+from typing import Any, List, Optional, Dict
 
 
 class Attributes(BaseModel):
@@ -31,10 +32,35 @@ class Attributes(BaseModel):
     other: Optional[str] = None
 
 
+class GeneratedListing(BaseModel):
+    """
+    Response schema for Gemini's constrained JSON output.
+
+    Fields are generated in this order, so the ones the keyword and price
+    stages need (title, attributes, seo_keywords) arrive before the long copy.
+    """
+    title: str
+    attributes: Attributes
+    seo_keywords: List[str]
+    promotional_tags: List[str]
+    meta_title: str
+    meta_description: str
+    short_description: str
+    description: str
+
+
+class PackedListing(GeneratedListing):
+    """One entry of a multi-image (packed) reply; `image` is the 1-based number of the image it describes."""
+    image: int
+
+
 class PriceRange(BaseModel):
     min_price: float
     avg_price: float
     max_price: float
+    median_price: Optional[float] = None
+    currency: Optional[str] = None
+    confidence: Optional[float] = None
 
 
 class ProductResult(BaseModel):
@@ -48,3 +74,19 @@ class ProductResult(BaseModel):
     price_range: PriceRange
     db_saved: Optional[bool] = None
     db_error: Optional[str] = None
+
+
+class JobAccepted(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str  # queued | running | succeeded | failed
+    attempts: int
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    result: Optional[Dict[str, Any]] = None  # same body as POST /analyze/product
+    error: Optional[str] = None  # last failure; set on queued jobs that are waiting to retry
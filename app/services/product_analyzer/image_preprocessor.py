@@ -0,0 +1,173 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+from app.core.config import (
+    IMAGE_MAX_UPLOAD_BYTES,
+    IMAGE_MAX_EDGE,
+    IMAGE_OUTPUT_FORMAT,
+    IMAGE_OUTPUT_QUALITY,
+    IMAGE_PREPROCESS_WORKERS,
+)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # without Pillow, images are forwarded as uploaded
+    Image = None
+
+READ_CHUNK_SIZE = 256 * 1024
+
+# Formats Gemini accepts as-is; anything else must be re-encoded
+GEMINI_MIME_TYPES = {"image/jpeg", "image/png", "image/webp", "image/heic", "image/heif"}
+
+_OUTPUT_MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class ImageTooLargeError(Exception):
+    pass
+
+
+class UnsupportedImageError(Exception):
+    pass
+
+
+def detect_image_format(head: bytes) -> Optional[str]:
+    """Sniff the MIME type from the file's magic bytes; None if it isn't a known image."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand in (b"heic", b"heix", b"heim", b"heis"):
+            return "image/heic"
+        if brand in (b"mif1", b"msf1"):
+            return "image/heif"
+        if brand in (b"avif", b"avis"):
+            return "image/avif"
+    if head[:2] == b"BM":
+        return "image/bmp"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff"
+    return None
+
+
+async def read_upload(upload, max_bytes: int = IMAGE_MAX_UPLOAD_BYTES) -> bytes:
+    """
+    Read an UploadFile in chunks, giving up as soon as it exceeds max_bytes.
+
+    Raises ImageTooLargeError for oversized uploads and UnsupportedImageError
+    when the content isn't a recognised image.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise ImageTooLargeError(f"Upload exceeds {max_bytes} bytes")
+
+    chunks = []
+    total = 0
+    while True:
+        chunk = await upload.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise ImageTooLargeError(f"Upload exceeds {max_bytes} bytes")
+        chunks.append(chunk)
+
+    image_bytes = b"".join(chunks)
+    if image_bytes and detect_image_format(image_bytes[:16]) is None:
+        raise UnsupportedImageError("Unsupported or unrecognised image format")
+    return image_bytes
+
+
+def _downscale_and_encode(image_bytes: bytes, max_edge: int, output_format: str, quality: int) -> Tuple[bytes, str]:
+    # Runs in a worker process: decode, shrink to max_edge, re-encode compactly
+    source_mime = detect_image_format(image_bytes[:16])
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img.draft(None, (max_edge, max_edge))  # JPEG: decode at reduced scale directly
+        img = ImageOps.exif_transpose(img)
+        resized = max(img.size) > max_edge
+        if resized:
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        if output_format == "JPEG" and img.mode != "RGB":
+            if img.mode in ("RGBA", "LA", "P"):
+                img = img.convert("RGBA")
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+            else:
+                img = img.convert("RGB")
+
+        out = io.BytesIO()
+        img.save(out, format=output_format, quality=quality)
+
+    encoded = out.getvalue()
+    # Small images that are already in an accepted format may not shrink further
+    if not resized and source_mime in GEMINI_MIME_TYPES and len(encoded) >= len(image_bytes):
+        return image_bytes, source_mime
+    return encoded, _OUTPUT_MIME_TYPES[output_format]
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and threads is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=IMAGE_PREPROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def start_preprocess_pool():
+    # Spawn the workers at startup instead of on the first upload
+    if Image is None or IMAGE_PREPROCESS_WORKERS <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    await asyncio.gather(*(loop.run_in_executor(pool, int) for _ in range(IMAGE_PREPROCESS_WORKERS)))
+
+
+def shutdown_preprocess_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def preprocess_image(image_bytes: bytes) -> Tuple[bytes, str]:
+    """
+    Prepare an upload for Gemini: downscale to IMAGE_MAX_EDGE and re-encode.
+
+    Returns (bytes, mime_type). Decoding and encoding run in a process pool so
+    the event loop never does the pixel work.
+    """
+    source_mime = detect_image_format(image_bytes[:16])
+    if Image is None:
+        if source_mime not in GEMINI_MIME_TYPES:
+            raise UnsupportedImageError(f"{source_mime} needs Pillow to be converted")
+        return image_bytes, source_mime
+
+    args = (image_bytes, IMAGE_MAX_EDGE, IMAGE_OUTPUT_FORMAT, IMAGE_OUTPUT_QUALITY)
+    try:
+        if IMAGE_PREPROCESS_WORKERS <= 0:
+            return _downscale_and_encode(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_pool(), _downscale_and_encode, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM on a decompression bomb); start a fresh pool next time
+        shutdown_preprocess_pool()
+        raise UnsupportedImageError("Image preprocessing worker crashed") from None
+    except Exception as e:
+        if source_mime in GEMINI_MIME_TYPES:
+            print(f"⚠️ Image preprocessing failed, sending original: {e}")
+            return image_bytes, source_mime
+        raise UnsupportedImageError(f"Could not decode image: {e}") from e
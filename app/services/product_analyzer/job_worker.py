@@ -0,0 +1,138 @@
+"""
+Workers for asynchronous analysis jobs (POST /analyze/jobs).
+
+Jobs live in the analysis_jobs table and are claimed with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of worker processes can share
+the queue. Workers run inside the API process unless JOB_WORKERS_IN_API is
+off; dedicated workers are started with
+
+    python -m app.services.product_analyzer.job_worker
+"""
+import asyncio
+import os
+import socket
+from typing import List
+from app.core.config import (
+    JOB_WORKER_CONCURRENCY,
+    JOB_MAX_ATTEMPTS,
+    JOB_VISIBILITY_TIMEOUT,
+    JOB_RETRY_DELAY,
+    JOB_POLL_INTERVAL,
+)
+from app.core.http_client import start_http_client, close_http_client
+from app.db.crud import claim_analysis_job, finish_analysis_job
+from app.db.database import async_session, start_db, close_db
+from app.db.models import AnalysisJob
+from app.services.product_analyzer.image_preprocessor import (
+    UnsupportedImageError,
+    start_preprocess_pool,
+    shutdown_preprocess_pool,
+)
+from app.services.product_analyzer.analyzer import start_gemini_client
+from app.services.product_analyzer.pipeline import analyze_image, enrich_analysis, save_product
+from app.services.product_analyzer.similar_products import start_similar_index, stop_similar_index
+from app.services.seo.competition_store import start_keyword_refresher, stop_keyword_refresher
+
+_workers: List[asyncio.Task] = []
+
+
+async def _analyze(image_bytes: bytes, refresh: bool) -> dict:
+    async with async_session() as db:
+        result = await analyze_image(db, image_bytes, refresh=refresh)
+    if "error" in result:
+        raise RuntimeError(result["error"])  # usually an unparseable Gemini reply; worth a retry
+
+    final_output, record = await enrich_analysis(result)
+    error_msg = await save_product(record)
+    final_output["db_saved"] = error_msg is None
+    if error_msg is not None:
+        final_output["db_error"] = error_msg
+    return final_output
+
+
+async def _run_job(job: AnalysisJob, worker_id: str):
+    if job.attempts > JOB_MAX_ATTEMPTS:
+        # Only reachable when earlier leases expired, i.e. workers died mid-job
+        outcome = {"error": f"Gave up after {JOB_MAX_ATTEMPTS} attempts"}
+    else:
+        try:
+            # Finish inside the lease so no other worker re-claims a job still running here
+            result = await asyncio.wait_for(
+                _analyze(job.image, job.refresh), timeout=JOB_VISIBILITY_TIMEOUT * 0.9
+            )
+            outcome = {"result": result}
+        except UnsupportedImageError as e:
+            outcome = {"error": str(e)}
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                message = f"Attempt exceeded {JOB_VISIBILITY_TIMEOUT * 0.9:.0f}s"
+            else:
+                message = str(e) or type(e).__name__
+            outcome = {"error": message}
+            if job.attempts < JOB_MAX_ATTEMPTS:
+                outcome["retry_in"] = JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            print(f"Job {job.id} attempt {job.attempts} failed: {message}")
+
+    async with async_session() as db:
+        if not await finish_analysis_job(db, job.id, worker_id, **outcome):
+            print(f"⚠️ Job {job.id}: lease lost before the result was recorded")
+
+
+async def _work(worker_id: str):
+    while True:
+        try:
+            async with async_session() as db:
+                job = await claim_analysis_job(db, worker_id, JOB_VISIBILITY_TIMEOUT)
+        except Exception as e:
+            print(f"⚠️ Job claim failed: {e}")
+            job = None
+
+        if job is None:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            continue
+        try:
+            await _run_job(job, worker_id)
+        except Exception as e:
+            # The lease expires and another attempt picks the job up
+            print(f"⚠️ Job {job.id} could not be finalized: {e}")
+
+
+def start_job_workers(concurrency: int = JOB_WORKER_CONCURRENCY):
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    for n in range(concurrency):
+        _workers.append(asyncio.create_task(_work(f"{prefix}:{n}")))
+
+
+async def stop_job_workers():
+    # Jobs interrupted here are retried by whichever worker claims them after their lease
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+
+async def _serve():
+    await start_db()
+    await start_http_client()
+    await start_gemini_client()
+    await start_preprocess_pool()
+    start_job_workers()
+    start_keyword_refresher()
+    start_similar_index()
+    print(f"Analysis job worker running with concurrency {JOB_WORKER_CONCURRENCY}")
+    try:
+        await asyncio.gather(*_workers)
+    finally:
+        await stop_job_workers()
+        await stop_keyword_refresher()
+        await stop_similar_index()
+        await close_http_client()
+        shutdown_preprocess_pool()
+        await close_db()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,178 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_WHITESPACE = " \t\r\n"
+_STRING_SPECIAL = re.compile(r'["\\]')
+_NESTED_SPECIAL = re.compile(r'["{}\[\]]')
+_SCALAR_END = re.compile(r"[,}\s]")
+_ARRAY_OF_OBJECTS = re.compile(r"\[\s*(?=\{)")
+_SPACE = re.compile(r"\s*")
+_DECODER = json.JSONDecoder()
+
+
+def complete_array_items(text: str) -> List[Any]:
+    """
+    Items of the first JSON array of objects in text, up to the first one that
+    doesn't decode. For replies cut off mid-array (output token limit) or
+    broken part way through, so the entries that did arrive whole are kept.
+    """
+    match = _ARRAY_OF_OBJECTS.search(text)
+    if match is None:
+        return []
+    items, pos = [], match.end()
+    while True:
+        try:
+            item, pos = _DECODER.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            return items
+        items.append(item)
+        pos = _SPACE.match(text, pos).end()
+        if not text.startswith(",", pos):
+            return items
+        pos = _SPACE.match(text, pos + 1).end()
+
+
+class StreamingObjectParser:
+    """
+    Incremental parser for one streamed JSON object.
+
+    feed() takes text chunks as they arrive and returns the top-level
+    (key, value) pairs whose values became complete in that chunk, so callers
+    can act on early fields while later ones are still being generated. Only
+    the top level is tracked incrementally; each finished value is decoded
+    with json.loads. Anything that isn't a bare JSON object (markdown fences,
+    preamble text) sets `failed`, and the caller should parse the full text
+    the old way instead.
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self.complete = False
+        self.failed = False
+        self._buf = ""
+        self._pos = 0  # next unread character
+        self._state = "start"  # start -> key -> colon -> value -> after_value -> key ... -> complete
+        self._key = None
+        self._value_start = None
+        self._scan = 0  # resume point inside the current value
+        self._depth = 0
+        self._in_string = False
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        if self.complete or self.failed:
+            return []
+        self._buf += text
+        completed = []
+        while not (self.complete or self.failed):
+            if self._state == "value" and self._value_start is not None:
+                end = self._scan_value()
+                if end is None:
+                    break
+                try:
+                    value = json.loads(self._buf[self._value_start:end])
+                except json.JSONDecodeError:
+                    self.failed = True
+                    break
+                self.fields[self._key] = value
+                completed.append((self._key, value))
+                self._pos, self._value_start, self._state = end, None, "after_value"
+                continue
+
+            pos = self._skip_whitespace(self._pos)
+            if pos >= len(self._buf):
+                break
+            char = self._buf[pos]
+
+            if self._state == "start":
+                self._expect(char == "{", pos + 1, "key")
+            elif self._state == "key":
+                if char == "}" and not self.fields:
+                    self._pos, self.complete = pos + 1, True
+                elif char == '"':
+                    end, _ = self._string_end(pos + 1)
+                    if end is None:
+                        break
+                    self._key = json.loads(self._buf[pos:end])
+                    self._pos, self._state = end, "colon"
+                else:
+                    self.failed = True
+            elif self._state == "colon":
+                self._expect(char == ":", pos + 1, "value")
+            elif self._state == "value":
+                self._value_start = self._scan = pos
+                self._depth, self._in_string = 0, False
+            elif self._state == "after_value":
+                if char == "}":
+                    self._pos, self.complete = pos + 1, True
+                else:
+                    self._expect(char == ",", pos + 1, "key")
+        return completed
+
+    def _expect(self, ok: bool, next_pos: int, next_state: str):
+        if ok:
+            self._pos, self._state = next_pos, next_state
+        else:
+            self.failed = True
+
+    def _skip_whitespace(self, pos: int) -> int:
+        buf = self._buf
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        return pos
+
+    def _string_end(self, pos: int) -> Tuple[Optional[int], int]:
+        """
+        (index just past the closing quote, _) for a string body starting at pos,
+        or (None, resume) when the string hasn't fully arrived yet.
+        """
+        buf = self._buf
+        while True:
+            match = _STRING_SPECIAL.search(buf, pos)
+            if match is None:
+                return None, len(buf)
+            if match.group() == '"':
+                return match.end(), match.end()
+            if match.end() >= len(buf):  # escape split across chunks
+                return None, match.start()
+            pos = match.end() + 1
+
+    def _scan_value(self):
+        """End index of the value starting at _value_start, or None (resumable) if it is incomplete."""
+        buf = self._buf
+        first = buf[self._value_start]
+
+        if first == '"':
+            end, self._scan = self._string_end(max(self._scan, self._value_start + 1))
+            return end
+
+        if first in "{[":
+            pos = self._scan
+            while True:
+                if self._in_string:
+                    end, pos = self._string_end(pos)
+                    if end is None:
+                        self._scan = pos
+                        return None
+                    self._in_string = False
+                    continue
+                match = _NESTED_SPECIAL.search(buf, pos)
+                if match is None:
+                    self._scan = len(buf)
+                    return None
+                char, pos = match.group(), match.end()
+                if char == '"':
+                    self._in_string = True
+                elif char in "{[":
+                    self._depth += 1
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        return pos
+
+        # number, true, false, null: ends at the next delimiter
+        match = _SCALAR_END.search(buf, self._scan)
+        if match is None:
+            self._scan = len(buf)
+            return None
+        return match.start()
@@ -0,0 +1,316 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import (
+    KEYWORD_STAGE_TIMEOUT,
+    PRICE_STAGE_TIMEOUT,
+    DB_SAVE_TIMEOUT,
+    ANALYSIS_CACHE_ENABLED,
+    SIMILAR_PRODUCT_THRESHOLD,
+    SIMILAR_PRODUCT_TIMEOUT,
+)
+from app.core.metrics import CACHE_LOOKUPS, STAGE_FALLBACKS, track_stage
+from app.services.product_analyzer.analyzer import analyze_product_image_async, analyze_product_image_packed, FieldCallback
+from app.services.product_analyzer.image_preprocessor import preprocess_image
+from app.services.product_analyzer.analysis_cache import fingerprint_image, get_cached_analysis, store_cached_analysis
+from app.services.product_analyzer.similar_products import find_similar_product, add_product
+from app.services.seo.seo_service import score_keywords_with_google, rescore_reused_keywords
+from app.services.pricing.price_fetcher import fetch_price_from_web
+from app.db.database import async_session
+from app.db.crud import save_product_result, get_product
+
+MAX_GOOGLE_KEYWORDS = 15
+
+
+async def analyze_image(
+    db: AsyncSession,
+    image_bytes: bytes,
+    refresh: bool = False,
+    on_field: Optional[FieldCallback] = None,
+    packed: bool = False,
+) -> dict:
+    """
+    Gemini analysis for one image, served from the analysis cache when possible.
+
+    The cache is keyed on the bytes as uploaded; only a miss pays for
+    preprocessing. Returns the parsed result or an {"error": ...} dict; raises
+    AnalyzerBusyError when no Gemini slot frees up in time and
+    UnsupportedImageError when the image can't be decoded. on_field is passed
+    to the streaming Gemini call; it is not called for cache hits. With
+    packed, the Gemini call is shared with other images analyzed at the same
+    time (bulk imports) and on_field is not used.
+    """
+    with track_stage("analysis_cache"):
+        fingerprint = await fingerprint_image(image_bytes)
+        result = None if refresh else await get_cached_analysis(db, fingerprint)
+    if ANALYSIS_CACHE_ENABLED and not refresh:
+        CACHE_LOOKUPS.labels("analysis", "miss" if result is None else "hit").inc()
+    if result is None:
+        with track_stage("preprocess"):
+            model_bytes, mime_type = await preprocess_image(image_bytes)
+        if packed:
+            result = await analyze_product_image_packed(model_bytes, mime_type)
+        else:
+            result = await analyze_product_image_async(model_bytes, mime_type, on_field=on_field)
+        await store_cached_analysis(db, fingerprint, result)
+    if not isinstance(result, dict):
+        return {"error": "Invalid response from image analyzer"}
+    return result
+
+
+async def run_stage(name: str, coro: Awaitable, timeout: float, fallback: Callable[[], Any]) -> Any:
+    """Await one pipeline stage within its own time budget, degrading to fallback() on overrun or error."""
+    try:
+        with track_stage(name):
+            return await asyncio.wait_for(coro, timeout=timeout)
+    except asyncio.TimeoutError:
+        STAGE_FALLBACKS.labels(name, "timeout").inc()
+        print(f"⏱️ Stage '{name}' exceeded {timeout}s, using partial result")
+    except Exception as e:
+        STAGE_FALLBACKS.labels(name, "error").inc()
+        print(f"{name} failed: {e}")
+    return fallback()
+
+
+def _unranked_keywords(keywords: list) -> list:
+    return [{"keyword": k, "combined_score": 0.5} for k in keywords[:6]]
+
+
+def _no_price(source: str) -> dict:
+    return {"min_price": None, "avg_price": None, "max_price": None, "source": source}
+
+
+def _keyword_list(raw_keywords) -> list:
+    if not isinstance(raw_keywords, list):
+        raw_keywords = [raw_keywords]
+    return [str(k) for k in raw_keywords if k]
+
+
+async def _load_similar(product_id: int) -> Optional[dict]:
+    async with async_session() as db:
+        product = await get_product(db, product_id)
+        if product is None:
+            return None
+        return {
+            "id": product.id,
+            "title": product.title,
+            "keywords": [{"keyword": k.keyword, "google_total_results": k.google_total_results} for k in product.keywords],
+            "price_range": product.price_range,
+        }
+
+
+async def _find_similar(title: str, attributes: dict) -> Optional[dict]:
+    """
+    The stored product nearest to this one above SIMILAR_PRODUCT_THRESHOLD,
+    with its scored keywords and price range, or None.
+    """
+    try:
+        with track_stage("similar_lookup"):
+            match = find_similar_product(title, attributes, SIMILAR_PRODUCT_THRESHOLD)
+            if match is None:
+                return None
+            similar = await asyncio.wait_for(_load_similar(match.product_id), timeout=SIMILAR_PRODUCT_TIMEOUT)
+    except Exception as e:
+        print(f"⚠️ Similar product lookup failed: {e}")
+        return None
+    if similar is not None:
+        similar["similarity"] = round(match.similarity, 3)
+        print(f"♻️ Similar stored product {similar['id']} ({match.similarity:.2f}): {similar['title']}")
+    return similar
+
+
+async def _price_stage(similar: asyncio.Task, product_title: str, category: str) -> dict:
+    # shield: the keyword stage waits on the same lookup, and this stage may be cancelled on its deadline
+    match = await asyncio.shield(similar)
+    if match and match["price_range"]:
+        return {**match["price_range"], "source": "similar_product"}
+    print(f"🔍 Fetching prices for: {product_title}")
+    return await fetch_price_from_web(product_title, category)
+
+
+async def _keyword_stage(similar: asyncio.Task, keywords: list, attributes: dict) -> list:
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    match = await asyncio.shield(similar)
+    if match and match["keywords"]:
+        return rescore_reused_keywords(match["keywords"], attributes)
+    # Keyword scoring trims its own Google lookups slightly before the stage deadline
+    # so finished lookups are kept; the outer budget only catches a stuck stage.
+    return await score_keywords_with_google(
+        keywords,
+        attributes,
+        max_keywords=MAX_GOOGLE_KEYWORDS,
+        timeout=max(0.0, KEYWORD_STAGE_TIMEOUT * 0.9 - (loop.time() - started)),
+    )
+
+
+def _start_stages(fields: dict, stages: Dict[str, asyncio.Task], final: bool = False):
+    """
+    Start the similar-product lookup and the keyword and price stages once the
+    fields they depend on exist.
+
+    Called for each streamed Gemini field and once more with the full result
+    (final=True), which starts whatever hasn't started yet with defaults for
+    missing fields. Each stage runs under its own deadline from when it starts.
+    Keyword and price stages first wait for the lookup and reuse what a
+    near-identical stored product already has.
+    """
+    attributes = fields.get("attributes", {} if final else None)
+    if attributes is None:
+        return
+
+    if "similar" not in stages and (final or "title" in fields):
+        product_title = fields.get("title", "")
+        stages["similar"] = asyncio.ensure_future(_find_similar(product_title, attributes))
+        stages["price"] = asyncio.ensure_future(run_stage(
+            "price_fetch",
+            _price_stage(stages["similar"], product_title, attributes.get("category", "")),
+            PRICE_STAGE_TIMEOUT,
+            lambda: _no_price("timeout"),
+        ))
+
+    if "keywords" not in stages and "similar" in stages and (final or "seo_keywords" in fields):
+        keywords = _keyword_list(fields.get("seo_keywords", []))
+        stages["keywords"] = asyncio.ensure_future(run_stage(
+            "keyword_scoring",
+            _keyword_stage(stages["similar"], keywords, attributes),
+            KEYWORD_STAGE_TIMEOUT,
+            lambda: _unranked_keywords(keywords),
+        ))
+
+
+async def _finish_stages(result: dict, stages: Dict[str, asyncio.Task]) -> Tuple[dict, dict]:
+    _start_stages(result, stages, final=True)
+    try:
+        all_ranked, price_range, similar = await asyncio.gather(stages["keywords"], stages["price"], stages["similar"])
+    finally:
+        for task in stages.values():
+            task.cancel()  # no-op once finished; stops the other stage if one raised
+    return _build_output(result, all_ranked, price_range, similar)
+
+
+def _build_output(result: dict, all_ranked: list, price_range: dict, similar: Optional[dict] = None) -> Tuple[dict, dict]:
+    attributes = result.get("attributes", {})
+    product_title = result.get("title", "")
+
+    sorted_tags = sorted(all_ranked, key=lambda x: x["combined_score"], reverse=True)
+    # One tag per near-duplicate cluster, so the six tags cover six different searches
+    top_6_tags, seen_clusters = [], set()
+    for tag in sorted_tags:
+        cluster = tag.get("cluster", tag["keyword"])
+        if cluster not in seen_clusters:
+            seen_clusters.add(cluster)
+            top_6_tags.append(tag["keyword"])
+            if len(top_6_tags) == 6:
+                break
+
+    # If web search found no prices, return None instead of AI estimate
+    if price_range.get("min_price") is None:
+        print(f"⚠️ Could not find web prices, source: {price_range.get('source')}")
+        price_range = None  # Don't return unreliable data
+    else:
+        print(f"✅ Web prices found: {price_range.get('currency', 'USD')} {price_range['min_price']} - {price_range['max_price']}")
+
+    final_output = {
+        "title": product_title,
+        "description": result.get("description"),
+        "short_description": result.get("short_description"),
+        "meta_title": result.get("meta_title"),
+        "meta_description": result.get("meta_description"),
+        "tags": top_6_tags,
+        "promotional_tags": result.get("promotional_tags", [])[:6],
+    }
+
+    # Only include price_range if web search was successful
+    if price_range:
+        final_output["price_range"] = price_range
+
+    if similar:
+        reused = []
+        if any(k.get("source") == "similar_product" for k in all_ranked):
+            reused.append("keywords")
+        if price_range and price_range.get("source") == "similar_product":
+            reused.append("price_range")
+        final_output["similar_product"] = {
+            "id": similar["id"],
+            "title": similar["title"],
+            "similarity": similar["similarity"],
+            "reused": reused,
+        }
+
+    record = {
+        "title": product_title,
+        "description": result.get("description", ""),
+        "attributes": attributes,
+        "keywords": all_ranked,
+        "price_range": price_range,
+    }
+    return final_output, record
+
+
+async def enrich_analysis(result: dict) -> Tuple[dict, dict]:
+    """
+    Run the post-Gemini stages for one analyzed product.
+
+    Keyword scoring and price lookup only depend on the Gemini result, so they
+    run concurrently, each under its own deadline. Returns the response body
+    and the record to persist with save_product().
+    """
+    return await _finish_stages(result, {})
+
+
+async def analyze_and_enrich(
+    db: AsyncSession, image_bytes: bytes, refresh: bool = False
+) -> Tuple[dict, Optional[dict], Optional[dict]]:
+    """
+    analyze_image() followed by enrich_analysis(), overlapped.
+
+    When Gemini streams its reply, keyword scoring and the price lookup start
+    as soon as title, attributes and seo_keywords have arrived, while the
+    descriptions are still being generated. Returns (result, final_output,
+    record); the last two are None when result is an {"error": ...} dict.
+    """
+    fields: dict = {}
+    stages: Dict[str, asyncio.Task] = {}
+
+    def on_field(key: str, value: Any):
+        fields[key] = value
+        try:
+            _start_stages(fields, stages)
+        except Exception as e:  # e.g. attributes that aren't an object; the final pass retries
+            print(f"Early stage start failed: {e}")
+
+    try:
+        result = await analyze_image(db, image_bytes, refresh=refresh, on_field=on_field)
+    except BaseException:
+        for task in stages.values():
+            task.cancel()
+        raise
+    if "error" in result:
+        for task in stages.values():
+            task.cancel()
+        return result, None, None
+
+    final_output, record = await _finish_stages(result, stages)
+    return result, final_output, record
+
+
+async def save_product(record: dict) -> Optional[str]:
+    """
+    Persist an enriched product on its own session.
+
+    Independent of the request's session so it can run as a background task
+    after the response has been sent. Returns an error message, or None on success.
+    """
+    try:
+        with track_stage("db_save"):
+            async with async_session() as db:
+                product_id = await asyncio.wait_for(save_product_result(db=db, **record), timeout=DB_SAVE_TIMEOUT)
+        add_product(product_id, record["title"], record["attributes"])
+        return None
+    except asyncio.TimeoutError:
+        error_msg = f"Database save exceeded {DB_SAVE_TIMEOUT}s"
+    except Exception as e:
+        error_msg = str(e)
+    print(f"Database save failed: {error_msg}")
+    return error_msg
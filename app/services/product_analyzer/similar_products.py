@@ -0,0 +1,343 @@
+"""
+In-memory index of stored products, used to spot near-identical listings
+(the same item in another color or size) whose keywords and price range can
+be reused instead of querying Google again.
+
+Each product is a hashed n-gram vector of its title and main attributes,
+with color and size words left out since that is where variants differ,
+L2-normalized and stored as one int8 row of a NumPy matrix. Random-hyperplane
+LSH tables (multi-probe) narrow a lookup to a few hundred candidate rows, which
+are then scored exactly, so lookups stay under a millisecond at a million
+products.
+
+The index is filled from the products table at startup, in the background,
+and then pulled incrementally; products saved by this worker are added right
+away. Each pull re-reads the last SIMILAR_INDEX_SYNC_OVERLAP ids, since another
+worker may commit a product after one with a higher id was already pulled.
+"""
+import asyncio
+import re
+import threading
+import zlib
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+from app.core.config import (
+    SIMILAR_PRODUCTS_ENABLED,
+    SIMILAR_INDEX_DIM,
+    SIMILAR_INDEX_TABLES,
+    SIMILAR_INDEX_BITS,
+    SIMILAR_INDEX_PROBES,
+    SIMILAR_INDEX_SYNC_INTERVAL,
+    SIMILAR_INDEX_SYNC_OVERLAP,
+)
+from app.db.crud import list_product_texts
+from app.db.database import async_session
+from app.services.seo.keyword_clusters import _POSSESSIVE, _stem
+
+_TOKEN = re.compile(r"[^\W_]+")
+_SIZE = re.compile(r"\bsize\s+[^\W_]+")
+# Variants of one product differ exactly here, so these never count towards similarity
+_VARIANT_WORDS = frozenset((
+    "black", "white", "red", "blue", "navy", "green", "olive", "yellow", "orange", "pink", "purple", "brown",
+    "beige", "grey", "gray", "silver", "gold", "cream", "ivory", "khaki", "tan", "burgundy", "teal",
+    "xxs", "xs", "s", "m", "l", "xl", "xxl", "xxxl", "small", "medium", "large",
+))
+_ATTRIBUTE_KEYS = ("category", "brand", "material")
+# Model numbers ("pegasus 40", "xr500") and audience tell products of one line apart; keywords differ for them
+_DISTINCT_WEIGHT = 3.0
+_AUDIENCE_WORDS = frozenset(("men", "mens", "women", "womens", "kids", "boys", "girls", "baby", "unisex"))
+_SYNC_CHUNK = 5000
+_ADD_BATCH = 256  # rows written per hold of the lock that lookups on the event loop wait for
+_COMPACT_ROWS = 50000  # recent rows kept in the dict before add_many() merges them
+
+
+class SimilarProduct(NamedTuple):
+    product_id: int
+    similarity: float  # cosine, 0..1
+
+
+def _features(title: str, attributes: Optional[dict]) -> List[Tuple[str, float]]:
+    attributes = attributes or {}
+    variant = set(_VARIANT_WORDS)
+    for key in ("color", "size"):
+        variant.update(_TOKEN.findall(str(attributes.get(key) or "").lower()))
+    text = _SIZE.sub(" ", _POSSESSIVE.sub("", (title or "").lower()))
+    words = [_stem(w) for w in _TOKEN.findall(text) if w not in variant]
+
+    joined = " ".join(words)
+    features = [
+        (w, _DISTINCT_WEIGHT if w in _AUDIENCE_WORDS or any(c.isdigit() for c in w) else 1.0) for w in words
+    ]
+    features += [(f"{a} {b}", 1.0) for a, b in zip(words, words[1:])]
+    features += [(joined[i:i + 3], 1.0) for i in range(len(joined) - 2)]  # char trigrams absorb plurals and typos
+    for key in _ATTRIBUTE_KEYS:
+        value = attributes.get(key)
+        if value:
+            features.append((f"{key}={str(value).lower().strip()}", 1.0))
+    return features
+
+
+def vectorize(title: str, attributes: Optional[dict], dim: int = SIMILAR_INDEX_DIM) -> Optional[np.ndarray]:
+    """Signed feature-hashing vector, L2-normalized; None when there is nothing to hash."""
+    features = _features(title, attributes)
+    if not features:
+        return None
+    hashes = np.fromiter((zlib.crc32(f.encode()) for f, _ in features), dtype=np.uint32, count=len(features))
+    weights = np.fromiter((w for _, w in features), dtype=np.float32, count=len(features))
+    vector = np.zeros(dim, dtype=np.float32)
+    np.add.at(vector, (hashes >> 1) % dim, np.where(hashes & 1, weights, -weights))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+class SimilarProductIndex:
+    """
+    Product vectors plus LSH tables; safe to update from a thread while the event loop reads.
+
+    All tables share one sorted array of (table, signature) keys, searched
+    with np.searchsorted. Products added since the last compact() are kept in
+    a dict until add_many() folds them in.
+    """
+
+    def __init__(
+        self,
+        dim: int = SIMILAR_INDEX_DIM,
+        tables: int = SIMILAR_INDEX_TABLES,
+        bits: int = SIMILAR_INDEX_BITS,
+        probes: int = SIMILAR_INDEX_PROBES,
+    ):
+        self.dim = dim
+        self.tables = tables
+        self.bits = bits
+        self.probes = probes
+        # Fixed seed: every worker hashes the same way
+        self._planes = np.random.default_rng(0).standard_normal((dim, tables * bits)).astype(np.float32)
+        self._powers = 1 << np.arange(bits, dtype=np.int64)
+        self._table_keys = np.arange(tables, dtype=np.int64)[:, None] << bits
+        self._key_dtype = np.uint32 if (tables - 1) << bits < 2**32 else np.uint64
+        self._vectors = np.zeros((1024, dim), dtype=np.int8)
+        self._ids = np.zeros(1024, dtype=np.int64)
+        self._size = 0
+        # Rows below _merged are in the sorted arrays, the rest in _recent
+        self._sorted_keys = np.zeros(0, dtype=self._key_dtype)
+        self._sorted_rows = np.zeros(0, dtype=np.int32)
+        self._merged = 0
+        # Tuples of ints, not lists: the garbage collector stops tracking them, so full
+        # collections don't rescan every bucket (they stalled the process for 100+ ms)
+        self._recent: Dict[int, Tuple[int, ...]] = {}  # key -> rows
+        self._recent_keys: List[Tuple[int, ...]] = []  # per row from _merged on
+        self._lock = threading.Lock()  # short holds only: lookups take it on the event loop
+        self._write_lock = threading.Lock()  # one writer at a time
+        self._compact_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _keys(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, tables) keys: table number in the high bits, the row's signature in that table below."""
+        bits = (vectors @ self._planes > 0).reshape(len(vectors), self.tables, self.bits)
+        return (bits @ self._powers) | self._table_keys[:, 0]
+
+    def _probe_keys(self, vector: np.ndarray) -> np.ndarray:
+        """Each table's key, plus it with one of its least certain bits flipped, `probes` times."""
+        projections = (vector @ self._planes).reshape(self.tables, self.bits)
+        keys = (((projections > 0) @ self._powers) | self._table_keys[:, 0])[:, None]
+        if self.probes:
+            uncertain = np.argsort(np.abs(projections), axis=1)[:, :self.probes]
+            keys = np.concatenate([keys, keys ^ (1 << uncertain)], axis=1)
+        return keys.ravel().astype(self._key_dtype)  # same dtype as the sorted keys, so searchsorted doesn't convert them
+
+    def add_many(self, products: Iterable[Tuple[int, str, Optional[dict]]]) -> int:
+        """
+        Add (product_id, title, attributes) rows; returns how many were indexable.
+        For bulk loads from a worker thread: may spend a while in compact().
+        """
+        ids, vectors = [], []
+        for product_id, title, attributes in products:
+            vector = vectorize(title, attributes, self.dim)
+            if vector is not None:
+                ids.append(product_id)
+                vectors.append(vector)
+        if ids:
+            self.add_vectors(ids, np.stack(vectors))
+        if self._size - self._merged >= _COMPACT_ROWS:
+            self.compact()
+        return len(ids)
+
+    def add_vectors(self, ids: List[int], vectors: np.ndarray):
+        """Add already vectorized products: one row of `vectors` per id."""
+        keys = list(map(tuple, self._keys(vectors).tolist()))
+        quantized = np.round(vectors * 127).astype(np.int8)
+
+        for offset in range(0, len(ids), _ADD_BATCH):
+            end = offset + _ADD_BATCH
+            with self._write_lock:
+                self._reserve_rows(min(end, len(ids)) - offset)
+                with self._lock:
+                    self._append(ids[offset:end], quantized[offset:end], keys[offset:end])
+
+    def _reserve_rows(self, count: int):
+        # Grow into new arrays without blocking lookups: the write lock keeps rows below _size unchanged
+        needed = self._size + count
+        if needed <= len(self._ids):
+            return
+        capacity = max(needed, 2 * len(self._ids))
+        vectors = np.zeros((capacity, self.dim), np.int8)
+        vectors[:self._size] = self._vectors[:self._size]
+        ids = np.zeros(capacity, np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        with self._lock:
+            self._vectors, self._ids = vectors, ids
+
+    def _append(self, ids: List[int], quantized: np.ndarray, keys: List[Tuple[int, ...]]):
+        start = self._size
+        needed = start + len(ids)
+        self._vectors[start:needed] = quantized
+        self._ids[start:needed] = ids
+        for row, row_keys in enumerate(keys, start):
+            for key in row_keys:
+                self._recent[key] = self._recent.get(key, ()) + (row,)
+        self._recent_keys.extend(keys)
+        self._size = needed
+
+    def add(self, product_id: int, title: str, attributes: Optional[dict]):
+        """Add one product; cheap enough for the event loop."""
+        vector = vectorize(title, attributes, self.dim)
+        if vector is not None:
+            self.add_vectors([product_id], vector[None, :])
+
+    def compact(self):
+        """Fold recently added rows into the sorted arrays; lookups continue meanwhile."""
+        with self._compact_lock:
+            with self._lock:
+                start, end = self._merged, self._size
+                pending = self._recent_keys[:end - start]
+                sorted_keys, sorted_rows = self._sorted_keys, self._sorted_rows
+            pending = np.array(pending, dtype=self._key_dtype).ravel()  # slow for many rows; not under the lock
+            if not len(pending):
+                return
+
+            keys = np.concatenate([sorted_keys, pending])
+            order = np.argsort(keys, kind="stable")  # a sorted run plus a short tail: near linear
+            rows = np.concatenate([sorted_rows, np.repeat(np.arange(start, end, dtype=np.int32), self.tables)])
+            keys, rows = keys[order], rows[order]
+
+            with self._write_lock:  # rows added meanwhile stay in the new _recent
+                tail = self._recent_keys[end - start:]
+                recent = {}
+                for row, row_keys in enumerate(tail, end):
+                    for key in row_keys:
+                        recent[key] = recent.get(key, ()) + (row,)
+                with self._lock:
+                    merged = self._recent
+                    self._sorted_keys, self._sorted_rows = keys, rows
+                    self._recent_keys, self._recent = tail, recent
+                    self._merged = end
+            del merged  # freeing a big dict of lists takes a while; not under the locks
+
+    def lookup(self, title: str, attributes: Optional[dict], threshold: float) -> Optional[SimilarProduct]:
+        """Most similar indexed product with cosine similarity >= threshold, if any."""
+        vector = vectorize(title, attributes, self.dim)
+        if vector is None:
+            return None
+        probes = self._probe_keys(vector)
+
+        with self._lock:
+            low = np.searchsorted(self._sorted_keys, probes, "left").tolist()
+            high = np.searchsorted(self._sorted_keys, probes, "right").tolist()
+            parts = [self._sorted_rows[lo:hi] for lo, hi in zip(low, high) if hi > lo]
+            recent_rows = [row for key in probes.tolist() for row in self._recent.get(key, ())]
+            if recent_rows:
+                parts.append(np.array(recent_rows, dtype=np.int32))
+            if not parts:
+                return None
+            # A row found through several tables is just scored more than once
+            rows = np.concatenate(parts)
+            similarities = (self._vectors[rows] @ vector) / 127
+            best = int(np.argmax(similarities))
+            product_id = int(self._ids[rows[best]])
+
+        similarity = float(similarities[best])
+        if similarity < threshold:
+            return None
+        return SimilarProduct(product_id, min(similarity, 1.0))
+
+
+_index = SimilarProductIndex()
+_synced_id = 0  # highest product id pulled from the database
+_indexed_tail = set()  # indexed ids within the overlap window, which the next pull re-reads
+_sync_task: Optional[asyncio.Task] = None
+
+
+def find_similar_product(title: str, attributes: Optional[dict], threshold: float) -> Optional[SimilarProduct]:
+    if not SIMILAR_PRODUCTS_ENABLED:
+        return None
+    return _index.lookup(title, attributes, threshold)
+
+
+def add_product(product_id: int, title: str, attributes: Optional[dict]):
+    """Index a product just saved by this worker."""
+    if not SIMILAR_PRODUCTS_ENABLED or product_id in _indexed_tail:
+        return
+    _index.add(product_id, title, attributes)
+    if product_id > _synced_id - SIMILAR_INDEX_SYNC_OVERLAP:
+        _indexed_tail.add(product_id)
+
+
+def _trim_tail():
+    floor = _synced_id - SIMILAR_INDEX_SYNC_OVERLAP
+    _indexed_tail.difference_update([i for i in _indexed_tail if i <= floor])
+
+
+async def sync_index() -> int:
+    """
+    Pull products saved since the last pull (by any worker); returns how many were added.
+
+    Ids come from a sequence when a product is inserted, but become visible
+    when it commits, so a slow transaction can appear below ids already pulled.
+    Re-reading the overlap window catches those; ids already indexed are
+    skipped.
+    """
+    global _synced_id
+    loop = asyncio.get_running_loop()
+    after_id = max(0, _synced_id - SIMILAR_INDEX_SYNC_OVERLAP)
+    added = 0
+    while True:
+        async with async_session() as db:
+            rows = await list_product_texts(db, after_id, _SYNC_CHUNK)
+        if not rows:
+            return added
+        after_id = rows[-1][0]
+        fresh = [row for row in rows if row[0] not in _indexed_tail]
+        # Claimed before the executor runs, so add_product() meanwhile doesn't index them twice
+        _indexed_tail.update(row[0] for row in fresh)
+        _synced_id = max(_synced_id, after_id)
+        _trim_tail()
+        # Hashing thousands of titles is CPU work; keep it off the event loop
+        added += await loop.run_in_executor(None, _index.add_many, fresh)
+
+
+async def _sync_loop():
+    while True:
+        try:
+            added = await sync_index()
+            if added and len(_index) == added:
+                print(f"✅ Similar-product index loaded with {added} products")
+        except Exception as e:
+            print(f"⚠️ Similar-product index sync failed: {e}")
+        await asyncio.sleep(SIMILAR_INDEX_SYNC_INTERVAL)
+
+
+def start_similar_index():
+    """Load the index in the background; lookups find nothing until products are loaded."""
+    global _sync_task
+    if SIMILAR_PRODUCTS_ENABLED and _sync_task is None:
+        _sync_task = asyncio.create_task(_sync_loop())
+
+
+async def stop_similar_index():
+    global _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        await asyncio.gather(_sync_task, return_exceptions=True)
+        _sync_task = None
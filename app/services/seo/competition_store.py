@@ -0,0 +1,126 @@
+"""
+Google competition counts persisted in the keyword_competition table.
+
+Requests read the store once per batch of keywords and only send CSE queries
+for keywords it doesn't know; newly fetched counts are written back after the
+response. A background refresher re-fetches entries older than
+KEYWORD_REFRESH_AGE, most used first, at background CSE priority.
+"""
+import asyncio
+from typing import Dict, Iterable, List, Optional, Set
+from app.core.config import (
+    KEYWORD_STORE_ENABLED,
+    KEYWORD_STORE_MAX_AGE,
+    KEYWORD_STORE_TIMEOUT,
+    KEYWORD_REFRESH_AGE,
+    KEYWORD_REFRESH_INTERVAL,
+    KEYWORD_REFRESH_BATCH,
+    KEYWORD_REFRESH_LEASE,
+)
+from app.core.cse_scheduler import PRIORITY_BACKGROUND
+from app.core.metrics import CACHE_LOOKUPS
+from app.db.crud import (
+    normalize_keyword,
+    get_keyword_competition,
+    record_keyword_competition,
+    claim_stale_keyword_competition,
+)
+from app.db.database import async_session
+from .google_competetion import _request_google_count, _map_count_to_competition
+
+_pending_writes: Set[asyncio.Task] = set()
+_refresher: Optional[asyncio.Task] = None
+
+
+async def load_stored_competition(keywords: List[str], timeout: Optional[float] = None) -> Dict[str, dict]:
+    """
+    Stored competition for the given keywords in one query, shaped like
+    score_keyword_with_google results. Missing, expired and unreachable
+    entries are simply absent. The read gives up after KEYWORD_STORE_TIMEOUT,
+    or after timeout if that is shorter.
+    """
+    if not KEYWORD_STORE_ENABLED or not keywords:
+        return {}
+    terms = {k: normalize_keyword(k) for k in keywords}
+    try:
+        async with async_session() as db:
+            counts = await asyncio.wait_for(
+                get_keyword_competition(db, terms.values(), KEYWORD_STORE_MAX_AGE),
+                timeout=KEYWORD_STORE_TIMEOUT if timeout is None else min(timeout, KEYWORD_STORE_TIMEOUT),
+            )
+    except Exception as e:
+        print(f"⚠️ Keyword store lookup failed: {e}")
+        return {}
+
+    stored = {
+        k: {"keyword": k, "google": _map_count_to_competition(counts[term])}
+        for k, term in terms.items() if term in counts
+    }
+    CACHE_LOOKUPS.labels("keyword_store", "hit").inc(len(stored))
+    CACHE_LOOKUPS.labels("keyword_store", "miss").inc(len(terms) - len(stored))
+    return stored
+
+
+def remember_competition(counts: Dict[str, int], used: Iterable[str] = ()):
+    """Write fetched counts (keyword -> total) and usage of stored keywords, off the request path."""
+    if not KEYWORD_STORE_ENABLED:
+        return
+    spellings = {normalize_keyword(k): k for k in [*used, *counts]}
+    counts = {normalize_keyword(k): total for k, total in counts.items() if total > 0}
+    used = {normalize_keyword(k) for k in used}
+    if not counts and not used:
+        return
+    task = asyncio.ensure_future(_write(counts, used, spellings=spellings))
+    _pending_writes.add(task)
+    task.add_done_callback(_pending_writes.discard)
+
+
+async def _write(counts: Dict[str, int], used: Set[str], count_use: bool = True, spellings: Optional[Dict[str, str]] = None):
+    try:
+        async with async_session() as db:
+            await record_keyword_competition(db, counts, used, count_use=count_use, spellings=spellings)
+    except Exception as e:
+        print(f"⚠️ Keyword store write failed: {e}")
+
+
+async def refresh_stale_keywords(limit: int = KEYWORD_REFRESH_BATCH) -> int:
+    """One refresher pass; returns how many entries were updated."""
+    async with async_session() as db:
+        terms = await claim_stale_keyword_competition(db, KEYWORD_REFRESH_AGE, limit, KEYWORD_REFRESH_LEASE)
+    if not terms:
+        return 0
+
+    totals = await asyncio.gather(
+        *(_request_google_count(term, PRIORITY_BACKGROUND) for term in terms), return_exceptions=True
+    )
+    # Failed or empty lookups keep their old count; the lease delays the next try
+    counts = {term: total for term, total in zip(terms, totals) if isinstance(total, int) and total > 0}
+    if counts:
+        await _write(counts, set(), count_use=False)
+    return len(counts)
+
+
+async def _refresh_loop():
+    while True:
+        await asyncio.sleep(KEYWORD_REFRESH_INTERVAL)
+        try:
+            await refresh_stale_keywords()
+        except Exception as e:
+            print(f"⚠️ Keyword refresh failed: {e}")
+
+
+def start_keyword_refresher():
+    global _refresher
+    if KEYWORD_STORE_ENABLED and KEYWORD_REFRESH_INTERVAL > 0 and _refresher is None:
+        _refresher = asyncio.create_task(_refresh_loop())
+
+
+async def stop_keyword_refresher():
+    global _refresher
+    if _refresher is not None:
+        _refresher.cancel()
+        await asyncio.gather(_refresher, return_exceptions=True)
+        _refresher = None
+    # Let queued writes land so fetched counts aren't lost on shutdown
+    await asyncio.gather(*_pending_writes, return_exceptions=True)
+
@@ -1,32 +1,31 @@
-import os
 import math
-import asyncio
-import httpx
-from dotenv import load_dotenv
-from cachetools import TTLCache, cached
-
-load_dotenv()
-
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
-
-if not GOOGLE_API_KEY or not GOOGLE_CSE_ID:
-    pass  # calling code handles missing keys gracefully
-
-_cache = TTLCache(maxsize=1024, ttl=300)  # 5 minutes TTL
-
-@cached(_cache)
-async def _fetch_google_count(keyword: str) -> int:
-    if not GOOGLE_API_KEY or not GOOGLE_CSE_ID:
-        raise RuntimeError("Google API key or CSE ID not configured")
-
-    endpoint = "https://www.googleapis.com/customsearch/v1"
-    params = {"key": GOOGLE_API_KEY, "cx": GOOGLE_CSE_ID, "q": keyword, "num": 1}
-
-    async with httpx.AsyncClient(timeout=15.0) as client:
-        resp = await client.get(endpoint, params=params)
-        resp.raise_for_status()
-        data = resp.json()
+from app.core.async_cache import AsyncTTLCache
+from app.core.cse_scheduler import cse_search, CSEDroppedError, PRIORITY_KEYWORD
+from app.core.config import (
+    GOOGLE_COUNT_CACHE_SIZE,
+    GOOGLE_COUNT_CACHE_TTL,
+    GOOGLE_COUNT_NEGATIVE_TTL,
+    SEO_COMPETITION_LOG_MIN,
+    SEO_COMPETITION_LOG_MAX,
+    SEO_DIFFICULTY_MEDIUM,
+    SEO_DIFFICULTY_HIGH,
+)
+
+_cache = AsyncTTLCache(
+    maxsize=GOOGLE_COUNT_CACHE_SIZE,
+    ttl=GOOGLE_COUNT_CACHE_TTL,
+    negative_ttl=GOOGLE_COUNT_NEGATIVE_TTL,
+    name="google_count",
+    uncached_errors=(CSEDroppedError,),
+)
+
+async def _fetch_google_count(keyword: str, priority: int = PRIORITY_KEYWORD) -> int:
+    # Google search is case-insensitive, so "Running Shoes" and "running shoes" share an entry
+    key = " ".join(keyword.lower().split())
+    return await _cache.get_or_load(key, lambda: _request_google_count(keyword, priority), is_negative=lambda total: total <= 0)
+
+async def _request_google_count(keyword: str, priority: int = PRIORITY_KEYWORD) -> int:
+    data = await cse_search(keyword, num=1, priority=priority)
 
     total = data.get("searchInformation", {}).get("totalResults")
     try:
@@ -39,18 +38,18 @@ def _map_count_to_competition(total_results: int) -> dict:
         return {"total": 0, "competition_score": 0.0, "difficulty": "unknown"}
 
     logv = math.log10(total_results)
-    norm = max(0.0, min(1.0, (logv - 1) / (9 - 1)))
+    norm = max(0.0, min(1.0, (logv - SEO_COMPETITION_LOG_MIN) / (SEO_COMPETITION_LOG_MAX - SEO_COMPETITION_LOG_MIN)))
 
-    if total_results < 1_000:
+    if total_results < SEO_DIFFICULTY_MEDIUM:
         diff = "low"
-    elif total_results < 100_000:
+    elif total_results < SEO_DIFFICULTY_HIGH:
         diff = "medium"
     else:
         diff = "high"
 
     return {"total": total_results, "competition_score": round(norm, 3), "difficulty": diff}
 
-async def score_keyword_with_google(keyword: str) -> dict:
-    total = await _fetch_google_count(keyword)
+async def score_keyword_with_google(keyword: str, priority: int = PRIORITY_KEYWORD) -> dict:
+    total = await _fetch_google_count(keyword, priority)
     mapped = _map_count_to_competition(total)
     return {"keyword": keyword, "google": mapped}
@@ -0,0 +1,75 @@
+import re
+from typing import Dict, FrozenSet, List, Sequence
+
+_POSSESSIVE = re.compile(r"['’]s\b")
+_TOKEN = re.compile(r"[^\W_]+")
+# Dropped from signatures only; heuristic scoring still sees them ("for" is a buyer term)
+_STOPWORDS = frozenset(("a", "an", "and", "by", "for", "in", "of", "on", "the", "to", "with"))
+
+
+# Words the suffix rules below would fold wrongly: not plurals ("news" is not "new", a buyer
+# term), or a plural with a different meaning ("shorts", "glasses")
+_NOT_PLURAL = frozenset((
+    "news", "series", "species", "means", "lens", "canvas", "christmas", "gas", "atlas",
+    "shorts", "glasses", "jeans", "pants", "overalls", "sunglasses",
+))
+# Plurals of words that end in "s" themselves
+_IRREGULAR = {"buses": "bus", "lenses": "lens", "gases": "gas", "canvases": "canvas", "atlases": "atlas"}
+
+
+def _stem(token: str) -> str:
+    """Plural folding only: shoes -> shoe, dresses -> dress, accessories -> accessory, mens -> men."""
+    if token in _NOT_PLURAL:
+        return token
+    if token in _IRREGULAR:
+        return _IRREGULAR[token]
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 4 and token.endswith(("sses", "ches", "shes", "xes", "zes")):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def keyword_signature(keyword: str) -> FrozenSet[str]:
+    """
+    Order-insensitive stem set: "Men's Running Shoes", "running shoes for men"
+    and "mens running shoe" all give {"men", "running", "shoe"}.
+    """
+    tokens = _TOKEN.findall(_POSSESSIVE.sub("", keyword.lower()))
+    stems = frozenset(_stem(t) for t in tokens if t not in _STOPWORDS)
+    return stems or frozenset(tokens)
+
+
+def _similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    union = len(a | b)
+    return len(a & b) / union if union else 1.0
+
+
+def cluster_keywords(keywords: Sequence[str], similarity: float, max_clusters: int) -> List[List[str]]:
+    """
+    Group near-duplicate keywords, best-ranked first.
+
+    keywords must be in rank order. Each keyword joins the first cluster whose
+    leading keyword's signature has Jaccard similarity >= `similarity` with its
+    own, otherwise it starts a new cluster. Only the first max_clusters clusters
+    are kept; later keywords that would start one more are dropped. Each
+    cluster lists its members in rank order, so cluster[0] is its best keyword.
+    """
+    clusters: List[List[str]] = []
+    signatures: List[FrozenSet[str]] = []
+    exact: Dict[FrozenSet[str], int] = {}
+
+    for keyword in keywords:
+        signature = keyword_signature(keyword)
+        index = exact.get(signature)
+        if index is None and similarity < 1.0:
+            index = next((i for i, s in enumerate(signatures) if _similarity(signature, s) >= similarity), None)
+        if index is not None:
+            clusters[index].append(keyword)
+        elif len(clusters) < max_clusters:
+            exact[signature] = len(clusters)
+            signatures.append(signature)
+            clusters.append([keyword])
+    return clusters
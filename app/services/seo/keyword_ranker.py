@@ -0,0 +1,110 @@
+import re
+import numpy as np
+from typing import List, Sequence
+
+# Same terms and substring semantics as heuristic_score_keyword ("for" also hits "comfortable")
+BUYER_TERMS = ("buy", "best", "price", "cheap", "online", "for", "new")
+BUYER_PATTERN = re.compile("|".join(re.escape(t) for t in BUYER_TERMS))
+
+
+def _match_mask(pattern: "re.Pattern", texts: List[str]) -> np.ndarray:
+    search = pattern.search
+    return np.array([search(t) is not None for t in texts], dtype=bool)
+
+
+class KeywordRanker:
+    """
+    Batch version of heuristic_score_keyword for large keyword lists.
+
+    Term and attribute matchers are compiled once per product; per-keyword
+    string checks produce feature arrays that are scored in one NumPy pass.
+    Scores are bit-for-bit identical to heuristic_score_keyword.
+    """
+
+    def __init__(self, product_attributes: dict):
+        self.has_attributes = bool(product_attributes)
+        self._attribute_pattern = None
+        if self.has_attributes:
+            values = {str(v).lower() for v in product_attributes.values()}
+            # An empty value is a substring of every keyword, exactly as in the scalar version
+            self._attribute_pattern = re.compile(
+                "|".join(re.escape(v) for v in sorted(values, key=len, reverse=True))
+            )
+
+    def heuristic_scores(self, keywords: Sequence[str]) -> np.ndarray:
+        n = len(keywords)
+        lowers = [k.lower() for k in keywords]
+        buyer = _match_mask(BUYER_PATTERN, lowers)
+        word_counts = np.fromiter(map(len, map(str.split, keywords)), dtype=np.int32, count=n)
+        # "- " allowed alongside alphanumerics; str.replace beats translate() here
+        clean = np.array(
+            [not s or s.isalnum() for s in [k.replace("-", "").replace(" ", "") for k in keywords]],
+            dtype=bool,
+        )
+
+        # Components are added in the scalar function's order so float sums match exactly
+        scores = np.where(buyer, 0.35, 0.15)
+        scores += np.where(
+            (word_counts >= 2) & (word_counts <= 4), 0.35, np.where(word_counts > 4, 0.2, 0.1)
+        )
+        scores += np.where(clean, 0.2, 0.05)
+        if self.has_attributes:
+            scores += np.where(_match_mask(self._attribute_pattern, lowers), 0.1, 0.0)
+        return np.minimum(scores, 1.0)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first, without sorting the whole array.
+
+    Ties keep input order, matching sorted(..., reverse=True) on the full list.
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.intp)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+
+    kth_value = np.partition(scores, n - k)[n - k]
+    above = np.flatnonzero(scores > kth_value)
+    ties = np.flatnonzero(scores == kth_value)[: k - len(above)]
+    selected = np.concatenate([above, ties])
+    return selected[np.argsort(-scores[selected], kind="stable")]
+
+
+def rank_top_keywords(keywords: Sequence[str], product_attributes: dict, k: int) -> List[dict]:
+    """
+    Top k of rank_keywords(keywords, product_attributes), same order and values.
+
+    Each entry also carries the unrounded score as "raw_heuristic_score" so the
+    Google pass can reuse it instead of recomputing.
+    """
+    scores = KeywordRanker(product_attributes).heuristic_scores(keywords)
+    # rank_keywords orders by the rounded score; rank on the same values
+    order = top_k_indices(np.round(scores, 3), k)
+    return [
+        {
+            "keyword": keywords[i],
+            "heuristic_score": round(float(scores[i]), 3),
+            "raw_heuristic_score": float(scores[i]),
+        }
+        for i in order
+    ]
+
+
+def competition_scores(totals: np.ndarray, log_min: float, log_max: float) -> np.ndarray:
+    """Vectorized competition_score of _map_count_to_competition (unrounded; 0.0 for counts <= 0)."""
+    totals = np.asarray(totals, dtype=np.float64)
+    positive = totals > 0
+    logv = np.log10(np.where(positive, totals, 1.0))
+    return np.where(positive, np.clip((logv - log_min) / (log_max - log_min), 0.0, 1.0), 0.0)
+
+
+def difficulty_labels(totals: np.ndarray, medium: int, high: int) -> np.ndarray:
+    """Vectorized difficulty of _map_count_to_competition."""
+    totals = np.asarray(totals)
+    return np.select(
+        [totals <= 0, totals < medium, totals < high],
+        ["unknown", "low", "medium"],
+        default="high",
+    )
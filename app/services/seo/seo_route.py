@@ -1,27 +1,40 @@
-# from fastapi import APIRouter, HTTPException
-# from typing import List
-# from .seo_service import rank_keywords, score_keywords_with_google
-# from .seo_schema import SEORequest, SEOResponse, KeywordScore
-# import asyncio
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from app.core.config import SEO_MAX_KEYWORDS, KEYWORD_STAGE_TIMEOUT
+from .seo_service import score_keywords_with_google
+from .keyword_ranker import rank_top_keywords
+from .seo_schema import SEORequest, SEOResponse, KeywordScore, KeywordRank
 
-# router = APIRouter(prefix="/seo", tags=["SEO"])
+router = APIRouter(prefix="/seo", tags=["SEO"])
 
-# @router.post("/score-keywords", response_model=SEOResponse)
-# async def score_keywords_endpoint(request: SEORequest):
-#     if not request.keywords:
-#         raise HTTPException(status_code=400, detail="No keywords provided")
+@router.post("/score-keywords", response_model=SEOResponse)
+async def score_keywords_endpoint(request: SEORequest):
+    if not request.keywords:
+        raise HTTPException(status_code=400, detail="No keywords provided")
+    if len(request.keywords) > SEO_MAX_KEYWORDS:
+        raise HTTPException(status_code=413, detail=f"At most {SEO_MAX_KEYWORDS} keywords per request")
 
-#     # Step 1: heuristic ranking
-#     ranked = rank_keywords(request.keywords, request.product_attributes)
+    attributes = request.product_attributes or {}
+    keywords = list(dict.fromkeys(request.keywords))  # drop repeats, keep first-seen order
 
-#     # Step 2: augment with Google scoring
-#     try:
-#         google_results = await score_keywords_with_google(
-#             [r["keyword"] for r in ranked],
-#             request.product_attributes,
-#             max_keywords=10
-#         )
-#     except Exception as e:
-#         raise HTTPException(status_code=500, detail=f"Google scoring failed: {str(e)}")
+    # Step 1: heuristic ranking, one batch pass (off the event loop for large lists)
+    ranked = await run_in_threadpool(rank_top_keywords, keywords, attributes, request.top_k)
 
-#     return SEOResponse(results=google_results)
+    # Step 2: augment the best-ranked distinct keyword clusters with Google scoring;
+    # near-duplicates further down the ranking join their cluster instead of using up a query
+    try:
+        google_results = await score_keywords_with_google(
+            [r["keyword"] for r in ranked],
+            attributes,
+            max_keywords=request.google_top_n,
+            timeout=KEYWORD_STAGE_TIMEOUT,
+            heuristic_scores={r["keyword"]: r["raw_heuristic_score"] for r in ranked},
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Google scoring failed: {str(e)}")
+
+    return SEOResponse(
+        results=[KeywordScore(**r) for r in google_results],
+        ranked=[KeywordRank(keyword=r["keyword"], heuristic_score=r["heuristic_score"]) for r in ranked],
+        total_keywords=len(keywords),
+    )
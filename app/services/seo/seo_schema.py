@@ -1,17 +1,27 @@
-# from pydantic import BaseModel
-# from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from app.core.config import SEO_MAX_TOP_K, SEO_MAX_GOOGLE_KEYWORDS
 
-# class KeywordScore(BaseModel):
-#     keyword: str
-#     heuristic_score: float
-#     google_total_results: int
-#     google_competition_score: float
-#     google_difficulty: str
-#     combined_score: float
+class KeywordScore(BaseModel):
+    keyword: str
+    cluster: Optional[str] = None  # best-ranked near-duplicate, whose Google data this keyword shares
+    heuristic_score: float
+    google_total_results: int
+    google_competition_score: float
+    google_difficulty: str
+    combined_score: float
 
-# class SEORequest(BaseModel):
-#     keywords: List[str]
-#     product_attributes: Optional[dict] = {}
+class KeywordRank(BaseModel):
+    keyword: str
+    heuristic_score: float
 
-# class SEOResponse(BaseModel):
-#     results: List[KeywordScore]
+class SEORequest(BaseModel):
+    keywords: List[str]
+    product_attributes: Optional[dict] = {}
+    top_k: int = Field(100, ge=1, le=SEO_MAX_TOP_K)  # size of the heuristic ranking returned
+    google_top_n: int = Field(10, ge=0, le=SEO_MAX_GOOGLE_KEYWORDS)  # best-ranked keyword clusters sent to Google
+
+class SEOResponse(BaseModel):
+    results: List[KeywordScore]  # members of the google_top_n best distinct clusters, by combined score
+    ranked: List[KeywordRank]  # top_k keywords, by heuristic score
+    total_keywords: int  # distinct keywords ranked
@@ -1,13 +1,18 @@
 import math
 import asyncio
-from typing import List, Dict
-from .google_competetion import score_keyword_with_google
+from typing import List, Dict, Optional
+from app.core.config import SEO_HEURISTIC_WEIGHT, SEO_CLUSTER_SIMILARITY
+from app.core.cse_scheduler import PRIORITY_KEYWORD
+from .google_competetion import score_keyword_with_google, _map_count_to_competition
+from .competition_store import load_stored_competition, remember_competition
+from .keyword_clusters import cluster_keywords
+from .keyword_ranker import BUYER_PATTERN
 
 
 def heuristic_score_keyword(keyword: str, product_attributes: dict) -> float:
     score = 0.0
-    buyer_terms = {"buy", "best", "price", "cheap", "online", "for", "new"}
-    if any(term in keyword.lower() for term in buyer_terms):
+    key = keyword.lower()
+    if BUYER_PATTERN.search(key):
         score += 0.35
     else:
         score += 0.15
@@ -23,7 +28,6 @@ def heuristic_score_keyword(keyword: str, product_attributes: dict) -> float:
     else:
         score += 0.05
     if product_attributes:
-        key = keyword.lower()
         if any(str(v).lower() in key for v in product_attributes.values()):
             score += 0.1
     return min(1.0, score)
@@ -32,23 +36,118 @@ def rank_keywords(keywords: List[str], product_attributes: dict) -> List[dict]:
     ranked = [{"keyword": k, "heuristic_score": round(heuristic_score_keyword(k, product_attributes), 3)} for k in keywords]
     return sorted(ranked, key=lambda x: x["heuristic_score"], reverse=True)
 
-async def score_keywords_with_google(keywords: List[str], product_attributes: dict, max_keywords: int = 10) -> List[dict]:
-    keywords = keywords[:max_keywords]
-    tasks = [score_keyword_with_google(k) for k in keywords]
-    google_results = await asyncio.gather(*tasks, return_exceptions=True)
+async def _gather_within(tasks: List[asyncio.Task], timeout: Optional[float]) -> list:
+    # Lookups still pending at the deadline are cancelled and reported as None
+    if tasks and timeout is not None:
+        try:
+            await asyncio.wait(tasks, timeout=timeout)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+    results = []
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+            results.append(None)
+        elif task.cancelled():
+            results.append(None)
+        else:
+            results.append(task.exception() or task.result())
+    return results
+
+async def score_keywords_with_google(keywords: List[str], product_attributes: dict, max_keywords: int = 10, timeout: Optional[float] = None, heuristic_scores: Optional[Dict[str, float]] = None) -> List[dict]:
+    """
+    Combine heuristic and Google competition scores for the best max_keywords
+    clusters of near-duplicate keywords.
+
+    Keywords are ranked by heuristic score and grouped with cluster_keywords,
+    so "men's running shoes" and "running shoes for men" cost one CSE query:
+    the cluster's best keyword is looked up and every member shares its
+    competition. All members of the chosen clusters are returned, each with
+    its own heuristic score and a "cluster" naming the looked-up keyword.
+
+    heuristic_scores may carry already computed (unrounded) heuristics by
+    keyword; missing ones are computed here. With a timeout, keywords whose Google lookup has not finished by the deadline
+    are scored with unknown competition instead of holding up the whole batch; the
+    deadline counts from the call, so the keyword store read is part of it.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    heuristics = {}
+    for k in keywords:
+        if k not in heuristics:
+            if heuristic_scores is not None and k in heuristic_scores:
+                heuristics[k] = heuristic_scores[k]
+            else:
+                heuristics[k] = heuristic_score_keyword(k, product_attributes)
+    ranked = sorted(heuristics, key=heuristics.get, reverse=True)  # stable: ties keep input order
+    clusters = cluster_keywords(ranked, SEO_CLUSTER_SIMILARITY, max_keywords)
+
+    # Keywords the persistent store knows need no CSE query at all; any member's entry serves the cluster
+    stored = await load_stored_competition([k for cluster in clusters for k in cluster], timeout)
+    known = {cluster[0]: next((stored[k] for k in cluster if k in stored), None) for cluster in clusters}
+    # Better clusters get higher CSE priority so a squeezed quota drops the tail first
+    tasks = {
+        cluster[0]: asyncio.ensure_future(score_keyword_with_google(cluster[0], priority=PRIORITY_KEYWORD + i))
+        for i, cluster in enumerate(clusters) if known[cluster[0]] is None
+    }
+    if timeout is None:
+        fetched = await asyncio.gather(*tasks.values(), return_exceptions=True)
+    else:
+        # The store read and clustering came out of the same budget
+        fetched = await _gather_within(list(tasks.values()), max(0.0, timeout - (loop.time() - started)))
+    fetched = dict(zip(tasks, fetched))
+    remember_competition(
+        {k: r["google"]["total"] for k, r in fetched.items() if isinstance(r, dict)},
+        used=stored,
+    )
+
     combined = []
-    for k, gres in zip(keywords, google_results):
+    for cluster in clusters:
+        gres = known[cluster[0]] or fetched[cluster[0]]
         google_info = {"total": 0, "competition_score": 0.0, "difficulty": "unknown"}
         if isinstance(gres, dict):
             google_info = gres.get("google", google_info)
-        heur = heuristic_score_keyword(k, product_attributes)
-        combined_score = round(0.6*heur + 0.4*(1-google_info["competition_score"]), 3)
-        combined.append({
-            "keyword": k,
-            "heuristic_score": round(heur, 3),
-            "google_total_results": google_info["total"],
-            "google_competition_score": google_info["competition_score"],
-            "google_difficulty": google_info["difficulty"],
-            "combined_score": combined_score
-        })
+        for k in cluster:
+            heur = heuristics[k]
+            combined_score = round(SEO_HEURISTIC_WEIGHT*heur + (1-SEO_HEURISTIC_WEIGHT)*(1-google_info["competition_score"]), 3)
+            combined.append({
+                "keyword": k,
+                "cluster": cluster[0],
+                "heuristic_score": round(heur, 3),
+                "google_total_results": google_info["total"],
+                "google_competition_score": google_info["competition_score"],
+                "google_difficulty": google_info["difficulty"],
+                "combined_score": combined_score
+            })
+    return sorted(combined, key=lambda x: x["combined_score"], reverse=True)
+
+def rescore_reused_keywords(scored: List[dict], product_attributes: dict) -> List[dict]:
+    """
+    Keywords stored for a near-identical product, scored for this one without
+    any CSE query: heuristics are recomputed for product_attributes and the
+    stored Google counts are mapped with the current thresholds. Entries are
+    shaped like score_keywords_with_google results, plus "source".
+    """
+    heuristics = {}
+    for k in scored:
+        heuristics.setdefault(k["keyword"], (heuristic_score_keyword(k["keyword"], product_attributes), k))
+    ranked = sorted(heuristics, key=lambda k: heuristics[k][0], reverse=True)
+
+    combined = []
+    for cluster in cluster_keywords(ranked, SEO_CLUSTER_SIMILARITY, len(ranked)):
+        for k in cluster:
+            heur, stored = heuristics[k]
+            google_info = _map_count_to_competition(stored.get("google_total_results") or 0)
+            combined.append({
+                "keyword": k,
+                "cluster": cluster[0],
+                "heuristic_score": round(heur, 3),
+                "google_total_results": google_info["total"],
+                "google_competition_score": google_info["competition_score"],
+                "google_difficulty": google_info["difficulty"],
+                "combined_score": round(SEO_HEURISTIC_WEIGHT*heur + (1-SEO_HEURISTIC_WEIGHT)*(1-google_info["competition_score"]), 3),
+                "source": "similar_product",
+            })
     return sorted(combined, key=lambda x: x["combined_score"], reverse=True)
@@ -0,0 +1,221 @@
+"""
+Offline end-to-end load test for POST /analyze/product.
+
+Starts benchmarks/stubs.py (fake Gemini + Custom Search) and the real app
+under uvicorn, replays the images in `test images/` at a fixed concurrency and
+reports throughput, latency percentiles and a per-stage breakdown taken from
+the Server-Timing header. No real API quota is used.
+
+    python -m benchmarks.e2e_bench --requests 200 --concurrency 16
+    python -m benchmarks.e2e_bench --gemini-delay 4 --cse-429-rate 0.05
+    python -m benchmarks.e2e_bench --database-url postgresql+asyncpg://localhost/bench
+
+Any app setting (CSE_RATE_PER_SECOND, BACKGROUND_DB_SAVE, ...) can be
+overridden through the environment as usual.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+IMAGES_DIR = ROOT / "test images"
+
+# Series worth showing after a run (from the app's /metrics)
+_REPORTED_METRICS = (
+    "analyzer_cache_lookups_total",
+    "analyzer_stage_fallbacks_total",
+    "cse_responses_total",
+    "gemini_errors_total",
+    "cse_scheduler_dropped",
+    "cse_scheduler_throttled_429",
+)
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """'gemini;dur=812.3, total;dur=950.0' -> {"gemini": 812.3, "total": 950.0}"""
+    stages = {}
+    for entry in (header or "").split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        for param in params:
+            if param.startswith("dur="):
+                stages[name] = float(param[4:])
+    return stages
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))  # nearest rank
+    return ordered[rank]
+
+
+def _start(module_args: List[str], env: dict, log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "wb")
+    return subprocess.Popen(
+        [sys.executable, "-m", *module_args], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+async def _wait_ready(url: str, proc: subprocess.Popen, log_path: Path, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{url} exited early, see {log_path}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s, see {log_path}")
+
+
+async def _run_load(base_url: str, images: List[Tuple[str, bytes]], total: int, concurrency: int) -> Tuple[list, float]:
+    results = []  # (status, seconds, server timing)
+    counter = itertools.count()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        async def user():
+            for i in counter:
+                if i >= total:
+                    return
+                name, data = images[i % len(images)]
+                started = time.perf_counter()
+                try:
+                    resp = await client.post("/analyze/product", files={"image": (name, data, "image/webp")})
+                    status, timing = resp.status_code, parse_server_timing(resp.headers.get("server-timing"))
+                except httpx.HTTPError as e:
+                    status, timing = type(e).__name__, {}
+                results.append((status, time.perf_counter() - started, timing))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def report(results: list, elapsed: float, metrics_text: str):
+    latencies = [seconds * 1000 for _, seconds, _ in results]
+    statuses = Counter(status for status, _, _ in results)
+    print(f"\n{len(results)} requests in {elapsed:.1f}s -> {len(results) / elapsed:.2f} req/s")
+    print("status: " + ", ".join(f"{status}={count}" for status, count in sorted(statuses.items(), key=str)))
+    print(
+        f"latency ms: p50={percentile(latencies, 50):.0f} p95={percentile(latencies, 95):.0f} "
+        f"p99={percentile(latencies, 99):.0f} max={max(latencies):.0f}"
+    )
+
+    per_stage = defaultdict(list)
+    for _, _, timing in results:
+        for stage, ms in timing.items():
+            per_stage[stage].append(ms)
+    server_total = sum(per_stage.pop("total", [])) or 1.0
+
+    print(f"\n{'stage':18s} {'seen':>5s} {'mean':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'share':>6s}")
+    for stage, values in sorted(per_stage.items(), key=lambda kv: -sum(kv[1])):
+        print(
+            f"{stage:18s} {len(values):5d} {statistics.fmean(values):8.1f} {percentile(values, 50):8.1f} "
+            f"{percentile(values, 95):8.1f} {percentile(values, 99):8.1f} {sum(values) / server_total:6.1%}"
+        )
+    print("(ms per request; concurrent stages overlap, so shares can add up to more than 100%)")
+
+    lines = [
+        line for line in metrics_text.splitlines()
+        if line.startswith(_REPORTED_METRICS) and "_created" not in line
+    ]
+    if lines:
+        print("\n" + "\n".join(lines))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for /analyze/product")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=4, help="requests sent before measuring")
+    parser.add_argument("--gemini-delay", type=float, default=2.0)
+    parser.add_argument("--gemini-jitter", type=float, default=0.5)
+    parser.add_argument("--cse-latency", type=float, default=0.15)
+    parser.add_argument("--cse-429-rate", type=float, default=0.0)
+    parser.add_argument("--analysis-cache", action="store_true", help="serve repeated images from the analysis cache")
+    parser.add_argument("--database-url", help="default: a fresh SQLite file")
+    parser.add_argument("--app-workers", type=int, default=1)
+    parser.add_argument("--stub-port", type=int, default=8100)
+    parser.add_argument("--app-port", type=int, default=8200)
+    args = parser.parse_args()
+
+    images = [(p.name, p.read_bytes()) for p in sorted(IMAGES_DIR.iterdir()) if p.is_file()]
+    if not images:
+        sys.exit(f"No images in {IMAGES_DIR}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="e2e-bench-"))
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    app_url = f"http://127.0.0.1:{args.app_port}"
+
+    stub_env = {
+        **os.environ,
+        "STUB_GEMINI_DELAY": str(args.gemini_delay),
+        "STUB_GEMINI_JITTER": str(args.gemini_jitter),
+        "STUB_CSE_LATENCY": str(args.cse_latency),
+        "STUB_CSE_429_RATE": str(args.cse_429_rate),
+    }
+    app_env = {
+        **os.environ,
+        "GEMINI_API_KEY": "offline-bench",
+        "GEMINI_BASE_URL": stub_url,
+        "GOOGLE_API_KEY": "offline-bench",
+        "GOOGLE_CSE_ID": "offline-bench",
+        "GOOGLE_CSE_ENDPOINT": f"{stub_url}/customsearch/v1",
+        "DATABASE_URL": args.database_url or f"sqlite+aiosqlite:///{workdir / 'bench.db'}",
+        "ANALYSIS_CACHE_ENABLED": "true" if args.analysis_cache else "false",
+    }
+    app_env.setdefault("JOB_WORKERS_IN_API", "false")
+
+    subprocess.run([sys.executable, "-m", "app.db.init_db"], cwd=ROOT, env=app_env, check=True, stdout=subprocess.DEVNULL)
+    stub = _start(
+        ["uvicorn", "benchmarks.stubs:app", "--port", str(args.stub_port), "--log-level", "warning"],
+        stub_env, workdir / "stubs.log",
+    )
+    server = _start(
+        ["uvicorn", "main:app", "--port", str(args.app_port), "--workers", str(args.app_workers), "--log-level", "warning"],
+        app_env, workdir / "app.log",
+    )
+
+    async def run():
+        await _wait_ready(f"{stub_url}/healthz", stub, workdir / "stubs.log")
+        await _wait_ready(f"{app_url}/metrics", server, workdir / "app.log")
+        if args.warmup:
+            await _run_load(app_url, images, args.warmup, min(args.warmup, args.concurrency))
+        results, elapsed = await _run_load(app_url, images, args.requests, args.concurrency)
+        async with httpx.AsyncClient() as client:
+            metrics_text = (await client.get(f"{app_url}/metrics")).text
+        return results, elapsed, metrics_text
+
+    try:
+        print(
+            f"{args.requests} requests, concurrency {args.concurrency}, Gemini stub {args.gemini_delay}s, "
+            f"CSE stub {args.cse_latency}s / {args.cse_429_rate:.0%} 429 (logs in {workdir})"
+        )
+        report(*asyncio.run(run()))
+    finally:
+        for proc in (server, stub):
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Cold-start benchmark: how long a fresh worker takes to import main.py and to
+finish the app lifespan startup (the point at which uvicorn reports ready).
+
+Each run is a new interpreter, so nothing is shared between runs.
+
+    python -m benchmarks.import_time_bench [--runs 5] [--top 15]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+_PROBE = """
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+
+async def startup():
+    async with main.lifespan(main.app):
+        return time.perf_counter()
+
+t2 = asyncio.run(startup())
+print(json.dumps({"import": t1 - t0, "startup": t2 - t1}))
+"""
+
+
+def _env(workdir: Path) -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{workdir / 'import_bench.db'}")
+    env.setdefault("GEMINI_API_KEY", "import-bench")
+    env.setdefault("JOB_WORKERS_IN_API", "false")
+    return env
+
+
+def _slowest_imports(env: dict, top: int):
+    # -X importtime writes "import time: self | cumulative | name" to stderr
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # two spaces of indent per nesting level
+        if depth == 1:  # imported directly by main
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold import and startup time of main.py")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    env = _env(Path(tempfile.mkdtemp(prefix="import-bench-")))
+    samples = []
+    for _ in range(args.runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", _PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        )
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    for phase in ("import", "startup"):
+        values = [s[phase] * 1000 for s in samples]
+        print(
+            f"{phase:8s} median={statistics.median(values):7.1f} ms  "
+            f"min={min(values):7.1f} ms  max={max(values):7.1f} ms  ({args.runs} runs)"
+        )
+
+    print("\nSlowest direct imports of main (cumulative):")
+    for micros, name in _slowest_imports(env, args.top):
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
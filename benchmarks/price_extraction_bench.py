@@ -0,0 +1,92 @@
+"""
+Micro-benchmark for price extraction over recorded Custom Search snippets.
+
+Compares the single-pass scanner in app.services.pricing.price_extraction with
+the three-pattern loop price_fetcher used before it, and prints the summary
+each query would now produce.
+
+    python -m benchmarks.price_extraction_bench [--repeat 2000]
+"""
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+from app.services.pricing.price_extraction import extract_prices, summarize_prices
+
+CORPUS = Path(__file__).parent / "data" / "cse_price_snippets.json"
+
+_LEGACY_PATTERNS = [
+    r'\$\s*(\d{1,5}(?:[.,]\d{2})?)',
+    r'USD\s*(\d{1,5}(?:[.,]\d{2})?)',
+    r'(\d{1,5}(?:[.,]\d{2})?)\s*(?:USD|dollars)',
+]
+
+
+def legacy_extract(text):
+    prices = []
+    for pattern in _LEGACY_PATTERNS:
+        for match in re.findall(pattern, text, re.IGNORECASE):
+            try:
+                price = float(match.replace(',', ''))
+                if 1 < price < 100000:
+                    prices.append(price)
+            except ValueError:
+                continue
+    return prices
+
+
+def load_snippets():
+    responses = json.loads(CORPUS.read_text(encoding="utf-8"))
+    texts = [
+        f"{item.get('title', '')} {item.get('snippet', '')}"
+        for response in responses
+        for item in response.get("items", [])
+    ]
+    return responses, texts
+
+
+def _time(fn, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    responses, texts = load_snippets()
+    total_bytes = sum(len(t.encode("utf-8")) for t in texts) * args.repeat
+    total_snippets = len(texts) * args.repeat
+
+    print(f"{len(texts)} snippets x {args.repeat} repeats ({total_bytes / 1e6:.1f} MB)")
+    for name, fn in (("legacy", legacy_extract), ("scanner", extract_prices)):
+        elapsed = _time(fn, texts, args.repeat)
+        print(
+            f"  {name:8s} {elapsed:6.2f}s  "
+            f"{total_snippets / elapsed:10,.0f} snippets/s  {total_bytes / 1e6 / elapsed:6.1f} MB/s"
+        )
+
+    print()
+    for response in responses:
+        samples = [
+            price
+            for item in response.get("items", [])
+            for price in extract_prices(f"{item.get('title', '')} {item.get('snippet', '')}")
+        ]
+        summary = summarize_prices(samples) or {}
+        print(
+            f"  {response['query'][:48]:48s} "
+            f"{summary.get('currency', '-'):3s} median={summary.get('median_price')} "
+            f"range={summary.get('min_price')}-{summary.get('max_price')} "
+            f"outliers={summary.get('outliers_removed')} conf={summary.get('confidence')}"
+        )
+
+
+if __name__ == "__main__":
+    main()
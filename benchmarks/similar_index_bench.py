@@ -0,0 +1,94 @@
+"""
+Micro-benchmark for the similar-product index.
+
+Fills app.services.product_analyzer.similar_products.SimilarProductIndex with a
+synthetic catalog (brand x line x model x product type x color) and reports
+load time, memory, lookup latency percentiles and how often a color/size
+variant of an indexed product finds it above the threshold.
+
+    python -m benchmarks.similar_index_bench [--products 1000000] [--lookups 2000]
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.core.config import SIMILAR_PRODUCT_THRESHOLD
+from app.services.product_analyzer.similar_products import SimilarProductIndex
+
+_BRANDS = ["Nike", "Adidas", "Puma", "Levi's", "Zara", "Ikea", "Apple", "Samsung", "Sony", "Lego", "Fossil", "Coach"]
+_LINES = ["Air", "Ultra", "Classic", "Pro", "Essential", "Urban", "Vintage", "Studio", "Sport", "Heritage"]
+_TYPES = [
+    ("Shoes", ["Running Shoes", "Sneakers", "Hiking Boots", "Sandals"]),
+    ("Clothing", ["Hoodie", "T-Shirt", "Denim Jacket", "Slim Jeans", "Rain Coat"]),
+    ("Accessories", ["Leather Wallet", "Backpack", "Crossbody Bag", "Wrist Watch"]),
+    ("Home", ["Table Lamp", "Coffee Mug", "Throw Pillow", "Desk Organizer"]),
+    ("Electronics", ["Wireless Earbuds", "Phone Case", "Bluetooth Speaker", "Charging Stand"]),
+]
+_AUDIENCES = ["Men's", "Women's", "Kids'", "Unisex"]
+_COLORS = ["Black", "White", "Red", "Navy", "Olive", "Beige", "Grey", "Pink"]
+_SIZES = ["S", "M", "L", "XL", "42", "44", "Large", "Small"]
+_MATERIALS = ["cotton", "leather", "mesh", "ceramic", "plastic", "aluminum"]
+
+
+def _product(rng: random.Random, n: int) -> tuple:
+    category, types = rng.choice(_TYPES)
+    brand = rng.choice(_BRANDS)
+    base = f"{brand} {rng.choice(_LINES)} {n} {rng.choice(_AUDIENCES)} {rng.choice(types)}"
+    attributes = {"category": category, "brand": brand, "material": rng.choice(_MATERIALS)}
+    return base, attributes
+
+
+def _variant(rng: random.Random, base: str) -> str:
+    return f"{base} - {rng.choice(_COLORS)}, Size {rng.choice(_SIZES)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=SIMILAR_PRODUCT_THRESHOLD)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    catalog = [_product(rng, n) for n in range(args.products)]
+    index = SimilarProductIndex()
+
+    start = time.perf_counter()
+    for offset in range(0, len(catalog), 10000):
+        index.add_many(
+            (product_id, _variant(rng, base), attributes)
+            for product_id, (base, attributes) in enumerate(catalog[offset:offset + 10000], offset + 1)
+        )
+    load = time.perf_counter() - start
+    memory = len(index) * (index.dim + 8 + index.tables * 8)  # vectors, ids, one signature and row per table
+    print(f"Loaded {len(index):,} products in {load:.1f}s ({len(index) / load:,.0f}/s), ~{memory / 1e6:,.0f} MB")
+
+    variants, unrelated = [], []
+    for _ in range(args.lookups):
+        product_id = rng.randrange(1, args.products + 1)
+        base, attributes = catalog[product_id - 1]
+        variants.append((product_id, _variant(rng, base), attributes))
+        unrelated.append(_product(rng, args.products + rng.randrange(args.products)))
+
+    latencies, found = [], 0
+    for product_id, title, attributes in variants:
+        start = time.perf_counter()
+        match = index.lookup(title, attributes, args.threshold)
+        latencies.append(time.perf_counter() - start)
+        found += match is not None and match.product_id == product_id
+    false_matches = sum(index.lookup(title, attributes, args.threshold) is not None for title, attributes in unrelated)
+
+    latencies.sort()
+    quantile = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(
+        f"Lookup ms: mean {statistics.mean(latencies) * 1000:.3f}  p50 {quantile(0.5):.3f}  "
+        f"p95 {quantile(0.95):.3f}  p99 {quantile(0.99):.3f}"
+    )
+    print(f"Variants matched to their product: {found / len(variants):.1%} (threshold {args.threshold})")
+    print(f"Unrelated products matched: {false_matches / len(unrelated):.1%}")
+
+
+if __name__ == "__main__":
+    main()
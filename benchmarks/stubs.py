@@ -0,0 +1,132 @@
+"""
+Local stand-ins for the Gemini API and Google Custom Search, for offline benchmarks.
+
+    uvicorn benchmarks.stubs:app --port 8100
+
+Point the app at it with GEMINI_BASE_URL=http://127.0.0.1:8100 and
+GOOGLE_CSE_ENDPOINT=http://127.0.0.1:8100/customsearch/v1. Behaviour is set
+through environment variables:
+
+    STUB_GEMINI_DELAY      seconds before a generateContent reply (default 2.0)
+    STUB_GEMINI_JITTER     +/- uniform jitter on that delay (default 0.5)
+    STUB_GEMINI_CHUNK      characters per streamGenerateContent chunk (default 40);
+                           the delay is spread evenly over the chunks
+    STUB_GEMINI_PACK_COST  extra delay per additional image in a packed request,
+                           as a fraction of the one-image delay (default 0.6)
+    STUB_CSE_LATENCY       seconds before a Custom Search reply (default 0.15)
+    STUB_CSE_429_RATE      fraction of CSE calls answered with 429 (default 0.0)
+    STUB_SEED              RNG seed (default 0)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+from pathlib import Path
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DATA_DIR = Path(__file__).parent / "data"
+
+GEMINI_DELAY = float(os.getenv("STUB_GEMINI_DELAY", "2.0"))
+GEMINI_JITTER = float(os.getenv("STUB_GEMINI_JITTER", "0.5"))
+GEMINI_CHUNK = int(os.getenv("STUB_GEMINI_CHUNK", "40"))
+GEMINI_PACK_COST = float(os.getenv("STUB_GEMINI_PACK_COST", "0.6"))
+CSE_LATENCY = float(os.getenv("STUB_CSE_LATENCY", "0.15"))
+CSE_429_RATE = float(os.getenv("STUB_CSE_429_RATE", "0.0"))
+
+_rng = random.Random(int(os.getenv("STUB_SEED", "0")))
+_listings = json.loads((DATA_DIR / "gemini_listings.json").read_text(encoding="utf-8"))
+_price_responses = json.loads((DATA_DIR / "cse_price_snippets.json").read_text(encoding="utf-8"))
+_WORD = re.compile(r"[^\W_]+")
+
+app = FastAPI(title="Gemini / Custom Search stub")
+
+
+def _words(text: str) -> set:
+    return set(_WORD.findall(text.lower()))
+
+
+def _pick_listing(image: bytes) -> dict:
+    # Same image -> same listing, so cache behaviour matches real traffic
+    digest = hashlib.sha256(image).digest()
+    return _listings[int.from_bytes(digest[:4], "big") % len(_listings)]
+
+
+def _images(body: bytes) -> list:
+    """Base64 data of each inline image in a generateContent request body."""
+    try:
+        contents = json.loads(body).get("contents", [])
+    except (ValueError, AttributeError):
+        return []
+    return [
+        part["inlineData"]["data"].encode()
+        for content in contents
+        for part in content.get("parts", [])
+        if "inlineData" in part
+    ]
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"ok": True}
+
+
+def _response(text: str, model: str, finished: bool = True) -> dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return {
+        "candidates": [candidate],
+        "usageMetadata": {"promptTokenCount": 1290, "candidatesTokenCount": 420, "totalTokenCount": 1710},
+        "modelVersion": model,
+    }
+
+
+async def _sse_chunks(text: str, model: str, delay: float):
+    pieces = [text[i:i + GEMINI_CHUNK] for i in range(0, len(text), GEMINI_CHUNK)]
+    for n, piece in enumerate(pieces):
+        await asyncio.sleep(delay / len(pieces))
+        payload = _response(piece, model, finished=n == len(pieces) - 1)
+        yield f"data: {json.dumps(payload, ensure_ascii=False)}\r\n\r\n"
+
+
+@app.post("/{api_version}/models/{model_method}")
+async def generate_content(api_version: str, model_method: str, request: Request):
+    model, _, method = model_method.partition(":")
+    images = _images(await request.body()) or [b""]
+    if len(images) == 1:
+        text = json.dumps(_pick_listing(images[0]), ensure_ascii=False)
+    else:
+        # Packed request: one entry per image, numbered like the prompt's "Image N" labels
+        text = json.dumps(
+            [{**_pick_listing(image), "image": n} for n, image in enumerate(images, 1)], ensure_ascii=False
+        )
+    delay = max(0.0, GEMINI_DELAY + _rng.uniform(-GEMINI_JITTER, GEMINI_JITTER))
+    delay *= 1 + GEMINI_PACK_COST * (len(images) - 1)  # longer output, shared prompt
+
+    if method == "streamGenerateContent":
+        return StreamingResponse(_sse_chunks(text, model, delay), media_type="text/event-stream")
+    await asyncio.sleep(delay)
+    return _response(text, model)
+
+
+@app.get("/customsearch/v1")
+async def custom_search(q: str = Query(...), num: int = Query(10)):
+    await asyncio.sleep(CSE_LATENCY)
+    if _rng.random() < CSE_429_RATE:
+        return JSONResponse(
+            {"error": {"code": 429, "message": "Quota exceeded (stub)"}},
+            status_code=429,
+            headers={"Retry-After": "1"},
+        )
+
+    query_words = _words(q)
+    recorded = max(_price_responses, key=lambda r: len(query_words & _words(r["query"])))
+    if num > 1 and query_words & _words(recorded["query"]):
+        return {**recorded, "queries": {"request": [{"searchTerms": q, "count": num}]}}
+
+    # Keyword competition lookups only read totalResults; derive a stable one from the query
+    total = int.from_bytes(hashlib.sha256(q.lower().encode()).digest()[:4], "big") % 50_000_000
+    return {"searchInformation": {"totalResults": str(total)}, "items": []}
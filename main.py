@@ -1,11 +1,45 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from app.core.config import JOB_WORKERS_IN_API
+from app.core.http_client import start_http_client, close_http_client
+from app.core.metrics import ServerTimingMiddleware
+from app.db.database import start_db, close_db
+from app.services.product_analyzer.analyzer import start_gemini_client
+from app.services.product_analyzer.image_preprocessor import start_preprocess_pool, shutdown_preprocess_pool
+from app.services.product_analyzer.job_worker import start_job_workers, stop_job_workers
+from app.services.product_analyzer.similar_products import start_similar_index, stop_similar_index
+from app.services.seo.competition_store import start_keyword_refresher, stop_keyword_refresher
 from app.services.product_analyzer.analyzer_route import router as analyzer_router
-# from app.services.seo.seo_route import router as seo_router
+from app.services.catalog.catalog_route import router as catalog_router
+from app.services.seo.seo_route import router as seo_router
+from app.services.monitoring.metrics_route import router as metrics_router
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Everything a request needs is created here, not at import, so importing is cheap
+    await start_db()
+    await start_http_client()
+    await start_gemini_client()
+    await start_preprocess_pool()
+    if JOB_WORKERS_IN_API:
+        start_job_workers()
+    start_keyword_refresher()
+    start_similar_index()
+    yield
+    await stop_job_workers()
+    await stop_keyword_refresher()
+    await stop_similar_index()
+    await close_http_client()
+    shutdown_preprocess_pool()
+    await close_db()
 
-app = FastAPI(title="E-commerce AI Product Analyzer")
+
+app = FastAPI(title="E-commerce AI Product Analyzer", lifespan=lifespan)
+app.add_middleware(ServerTimingMiddleware)
 
 # Include routers
 app.include_router(analyzer_router)
-# app.include_router(seo_router)
\ No newline at end of file
+app.include_router(catalog_router)
+app.include_router(seo_router)
+app.include_router(metrics_router)
@@ -0,0 +1,200 @@
+import asyncio
+import gc
+
+import httpx
+import pytest
+
+from app.core import async_cache
+from app.core.async_cache import AsyncTTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Only the cache's clock: the event loop keeps the real one
+    clock = FakeClock()
+    monkeypatch.setattr(async_cache, "time", clock)
+    return clock
+
+
+class Loader:
+    def __init__(self, *outcomes, delay=0.01):
+        self.outcomes = list(outcomes)
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        outcome = self.outcomes[min(self.calls, len(self.outcomes)) - 1]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def test_concurrent_misses_share_one_load(clock):
+    cache = AsyncTTLCache(maxsize=10, ttl=60)
+    loader = Loader("value")
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(20)))
+
+    assert asyncio.run(run()) == ["value"] * 20
+    assert loader.calls == 1
+
+
+def test_different_keys_load_separately(clock):
+    cache = AsyncTTLCache(maxsize=10, ttl=60)
+    loader = Loader("value")
+
+    async def run():
+        return await asyncio.gather(cache.get_or_load("a", loader), cache.get_or_load("b", loader))
+
+    asyncio.run(run())
+    assert loader.calls == 2
+
+
+def test_value_expires_after_ttl(clock):
+    cache = AsyncTTLCache(maxsize=10, ttl=60)
+    loader = Loader("old", "new")
+
+    async def run():
+        first = await cache.get_or_load("k", loader)
+        clock.now += 59
+        cached = await cache.get_or_load("k", loader)
+        clock.now += 2
+        return first, cached, await cache.get_or_load("k", loader)
+
+    assert asyncio.run(run()) == ("old", "old", "new")
+    assert loader.calls == 2
+
+
+def test_failure_is_cached_until_negative_ttl(clock):
+    cache = AsyncTTLCache(maxsize=10, ttl=60, negative_ttl=30)
+    loader = Loader(ValueError("upstream down"), "recovered")
+
+    async def run():
+        errors = []
+        for _ in range(3):
+            with pytest.raises(ValueError, match="upstream down") as info:
+                await cache.get_or_load("k", loader)
+            errors.append(info.value)
+        assert loader.calls == 1
+        clock.now += 31
+        return errors, await cache.get_or_load("k", loader)
+
+    errors, value = asyncio.run(run())
+    assert value == "recovered"
+    assert loader.calls == 2
+    # Every hit raises its own instance, so tracebacks don't pile up on one object
+    assert len({id(e) for e in errors}) == 3
+    assert errors[2].__traceback__ is not errors[1].__traceback__
+
+
+def test_cached_error_keeps_attributes(clock):
+    request = httpx.Request("GET", "https://example.com")
+    response = httpx.Response(503, request=request)
+    error = httpx.HTTPStatusError("503", request=request, response=response)
+    cache = AsyncTTLCache(maxsize=10, ttl=60, negative_ttl=30)
+    loader = Loader(error)
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError) as info:
+                await cache.get_or_load("k", loader)
+        return info.value
+
+    hit = asyncio.run(run())
+    assert hit is not error
+    assert hit.args == error.args
+    assert hit.response.status_code == 503
+
+
+def test_failure_without_negative_ttl_is_not_cached(clock):
+    cache = AsyncTTLCache(maxsize=10, ttl=60)
+    loader = Loader(ValueError("boom"), "value")
+
+    async def run():
+        with pytest.raises(ValueError):
+            await cache.get_or_load("k", loader)
+        return await cache.get_or_load("k", loader)
+
+    assert asyncio.run(run()) == "value"
+    assert loader.calls == 2
+
+
+def test_uncached_errors_are_retried(clock):
+    class Dropped(Exception):
+        pass
+
+    cache = AsyncTTLCache(maxsize=10, ttl=60, negative_ttl=30, uncached_errors=(Dropped,))
+    loader = Loader(Dropped("not sent"), "value")
+
+    async def run():
+        with pytest.raises(Dropped):
+            await cache.get_or_load("k", loader)
+        return await cache.get_or_load("k", loader)
+
+    assert asyncio.run(run()) == "value"
+    assert loader.calls == 2
+
+
+def test_negative_values_use_negative_ttl(clock):
+    cache = AsyncTTLCache(maxsize=10, ttl=600, negative_ttl=30)
+    loader = Loader(None, "found")
+
+    async def run():
+        first = await cache.get_or_load("k", loader, is_negative=lambda v: v is None)
+        cached = await cache.get_or_load("k", loader, is_negative=lambda v: v is None)
+        clock.now += 31
+        return first, cached, await cache.get_or_load("k", loader, is_negative=lambda v: v is None)
+
+    assert asyncio.run(run()) == (None, None, "found")
+    assert loader.calls == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_load(clock):
+    cache = AsyncTTLCache(maxsize=10, ttl=60)
+    loader = Loader("value", delay=0.05)
+
+    async def run():
+        cancelled = asyncio.ensure_future(cache.get_or_load("k", loader))
+        waiting = asyncio.ensure_future(cache.get_or_load("k", loader))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        value = await waiting
+        return value, await cache.get_or_load("k", loader)
+
+    assert asyncio.run(run()) == ("value", "value")
+    assert loader.calls == 1
+
+
+def test_load_whose_callers_all_cancelled_is_not_reported_lost(clock):
+    cache = AsyncTTLCache(maxsize=10, ttl=60, negative_ttl=30)
+    loader = Loader(ValueError("boom"), delay=0.02)
+    reported = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: reported.append(context))
+        callers = [asyncio.ensure_future(cache.get_or_load("k", loader)) for _ in range(3)]
+        await asyncio.sleep(0.005)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.05)  # the load finishes with nobody awaiting it
+        gc.collect()
+        with pytest.raises(ValueError):  # its failure was still cached
+            await cache.get_or_load("k", loader)
+
+    asyncio.run(run())
+    assert loader.calls == 1
+    assert reported == []
@@ -0,0 +1,71 @@
+import asyncio
+from datetime import date
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core import cse_scheduler
+from app.core.cse_scheduler import CSEDroppedError, CSEScheduler
+from app.db.crud import reserve_cse_quota
+from app.db.models import Base
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'quota.db'}")
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create())
+    factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    monkeypatch.setattr(cse_scheduler, "async_session", factory)
+    yield factory
+    asyncio.run(engine.dispose())
+
+
+def _scheduler(budget, processes=1, block=10):
+    return CSEScheduler(
+        rate=1000, burst=1000, daily_budget=budget, max_queue_wait=5, max_queue=1000,
+        processes=processes, budget_block=block,
+    )
+
+
+async def _send(scheduler, n):
+    results = await asyncio.gather(*(scheduler.acquire() for _ in range(n)), return_exceptions=True)
+    return sum(r is None for r in results), sum(isinstance(r, CSEDroppedError) for r in results)
+
+
+def test_reserve_grants_what_is_left(sessions):
+    async def run():
+        async with sessions() as db:
+            day = date(2026, 1, 1)
+            assert await reserve_cse_quota(db, day, 10, 25) == (10, 10)
+            assert await reserve_cse_quota(db, day, 10, 25) == (10, 20)
+            assert await reserve_cse_quota(db, day, 10, 25) == (5, 25)
+            assert await reserve_cse_quota(db, day, 10, 25) == (0, 25)
+            assert await reserve_cse_quota(db, date(2026, 1, 2), 10, 25) == (10, 10)
+
+    asyncio.run(run())
+
+
+def test_processes_share_one_daily_budget(sessions):
+    async def run():
+        first, second = _scheduler(25, processes=2), _scheduler(25, processes=2)
+        return await asyncio.gather(_send(first, 20), _send(second, 20))
+
+    (sent_a, dropped_a), (sent_b, dropped_b) = asyncio.run(run())
+    assert sent_a + sent_b == 25
+    assert dropped_a + dropped_b == 15
+
+
+def test_unreachable_database_falls_back_to_local_share(monkeypatch):
+    def broken():
+        raise ConnectionError("database down")
+
+    monkeypatch.setattr(cse_scheduler, "async_session", broken)
+    scheduler = _scheduler(30, processes=3, block=4)
+    sent, dropped = asyncio.run(_send(scheduler, 15))
+    assert (sent, dropped) == (10, 5)
+    assert scheduler.stats()["budget_remaining"] == 0
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from app.services.product_analyzer.json_stream import StreamingObjectParser, complete_array_items
+
+LISTING = {
+    "title": 'Nike "Pegasus" 40 \\ Men\'s',
+    "attributes": {"category": "Shoes", "other": "laces {x} [y]"},
+    "seo_keywords": ["running shoes", "men’s \"pegasus\""],
+    "rating": 4.5,
+    "in_stock": True,
+    "discount": None,
+    "description": "Line one\nLine two \\n not a newline, été 👟",
+}
+
+
+def _feed_in_chunks(text, size):
+    parser = StreamingObjectParser()
+    completed = []
+    for start in range(0, len(text), size):
+        completed += parser.feed(text[start:start + size])
+    return parser, completed
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 10_000])
+def test_chunk_boundaries_anywhere(size):
+    text = json.dumps(LISTING, indent=1)
+    parser, completed = _feed_in_chunks(text, size)
+
+    assert parser.complete and not parser.failed
+    assert parser.fields == LISTING
+    assert [key for key, _ in completed] == list(LISTING)
+
+
+def test_split_inside_every_escape():
+    text = json.dumps({"a": 'x\\"y\\\\', "b": "é\n", "c": 1}, ensure_ascii=True)
+    for cut in range(1, len(text)):
+        parser = StreamingObjectParser()
+        parser.feed(text[:cut])
+        parser.feed(text[cut:])
+        assert parser.complete, cut
+        assert parser.fields == json.loads(text), cut
+
+
+def test_fields_complete_as_they_arrive():
+    parser = StreamingObjectParser()
+    assert parser.feed('{"title": "Red') == []
+    assert parser.feed(' Shoe", "seo_keywords": ["a", ') == [("title", "Red Shoe")]
+    assert parser.feed('"b"], "description": "long') == [("seo_keywords", ["a", "b"])]
+    assert not parser.complete
+    assert parser.feed(' copy"}') == [("description", "long copy")]
+    assert parser.complete
+
+
+def test_scalar_completes_on_delimiter():
+    parser = StreamingObjectParser()
+    assert parser.feed('{"count": 12') == []
+    assert parser.feed('3, "ok": true}') == [("count", 123), ("ok", True)]
+
+
+def test_empty_object():
+    parser = StreamingObjectParser()
+    parser.feed(" {} ")
+    assert parser.complete and parser.fields == {}
+
+
+@pytest.mark.parametrize("text", ['```json\n{"title": "x"}```', 'Here it is: {"title": "x"}', '["title"]'])
+def test_non_bare_object_fails(text):
+    parser = StreamingObjectParser()
+    parser.feed(text)
+    assert parser.failed
+
+
+def test_nothing_after_complete():
+    parser = StreamingObjectParser()
+    parser.feed('{"a": 1}')
+    assert parser.feed('{"b": 2}') == []
+    assert parser.fields == {"a": 1}
+
+
+def test_complete_array_items_truncated():
+    text = json.dumps([{"image": 1, "t": "a, ]"}, {"image": 2}, {"image": 3, "t": "cut"}])
+    assert complete_array_items(text[:-12]) == [{"image": 1, "t": "a, ]"}, {"image": 2}]
+
+
+def test_complete_array_items_after_preamble():
+    text = 'Listings for [2] images:\n```json\n[ {"image": 1} ,\n {"image": 2}]\n```'
+    assert complete_array_items(text) == [{"image": 1}, {"image": 2}]
+
+
+@pytest.mark.parametrize("text", ["", "no json", "[1, 2]", '[{"image": 1'])
+def test_complete_array_items_nothing_whole(text):
+    assert complete_array_items(text) == []
@@ -0,0 +1,56 @@
+import pytest
+
+from app.services.seo.keyword_clusters import cluster_keywords, keyword_signature
+
+
+@pytest.mark.parametrize("keyword", ["Men's Running Shoes", "running shoes for men", "mens running shoe"])
+def test_signature_folds_order_plurals_and_possessives(keyword):
+    assert keyword_signature(keyword) == {"men", "running", "shoe"}
+
+
+@pytest.mark.parametrize("keyword, signature", [
+    ("fashion news", {"fashion", "news"}),
+    ("toy buses", {"toy", "bus"}),
+    ("camera lenses", {"camera", "lens"}),
+    ("kids series", {"kid", "series"}),
+    ("leather accessories", {"leather", "accessory"}),
+    ("party dresses", {"party", "dress"}),
+    ("denim shorts", {"denim", "shorts"}),
+])
+def test_signature_stems(keyword, signature):
+    assert keyword_signature(keyword) == signature
+
+
+def test_signature_of_stopwords_only():
+    assert keyword_signature("for the") == {"for", "the"}
+
+
+def test_exact_duplicates_cluster():
+    clusters = cluster_keywords(
+        ["men's running shoes", "red dress", "running shoes for men", "Mens Running Shoe"], 1.0, 10
+    )
+    assert clusters == [["men's running shoes", "running shoes for men", "Mens Running Shoe"], ["red dress"]]
+
+
+def test_similarity_threshold():
+    keywords = ["nike running shoes", "nike running shoes men", "leather bag"]
+    assert cluster_keywords(keywords, 0.75, 10) == [keywords[:2], ["leather bag"]]
+    assert cluster_keywords(keywords, 0.8, 10) == [[k] for k in keywords]
+
+
+def test_joins_first_matching_cluster_in_rank_order():
+    keywords = ["running shoes", "trail shoes", "running trail shoes"]
+    assert cluster_keywords(keywords, 0.6, 10) == [["running shoes", "running trail shoes"], ["trail shoes"]]
+
+
+def test_max_clusters_drops_new_clusters_but_keeps_members():
+    keywords = ["red dress", "blue bag", "green hat", "red dresses", "blue bags"]
+    assert cluster_keywords(keywords, 1.0, 2) == [["red dress", "red dresses"], ["blue bag", "blue bags"]]
+
+
+def test_news_does_not_join_new():
+    assert cluster_keywords(["new arrivals", "news arrivals"], 1.0, 10) == [["new arrivals"], ["news arrivals"]]
+
+
+def test_empty():
+    assert cluster_keywords([], 0.8, 10) == []
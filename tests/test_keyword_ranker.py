@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+import pytest
+
+from app.services.seo.keyword_ranker import KeywordRanker, rank_top_keywords, top_k_indices
+from app.services.seo.seo_service import heuristic_score_keyword, rank_keywords
+
+WORDS = [
+    "buy", "best", "price", "cheap", "online", "for", "new", "comfortable", "newest", "red", "Red", "shoes",
+    "running", "leather", "bag", "C++", "(pro)", "size-10", "10", "été", "ÉTÉ", "👟", "men's", "a.b", "none",
+    "true", "-", "  ", "\t",
+]
+
+ATTRIBUTES = [
+    {},
+    {"color": "red", "category": "Shoes"},
+    {"color": "RED", "material": "Leather"},
+    {"size": 10, "in_stock": True},  # non-string values compare as str(v).lower()
+    {"brand": None},  # "none"
+    {"empty": ""},  # an empty value is a substring of every keyword
+    {"brand": "C++ (Pro)", "tags": ["a", "b"]},
+    {"finish": "été", "fit": "men's"},
+]
+
+
+def _keywords(n, seed):
+    rnd = random.Random(seed)
+    keywords = ["", " ", "-", "buy", "for-kids", "comfortable shoes"]
+    for _ in range(n):
+        words = rnd.choices(WORDS, k=rnd.randint(1, 7))
+        keywords.append(rnd.choice([" ", "", "-"]).join(words))
+    return keywords
+
+
+@pytest.mark.parametrize("attributes", ATTRIBUTES)
+def test_scores_identical_to_scalar(attributes):
+    keywords = _keywords(5000, seed=len(attributes))
+    expected = [heuristic_score_keyword(k, attributes) for k in keywords]
+    scores = KeywordRanker(attributes).heuristic_scores(keywords)
+    assert scores.tolist() == expected  # exact, not approximate
+
+
+@pytest.mark.parametrize("attributes", ATTRIBUTES[:4])
+@pytest.mark.parametrize("k", [1, 7, 100, 10_000])
+def test_rank_top_keywords_matches_rank_keywords(attributes, k):
+    keywords = _keywords(2000, seed=k)
+    expected = rank_keywords(keywords, attributes)[:k]
+    ranked = rank_top_keywords(keywords, attributes, k)
+    assert [{"keyword": r["keyword"], "heuristic_score": r["heuristic_score"]} for r in ranked] == expected
+
+
+@pytest.mark.parametrize("k", [0, 1, 3, 50, 999, 1000, 2000])
+def test_top_k_ties_keep_input_order(k):
+    rnd = random.Random(k)
+    scores = np.array([rnd.choice([0.1, 0.35, 0.5, 0.5, 0.8, 1.0]) for _ in range(1000)])
+    stable = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+    assert top_k_indices(scores, k).tolist() == stable
+
+
+def test_top_k_empty():
+    assert top_k_indices(np.zeros(0), 5).tolist() == []
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from app.services.product_analyzer.analyzer import _parse_packed_response
+
+LISTING = {
+    "title": "Red Running Shoe",
+    "attributes": {"category": "Shoes", "color": "red"},
+    "seo_keywords": ["red running shoes"],
+    "promotional_tags": ["New"],
+    "meta_title": "Red Running Shoe",
+    "meta_description": "Light red running shoe.",
+    "short_description": "Light and fast.",
+    "description": "A light red running shoe.",
+}
+
+
+def _entry(image=None, **changes):
+    entry = {**LISTING, **changes}
+    if image is not None:
+        entry["image"] = image
+    return entry
+
+
+def _titles(listings):
+    return [listing and listing["title"] for listing in listings]
+
+
+def test_entries_matched_by_image_number():
+    text = json.dumps([_entry(2, title="second"), _entry(1, title="first"), _entry(3, title="third")])
+    assert _titles(_parse_packed_response(text, 3)) == ["first", "second", "third"]
+
+
+def test_entries_without_number_matched_by_position():
+    text = json.dumps([_entry(title="first"), _entry(title="second")])
+    assert _titles(_parse_packed_response(text, 2)) == ["first", "second"]
+
+
+def test_image_field_is_dropped_from_listing():
+    listing = _parse_packed_response(json.dumps([_entry(1)]), 1)[0]
+    assert "image" not in listing
+    assert listing["attributes"] == {"category": "Shoes", "color": "red"}
+
+
+@pytest.mark.parametrize("bad", [
+    _entry(2, title=None),  # fails validation
+    {"image": 2, "title": "partial"},  # missing fields
+    _entry(7),  # out of range
+    _entry(0),
+    _entry("2"),  # not an int
+    "not an object",
+])
+def test_invalid_entries_leave_none(bad):
+    text = json.dumps([_entry(1), bad])
+    assert _titles(_parse_packed_response(text, 2)) == ["Red Running Shoe", None]
+
+
+def test_first_entry_for_an_image_wins():
+    text = json.dumps([_entry(1, title="first"), _entry(1, title="duplicate")])
+    assert _titles(_parse_packed_response(text, 2)) == ["first", None]
+
+
+@pytest.mark.parametrize("wrap", [
+    "```json\n{}\n```",
+    "Here are the listings:\n{}",
+    '{{"products": {}}}',
+])
+def test_wrapped_replies(wrap):
+    text = wrap.format(json.dumps([_entry(1), _entry(2)]))
+    assert _titles(_parse_packed_response(text, 2)) == ["Red Running Shoe", "Red Running Shoe"]
+
+
+def test_truncated_reply_keeps_complete_entries():
+    text = json.dumps([_entry(1, title="a"), _entry(2, title="b"), _entry(3, title="c")])
+    truncated = text[:text.rindex('"description"')]
+    assert _titles(_parse_packed_response(truncated, 3)) == ["a", "b", None]
+
+
+@pytest.mark.parametrize("text", [None, "", "no json here", "{}", "[]"])
+def test_unusable_replies(text):
+    assert _parse_packed_response(text, 2) == [None, None]
@@ -0,0 +1,97 @@
+import pytest
+
+from app.services.pricing.price_extraction import extract_prices, summarize_prices
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Now $129.99 with free shipping", [(129.99, "USD")]),
+    ("$1,299.99.", [(1299.99, "USD")]),
+    ("$1,299", [(1299.0, "USD")]),
+    ("$99.95$99.95", [(99.95, "USD"), (99.95, "USD")]),
+    ("US$ 45 or C$60 or A$70", [(45.0, "USD"), (60.0, "CAD"), (70.0, "AUD")]),
+    ("1.299,99 €", [(1299.99, "EUR")]),
+    ("€ 1 299,99", [(1299.99, "EUR")]),
+    ("£12,99 today", [(12.99, "GBP")]),
+    ("5 €, 6 €.", [(5.0, "EUR"), (6.0, "EUR")]),
+    ("25 dollars", [(25.0, "USD")]),
+    ("40 Euros", [(40.0, "EUR")]),
+    ("Rs.499", [(499.0, "INR")]),
+    ("₹ 75,999", [(75999.0, "INR")]),
+])
+def test_extract_prices(text, expected):
+    assert extract_prices(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Nike Air Max 90 $129.99", [(129.99, "USD")]),
+    ("iPhone 15 $799", [(799.0, "USD")]),
+    ("Pack of 2 $19.99", [(19.99, "USD")]),
+    ("Galaxy S24 €899", [(899.0, "EUR")]),
+    ("Size 10 £45", [(45.0, "GBP")]),
+    ("Model 90 USD 129", [(129.0, "USD")]),
+])
+def test_number_before_prefixed_price_is_not_suffixed(text, expected):
+    assert extract_prices(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("₹1,23,456", [(123456.0, "INR")]),
+    ("INR 12,34,567", [(1234567.0, "INR")]),
+    ("Rs. 1,23,456.50 only", [(123456.5, "INR")]),
+    ("1,19,900 rupees", [(119900.0, "INR")]),
+    ("From ₹1,34,900. Pay ₹11,242/mo.", [(134900.0, "INR"), (11242.0, "INR")]),
+])
+def test_lakh_grouping(text, expected):
+    assert extract_prices(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "Model GA-2100 from 2023",
+    "$0.99 sticker",
+    "$250,000 house",
+    "orders over 50",
+    "price: usd 20",  # prefixed codes are upper-case only
+])
+def test_extract_prices_rejects(text):
+    assert extract_prices(text) == []
+
+
+def test_decimal_part_followed_by_more_digits_is_not_truncated():
+    assert extract_prices("$12.34,5") == []
+
+
+def test_summarize_empty():
+    assert summarize_prices([]) is None
+
+
+def test_summarize_rejects_outliers():
+    samples = [(p, "USD") for p in (129.99, 130.0, 97.48, 130.0, 99.95, 130.0, 5.99, 129.99)]
+    summary = summarize_prices(samples)
+
+    assert summary["currency"] == "USD"
+    assert summary["min_price"] == 97.48
+    assert summary["max_price"] == 130.0
+    assert summary["outliers_removed"] == 1
+    assert summary["samples_found"] == 8
+    assert 0 < summary["confidence"] <= 1
+
+
+def test_summarize_uses_dominant_currency():
+    samples = [(30.0, "USD"), (32.0, "USD"), (31.0, "USD"), (2500.0, "INR")]
+    summary = summarize_prices(samples)
+
+    assert summary["currency"] == "USD"
+    assert summary["samples_found"] == 3
+    assert (summary["min_price"], summary["median_price"], summary["max_price"]) == (30.0, 31.0, 32.0)
+
+
+def test_summarize_confidence_grows_with_agreement():
+    few = summarize_prices([(20.0, "USD"), (40.0, "USD")])
+    many = summarize_prices([(p, "USD") for p in (29.0, 30.0, 30.0, 31.0, 30.5, 29.5, 30.0, 30.0)])
+    assert many["confidence"] > few["confidence"]
+
+
+def test_summarize_single_sample():
+    summary = summarize_prices([(123456.0, "INR")])
+    assert summary["min_price"] == summary["avg_price"] == summary["max_price"] == 123456.0
+    assert summary["outliers_removed"] == 0
@@ -0,0 +1,176 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import async_cache
+from app.core.async_cache import AsyncTTLCache
+from app.core.cse_scheduler import CSEDroppedError, PRIORITY_BACKGROUND, PRIORITY_PRICE
+from app.services.pricing import price_fetcher
+from app.services.pricing.price_fetcher import fetch_price_from_web, normalize_product_query
+
+TTL, STALE_TTL, NEGATIVE_TTL = 600, 3600, 60
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeSearch:
+    """Stands in for cse_search; each call takes the next price (or exception) from `outcomes`."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    async def __call__(self, query, num=1, priority=0):
+        self.calls.append((query, priority))
+        await asyncio.sleep(0.01)
+        outcome = self.outcomes[min(len(self.calls), len(self.outcomes)) - 1]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return {"items": [{"title": "Shop", "snippet": f"Now ${outcome} with free shipping"}] * 3}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(async_cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def search(monkeypatch, clock):
+    monkeypatch.setattr(price_fetcher, "GOOGLE_API_KEY", "key")
+    monkeypatch.setattr(price_fetcher, "GOOGLE_CSE_ID", "cx")
+    # Short, known TTLs; which errors go uncached comes from the real cache
+    monkeypatch.setattr(price_fetcher, "_price_cache", AsyncTTLCache(
+        maxsize=100, ttl=TTL, negative_ttl=NEGATIVE_TTL, stale_ttl=STALE_TTL, name="price",
+        uncached_errors=price_fetcher._price_cache.uncached_errors,
+    ))
+
+    def install(*outcomes):
+        fake = FakeSearch(*outcomes)
+        monkeypatch.setattr(price_fetcher, "cse_search", fake)
+        return fake
+
+    return install
+
+
+def _price(result):
+    return result["min_price"], result["source"]
+
+
+def test_normalize_product_query():
+    assert normalize_product_query("The Nike Air-Max, Red") == "air max nike red"
+    assert normalize_product_query("red nike AIR MAX") == "air max nike red"
+    assert normalize_product_query("Buy the new one!") == "one"
+    assert normalize_product_query("The New, for sale") == ""
+
+
+def test_reworded_titles_share_one_search(search):
+    fake = search(129.99)
+
+    async def run():
+        first = await fetch_price_from_web("Nike Air Max - Red", "Shoes")
+        second = await fetch_price_from_web("red nike air max", "shoes")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert _price(first) == _price(second) == (129.99, "google_search")
+    assert len(fake.calls) == 1
+
+
+def test_stale_value_served_while_one_background_refresh_runs(search, clock):
+    fake = search(100.0, 120.0)
+
+    async def run():
+        await fetch_price_from_web("Nike Air Max", "Shoes")
+        clock.now += TTL + 1
+        # Stale: answered at once with the old price, while one refresh starts
+        stale = await asyncio.gather(*(fetch_price_from_web("Nike Air Max", "Shoes") for _ in range(5)))
+        await asyncio.sleep(0.05)
+        return stale, await fetch_price_from_web("Nike Air Max", "Shoes")
+
+    stale, refreshed = asyncio.run(run())
+    assert [_price(r) for r in stale] == [(100.0, "google_search")] * 5
+    assert _price(refreshed) == (120.0, "google_search")
+    assert [priority for _, priority in fake.calls] == [PRIORITY_PRICE, PRIORITY_BACKGROUND]
+
+
+def test_failed_refresh_keeps_stale_value(search, clock):
+    request = httpx.Request("GET", "https://example.com")
+    error = httpx.HTTPStatusError("500", request=request, response=httpx.Response(500, request=request))
+    fake = search(100.0, error, 120.0)
+
+    async def run():
+        await fetch_price_from_web("Nike Air Max")
+        clock.now += TTL + 1
+        results = [await fetch_price_from_web("Nike Air Max")]
+        await asyncio.sleep(0.05)  # the refresh fails
+        results.append(await fetch_price_from_web("Nike Air Max"))
+        calls_before_retry = len(fake.calls)
+        clock.now += NEGATIVE_TTL + 1  # retried after negative_ttl
+        results.append(await fetch_price_from_web("Nike Air Max"))
+        await asyncio.sleep(0.05)
+        results.append(await fetch_price_from_web("Nike Air Max"))
+        return results, calls_before_retry
+
+    results, calls_before_retry = asyncio.run(run())
+    assert [_price(r)[0] for r in results] == [100.0, 100.0, 100.0, 120.0]
+    assert calls_before_retry == 2
+    assert len(fake.calls) == 3
+
+
+def test_stale_value_expires(search, clock):
+    fake = search(100.0, 120.0)
+
+    async def run():
+        await fetch_price_from_web("Nike Air Max")
+        clock.now += TTL + STALE_TTL + 1
+        return await fetch_price_from_web("Nike Air Max")
+
+    assert _price(asyncio.run(run())) == (120.0, "google_search")
+    assert [priority for _, priority in fake.calls] == [PRIORITY_PRICE, PRIORITY_PRICE]
+
+
+@pytest.mark.parametrize("title", ["", "The New", "Buy online, best price!"])
+def test_titles_normalizing_to_nothing_bypass_the_cache(search, title):
+    fake = search(100.0, 120.0)
+
+    async def run():
+        return [await fetch_price_from_web(title) for _ in range(2)]
+
+    results = asyncio.run(run())
+    assert [_price(r)[0] for r in results] == [100.0, 120.0]
+    assert len(fake.calls) == 2
+    assert len(price_fetcher._price_cache._entries) == 0
+
+
+def test_scheduler_drops_are_not_cached(search):
+    fake = search(CSEDroppedError("Daily Custom Search budget exhausted"), 100.0)
+
+    async def run():
+        return [await fetch_price_from_web("Nike Air Max") for _ in range(2)]
+
+    dropped, found = asyncio.run(run())
+    assert _price(dropped) == (None, "api_quota_exceeded")
+    assert _price(found) == (100.0, "google_search")
+    assert len(fake.calls) == 2
+
+
+def test_no_prices_found_is_cached_for_negative_ttl(search, clock):
+    fake = search("not a price", 100.0)
+
+    async def run():
+        results = [await fetch_price_from_web("Nike Air Max") for _ in range(2)]
+        clock.now += NEGATIVE_TTL + 1
+        return results + [await fetch_price_from_web("Nike Air Max")]
+
+    results = asyncio.run(run())
+    assert [r["source"] for r in results] == ["no_prices_found", "no_prices_found", "google_search"]
+    assert len(fake.calls) == 2
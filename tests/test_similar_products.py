@@ -0,0 +1,96 @@
+import asyncio
+import contextlib
+
+import pytest
+
+from app.services.product_analyzer import similar_products
+from app.services.product_analyzer.similar_products import SimilarProductIndex
+
+TITLES = {
+    1: ("Nike Air Zoom Pegasus 40 Men's Running Shoes - Red", {"category": "Shoes", "color": "Red"}),
+    2: ("Handmade Ceramic Coffee Mug", {"category": "Home"}),
+    3: ("Leather Crossbody Bag Women", {"category": "Bags", "material": "leather"}),
+    4: ("Sony WH-1000XM5 Wireless Headphones", {"category": "Electronics"}),
+    5: ("Lodge Cast Iron Skillet 10 inch", {"category": "Kitchen"}),
+}
+
+
+class FakeCatalog:
+    """products table as seen by the sync: only committed ids are visible."""
+
+    def __init__(self):
+        self.committed = set()
+
+    async def list_product_texts(self, db, after_id=0, limit=10000):
+        ids = sorted(i for i in self.committed if i > after_id)[:limit]
+        return [(i, *TITLES[i]) for i in ids]
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    catalog = FakeCatalog()
+    index = SimilarProductIndex()
+    monkeypatch.setattr(similar_products, "_index", index)
+    monkeypatch.setattr(similar_products, "_synced_id", 0)
+    monkeypatch.setattr(similar_products, "_indexed_tail", set())
+    monkeypatch.setattr(similar_products, "_SYNC_CHUNK", 2)
+    monkeypatch.setattr(similar_products, "list_product_texts", catalog.list_product_texts)
+    monkeypatch.setattr(similar_products, "async_session", contextlib.nullcontext)
+    monkeypatch.setattr(similar_products, "SIMILAR_PRODUCTS_ENABLED", True)
+    return catalog
+
+
+def _sync():
+    return asyncio.run(similar_products.sync_index())
+
+
+def _found(product_id):
+    title, attributes = TITLES[product_id]
+    match = similar_products.find_similar_product(title, attributes, 0.95)
+    return match is not None and match.product_id == product_id
+
+
+def test_sync_picks_up_rows_committed_late_with_lower_ids(catalog):
+    catalog.committed = {1, 2, 4}
+    assert _sync() == 3
+    assert not _found(3)
+
+    catalog.committed.add(3)  # its transaction started before 4's but committed after the pull
+    assert _sync() == 1
+    assert _found(3)
+    assert len(similar_products._index) == 4
+
+
+def test_sync_skips_products_indexed_here(catalog):
+    catalog.committed = {1, 2}
+    _sync()
+    similar_products.add_product(3, *TITLES[3])
+    catalog.committed.add(3)
+    assert _sync() == 0
+    assert len(similar_products._index) == 3
+
+
+def test_add_product_skips_rows_already_pulled(catalog):
+    catalog.committed = {1, 2}
+    _sync()
+    similar_products.add_product(2, *TITLES[2])
+    assert len(similar_products._index) == 2
+
+
+def test_overlap_window_is_bounded(catalog, monkeypatch):
+    monkeypatch.setattr(similar_products, "SIMILAR_INDEX_SYNC_OVERLAP", 1)
+    catalog.committed = {1, 2, 4, 5}
+    _sync()
+    assert similar_products._indexed_tail == {5}
+    catalog.committed.add(3)  # more than the window below the newest id: not re-read
+    assert _sync() == 0
+
+
+def test_add_vectors_in_batches_grows_the_index(monkeypatch):
+    monkeypatch.setattr(similar_products, "_ADD_BATCH", 3)
+    index = SimilarProductIndex()
+    products = [(i, f"{title} {i}", attributes) for i, (title, attributes) in enumerate(list(TITLES.values()) * 300)]
+    assert index.add_many(products) == len(products)
+    assert len(index) == len(products)
+    for product_id, title, attributes in products[::97]:
+        assert index.lookup(title, attributes, 0.95).product_id == product_id